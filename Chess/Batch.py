@@ -0,0 +1,449 @@
+"""Contains vectorised check detection and move counting for many boards"""
+
+import numpy as np
+import Board
+import Tables
+from Piece import PieceType as p_type
+from Piece import PieceColour as Colour
+
+
+# A batch is an (N, 64) int8 array holding one board per row: the code (see
+# Board.piece_code) of the piece on each square, with squares numbered as in
+# the Tables module. Results given per colour are indexed as in
+# BitboardBoard, White first.
+WHITE = 0
+BLACK = 1
+
+SIDE_COLOURS = (Colour.white, Colour.black)
+
+# Before use, each batch gets an extra, always empty, column OFF. Square
+# lists of different lengths are padded with OFF, so that every table is a
+# rectangular array.
+OFF = 64
+
+# Directions in the order of Tables.DIRECTIONS: the first four are
+# vertical/horizontal, the last four diagonal
+NUM_DIRECTIONS = len(Tables.DIRECTIONS)
+RAY_LENGTH = Tables.SIZE - 1
+
+
+def _pad(square_lists, width):
+    """Return an int array of the square numbers of each list, padded.
+
+    An extra row of OFF is added for the OFF square itself.
+
+    """
+
+    table = np.full((len(square_lists) + 1, width), OFF, dtype=np.intp)
+
+    for i, squares in enumerate(square_lists):
+        for j, (x, y) in enumerate(squares):
+            table[i, j] = Tables.square(x, y)
+
+    return table
+
+
+# RAY_INDEX[sq][d] holds the squares along direction d from sq, nearest
+# first
+RAY_INDEX = np.stack([_pad(Tables.RAYS[direction], RAY_LENGTH)
+                      for direction in Tables.DIRECTIONS], axis=1)
+
+KNIGHT_INDEX = _pad(Tables.KNIGHT_SQUARES, 8)
+KING_INDEX = _pad(Tables.KING_SQUARES, 8)
+
+# PAWN_ATTACK_INDEX[side][sq] holds the squares a pawn of side on sq attacks
+PAWN_ATTACK_INDEX = np.stack([_pad(Tables.PAWN_ATTACK_SQUARES[colour], 2)
+                              for colour in SIDE_COLOURS])
+
+# The single and double pushes of a White pawn on each square (OFF if none).
+# Black's moves are counted on a mirrored board, so only White's are needed.
+PAWN_PUSH_INDEX = np.full(OFF + 1, OFF, dtype=np.intp)
+PAWN_PUSH_INDEX[8:56] = np.arange(0, 48)
+PAWN_DOUBLE_INDEX = np.full(OFF + 1, OFF, dtype=np.intp)
+PAWN_DOUBLE_INDEX[48:56] = np.arange(32, 40)
+
+# ON_RAY[d, sq, other] is true if other is on the ray in direction d from sq
+ON_RAY = np.zeros((NUM_DIRECTIONS, OFF + 1, OFF + 1), dtype=bool)
+ON_RAY[np.arange(NUM_DIRECTIONS)[None, :, None], np.arange(OFF + 1)[:, None,
+                                                                    None],
+       RAY_INDEX] = True
+ON_RAY[:, :, OFF] = False
+
+# The number of moves counted for a pawn reaching each square: one for each
+# piece it may be promoted to on the last rank (as Board generates them)
+PAWN_MOVE_WEIGHTS = np.ones(OFF + 1, dtype=np.intp)
+PAWN_MOVE_WEIGHTS[:8] = len(Board.PROMOTION_PIECES)
+PAWN_MOVE_WEIGHTS[56:64] = len(Board.PROMOTION_PIECES)
+
+
+def _codes(piece_type):
+    """Return the White and Black codes of a piece type."""
+    return tuple(Board.piece_code(piece_type, colour)
+                 for colour in SIDE_COLOURS)
+
+
+KING_CODES = _codes(p_type.king)
+KNIGHT_CODES = _codes(p_type.knight)
+PAWN_CODES = _codes(p_type.pawn)
+
+# SLIDES[side][d, sq_code] is true if a piece of side with that code moves
+# (and attacks) along direction d
+SLIDES = np.zeros((2, NUM_DIRECTIONS, 2 * Board.BLACK_CODE), dtype=bool)
+for _side, _colour in enumerate(SIDE_COLOURS):
+    for _d, _direction in enumerate(Tables.DIRECTIONS):
+        if _direction in Tables.VER_HOR_DIRECTIONS:
+            _slider = p_type.rook
+        else:
+            _slider = p_type.bishop
+        for _type in (_slider, p_type.queen):
+            SLIDES[_side, _d, Board.piece_code(_type, _colour)] = True
+
+DIRECTION_INDEX = np.arange(NUM_DIRECTIONS)
+RAY_STEPS = np.arange(RAY_LENGTH)
+
+
+def from_snapshots(snapshots):
+    """Return the batch of an iterable of snapshots (see Board.snapshot)."""
+    return np.frombuffer(b"".join(snapshots),
+                         dtype=np.int8).reshape(-1, 64)
+
+
+def from_boards(boards):
+    """Return the batch of an iterable of boards of any backend."""
+    return from_snapshots(board.snapshot() for board in boards)
+
+
+def _with_off(boards):
+    """Return a batch with the empty OFF column added."""
+    return np.concatenate(
+        (boards, np.zeros((len(boards), 1), dtype=np.int8)), axis=1)
+
+
+def _first(codes):
+    """Return the first non-zero code along the last axis (or 0) and its
+    index (or 0)."""
+
+    found = codes != 0
+    at = found.argmax(axis=-1)
+
+    return np.take_along_axis(codes, at[..., None], axis=-1)[..., 0], at
+
+
+def _attacked(padded, squares, side):
+    """Return whether side attacks each of an (N, K) array of squares.
+
+    As in Board.is_square_attacked, a square is attacked whatever stands on
+    it. The OFF square is never attacked.
+
+    """
+
+    rows = np.arange(len(padded))[:, None, None]
+
+    # The first piece along each ray from the square: a slider of side
+    # moving in that direction attacks it
+    first = _first(padded[rows[..., None], RAY_INDEX[squares]])[0]
+    attacked = SLIDES[side][DIRECTION_INDEX, first].any(axis=2)
+
+    attacked |= (padded[rows, KNIGHT_INDEX[squares]]
+                 == KNIGHT_CODES[side]).any(axis=2)
+    attacked |= (padded[rows, KING_INDEX[squares]]
+                 == KING_CODES[side]).any(axis=2)
+
+    # A pawn of side attacks sq from the squares a pawn of the other side
+    # on sq would attack
+    attacked |= (padded[rows, PAWN_ATTACK_INDEX[1 - side][squares]]
+                 == PAWN_CODES[side]).any(axis=2)
+
+    return attacked & (squares != OFF)
+
+
+def _slider_rays(padded, piece_rows, from_sq):
+    """Return the rays from each of a list of pieces, and how far they reach.
+
+    Args:
+        - padded:  the batch, with the OFF column
+        - piece_rows, from_sq:  (P,) arrays of the board and square of each
+                                piece
+
+    Returns: a tuple containing three (P, 8, 7) arrays:
+        [0] the squares along each ray
+        [1] the codes of the pieces on those squares
+        [2] whether each square is reached: up to and including the first
+            piece along the ray
+
+    """
+
+    ray_squares = RAY_INDEX[from_sq]
+    ray_codes = padded[piece_rows[:, None, None], ray_squares]
+
+    blocked = np.logical_or.accumulate(ray_codes != 0, axis=2)
+    reached = np.ones_like(blocked)
+    reached[:, :, 1:] = ~blocked[:, :, :-1]
+    reached &= ray_squares != OFF
+
+    return ray_squares, ray_codes, reached
+
+
+def _king_squares(boards, side):
+    """Return the square of each board's king of side and whether it has one.
+    """
+
+    is_king = boards == KING_CODES[side]
+
+    return is_king.argmax(axis=1), is_king.any(axis=1)
+
+
+def _as_white(boards, black):
+    """Return the boards, with those where black is true mirrored.
+
+    Mirroring swaps the colours of the pieces and turns the board upside
+    down, so that Black's moves can be counted as White's.
+
+    """
+
+    mirrored = boards.reshape(-1, 8, 8)[:, ::-1].reshape(-1, 64)
+    mirrored = np.where(mirrored != 0, mirrored ^ Board.BLACK_CODE, 0)
+
+    return np.where(black[:, None], mirrored, boards).astype(np.int8)
+
+
+def _is_own(codes):
+    """Return whether each of an array of codes is a White piece."""
+    return (codes != 0) & (codes & Board.BLACK_CODE == 0)
+
+
+def _count_white_moves(boards):
+    """Return the number of legal moves of White on each board.
+
+    This is the count of Board.count_legal_moves, so castle and en passant
+    moves are not included and a promotion counts once for each piece.
+
+    """
+
+    n = len(boards)
+    padded = _with_off(boards)
+    rows = np.arange(n)
+
+    king_sq, has_king = _king_squares(boards, WHITE)
+    king_sq = np.where(has_king, king_sq, OFF)
+
+    # King moves: to squares which would not be attacked once the king has
+    # left its square (so that it cannot hide behind itself on a line)
+    lifted = padded.copy()
+    lifted[rows, king_sq] = 0
+    targets = KING_INDEX[king_sq]
+    king_moves = ((targets != OFF) & ~_is_own(padded[rows[:, None], targets])
+                  & ~_attacked(lifted, targets, BLACK))
+    count = king_moves.sum(axis=1)
+
+    # Checks and pins, found by looking along each ray from the king for
+    # the first two pieces
+    ray_squares = RAY_INDEX[king_sq]
+    ray_codes = padded[rows[:, None, None], ray_squares]
+    first, first_at = _first(ray_codes)
+    after_first = RAY_STEPS > first_at[..., None]
+    second = _first(np.where(after_first, ray_codes, 0))[0]
+
+    slider_checks = SLIDES[BLACK][DIRECTION_INDEX, first]
+    pins = _is_own(first) & SLIDES[BLACK][DIRECTION_INDEX, second]
+
+    knight_squares = KNIGHT_INDEX[king_sq]
+    knight_checks = (padded[rows[:, None], knight_squares]
+                     == KNIGHT_CODES[BLACK])
+    pawn_squares = PAWN_ATTACK_INDEX[WHITE][king_sq]
+    pawn_checks = padded[rows[:, None], pawn_squares] == PAWN_CODES[BLACK]
+
+    num_checks = (slider_checks.sum(axis=1) + knight_checks.sum(axis=1)
+                  + pawn_checks.sum(axis=1))
+
+    # pin_dirs[n, sq] is the direction from the king of the line along
+    # which the piece on sq is pinned, or -1 if it is not pinned
+    pin_dirs = np.full((n, OFF + 1), -1, dtype=np.intp)
+    pin_boards, pin_directions = np.nonzero(pins)
+    pin_dirs[pin_boards, ray_squares[pin_boards, pin_directions,
+                                     first_at[pin_boards,
+                                              pin_directions]]] = \
+        pin_directions
+
+    # In single check, the other pieces must move to the checking piece or
+    # between it and the king (as in Board.get_pin_info)
+    check_mask = np.zeros((n, OFF + 1), dtype=bool)
+    on_line = slider_checks[..., None] & ~after_first
+    check_mask[np.nonzero(on_line)[0], ray_squares[on_line]] = True
+    check_mask[np.nonzero(knight_checks)[0],
+               knight_squares[knight_checks]] = True
+    check_mask[np.nonzero(pawn_checks)[0],
+               pawn_squares[pawn_checks]] = True
+
+    check_ok = np.where((num_checks == 0)[:, None], True,
+                        check_mask & (num_checks == 1)[:, None])
+
+    # Only boards with a pin or a check restrict the other pieces' moves
+    restricted = (num_checks > 0) | pins.any(axis=1)
+
+    def add_moves(piece_rows, from_sq, to_sq, moves, weights=1):
+        """Add the legal moves among moves to count.
+
+        Args:
+            - piece_rows, from_sq:  (P,) arrays of the board and square of
+                                    each piece
+            - to_sq:  a (P, K) array of the squares each may move to
+            - moves:  a (P, K) bool array of which of those are possible
+
+        """
+
+        limited = restricted[piece_rows]
+
+        if limited.any():
+            board, sq = piece_rows[limited], from_sq[limited]
+            ends = to_sq[limited]
+            pin_dir = pin_dirs[board, sq][:, None]
+            on_pin_line = ON_RAY[np.maximum(pin_dir, 0),
+                                 king_sq[board][:, None], ends]
+            moves[limited] &= (((pin_dir < 0) | on_pin_line)
+                               & check_ok[board[:, None], ends])
+
+        np.add.at(count, piece_rows, (moves * weights).sum(axis=1))
+
+    # Sliders: each square along a ray up to and including the first
+    # piece, unless that piece is White's own
+    piece_rows, from_sq = np.nonzero(SLIDES[WHITE][:, boards].any(axis=0))
+    ray_squares, ray_codes, reached = _slider_rays(padded, piece_rows,
+                                                   from_sq)
+    reached &= ~_is_own(ray_codes)
+    reached &= SLIDES[WHITE][:, boards[piece_rows, from_sq]].T[..., None]
+    add_moves(piece_rows, from_sq, ray_squares.reshape(len(from_sq), -1),
+              reached.reshape(len(from_sq), -1))
+
+    piece_rows, from_sq = np.nonzero(boards == KNIGHT_CODES[WHITE])
+    to_sq = KNIGHT_INDEX[from_sq]
+    add_moves(piece_rows, from_sq, to_sq,
+              (to_sq != OFF) & ~_is_own(padded[piece_rows[:, None], to_sq]))
+
+    # Pawns: pushes to empty squares and captures of Black's pieces, each
+    # promotion counted once per piece
+    piece_rows, from_sq = np.nonzero(boards == PAWN_CODES[WHITE])
+    pawn_rows = piece_rows[:, None]
+    push = PAWN_PUSH_INDEX[from_sq]
+    double = PAWN_DOUBLE_INDEX[from_sq]
+    captures = PAWN_ATTACK_INDEX[WHITE][from_sq]
+
+    to_sq = np.concatenate((push[:, None], double[:, None], captures), axis=1)
+    pushes = (push != OFF) & (padded[piece_rows, push] == 0)
+    doubles = pushes & (double != OFF) & (padded[piece_rows, double] == 0)
+    takes = ((captures != OFF)
+             & (padded[pawn_rows, captures] & Board.BLACK_CODE != 0))
+    moves = np.concatenate((pushes[:, None], doubles[:, None], takes), axis=1)
+    add_moves(piece_rows, from_sq, to_sq, moves, PAWN_MOVE_WEIGHTS[to_sq])
+
+    return count
+
+
+def attack_masks(boards):
+    """Return an (N, 2, 64) bool array of the squares each side attacks.
+
+    attack_masks(boards)[n, side, sq] is Board.is_square_attacked for
+    square sq of board n and the colour SIDE_COLOURS[side].
+
+    """
+
+    boards = np.asarray(boards, dtype=np.int8)
+    padded = _with_off(boards)
+    attacks = np.zeros((len(boards), 2, OFF + 1), dtype=bool)
+
+    for side in (WHITE, BLACK):
+        piece_rows, from_sq = np.nonzero(SLIDES[side][:, boards].any(axis=0))
+        ray_squares, ray_codes, reached = _slider_rays(padded, piece_rows,
+                                                       from_sq)
+        reached &= SLIDES[side][:, boards[piece_rows, from_sq]].T[..., None]
+        attacks[np.broadcast_to(piece_rows[:, None, None], reached.shape)[
+            reached], side, ray_squares[reached]] = True
+
+        for codes, table in ((KNIGHT_CODES, KNIGHT_INDEX),
+                             (KING_CODES, KING_INDEX),
+                             (PAWN_CODES, PAWN_ATTACK_INDEX[side])):
+            piece_rows, from_sq = np.nonzero(boards == codes[side])
+            attacks[piece_rows[:, None], side, table[from_sq]] = True
+
+    return attacks[:, :, :64]
+
+
+def in_check(boards, attacks=None):
+    """Return an (N, 2) bool array of whether each side's king is in check.
+
+    As with Board.is_in_check, a side with no king is not in check.
+
+    Args:
+        - boards:  an (N, 64) batch
+        - attacks:  the result of attack_masks for the batch, if known
+
+    """
+
+    boards = np.asarray(boards, dtype=np.int8)
+    checks = np.zeros((len(boards), 2), dtype=bool)
+    rows = np.arange(len(boards))
+
+    if attacks is None:
+        padded = _with_off(boards)
+
+    for side in (WHITE, BLACK):
+        king_sq, has_king = _king_squares(boards, side)
+
+        if attacks is None:
+            king_sq = np.where(has_king, king_sq, OFF)
+            checks[:, side] = _attacked(padded, king_sq[:, None],
+                                        1 - side)[:, 0]
+        else:
+            checks[:, side] = has_king & attacks[rows, 1 - side, king_sq]
+
+    return checks
+
+
+def count_legal_moves(boards, colours, chunk_size=4096):
+    """Return an (N,) int array of the number of legal moves on each board.
+
+    The counts are those of Board.count_legal_moves, so castle and en
+    passant moves are not included.
+
+    Args:
+        - boards:  an (N, 64) batch
+        - colours:  the colour to move, either a member of the PieceColour
+                    enum for every board or a sequence of N of them
+        - chunk_size:  the number of boards worked on at once, which bounds
+                       the memory used (about 20 KB per board)
+
+    """
+
+    boards = np.asarray(boards, dtype=np.int8)
+    black = np.broadcast_to(np.asarray(colours) == Colour.black,
+                            (len(boards),))
+    counts = np.zeros(len(boards), dtype=np.intp)
+
+    for start in range(0, len(boards), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        counts[chunk] = _count_white_moves(_as_white(boards[chunk],
+                                                     black[chunk]))
+
+    return counts
+
+
+def analyse(boards, colours, chunk_size=4096):
+    """Return the in check flags, legal move counts and attack masks.
+
+    Args:
+        - boards:  an (N, 64) batch
+        - colours:  the colour to move (see count_legal_moves)
+        - chunk_size:  see count_legal_moves
+
+    Returns: a tuple containing three arrays:
+        [0] the result of in_check
+        [1] the result of count_legal_moves
+        [2] the result of attack_masks
+
+    """
+
+    attacks = attack_masks(boards)
+
+    return (in_check(boards, attacks),
+            count_legal_moves(boards, colours, chunk_size),
+            attacks)
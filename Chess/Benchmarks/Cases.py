@@ -0,0 +1,171 @@
+"""Contains the operations which the benchmarks time
+
+Each case is a function taking a Gamestate and returning a pair (run, ops),
+where calling run() performs ops operations on the position and leaves it
+unchanged. A case with no operations to perform in a position returns
+ops = 0, and is not timed there.
+"""
+
+import importlib
+import os
+import sys
+from Piece import PieceType as p_type
+from Piece import PieceColour as colour
+from Tables import DIRECTIONS
+
+
+def get_player(game_state):
+    """Return the colour of the player whose turn it is."""
+
+    return colour.white if game_state.is_white_turn else colour.black
+
+
+def make_takeback(game_state):
+    """Board.make_move followed by takeback_move, for every legal move."""
+
+    board = game_state.board
+    undo = []
+
+    for move in game_state.get_all_moves(get_player(game_state)):
+        taken = board.get_piece(*move.end_posn)
+        if taken.type == p_type.blank:
+            taken = None
+        undo.append((move, taken))
+
+    make_move = board.make_move
+    takeback_move = board.takeback_move
+
+    def run():
+        for move, taken in undo:
+            make_move(move)
+            takeback_move(move, taken)
+
+    return run, len(undo)
+
+
+def is_in_check(game_state):
+    """Board.is_in_check, for both colours."""
+
+    is_in_check = game_state.board.is_in_check
+
+    def run():
+        is_in_check(colour.white)
+        is_in_check(colour.black)
+
+    return run, 2
+
+
+def search_direction(game_state):
+    """Board.search_direction, from every piece in every direction."""
+
+    board = game_state.board
+    searches = [(x, y, up_down, left_right)
+                for piece_colour in (colour.white, colour.black)
+                for x, y in board.get_piece_posns(piece_colour)
+                for up_down, left_right in DIRECTIONS]
+
+    search = board.search_direction
+
+    def run():
+        for x, y, up_down, left_right in searches:
+            search(x, y, up_down, left_right)
+
+    return run, len(searches)
+
+
+def get_all_moves(game_state):
+    """Gamestate.get_all_moves, for the player to move."""
+
+    get_all_moves = game_state.get_all_moves
+    player = get_player(game_state)
+
+    def run():
+        get_all_moves(player)
+
+    return run, 1
+
+
+def get_status(game_state):
+    """Gamestate.get_status, as called after each move of a game."""
+
+    get_status = game_state.get_status
+
+    def run():
+        get_status()
+
+    return run, 1
+
+
+def get_san(game_state):
+    """Gamestate.get_san, for every legal move."""
+
+    moves = game_state.get_all_moves(get_player(game_state))
+    get_san = game_state.get_san
+
+    def run():
+        for move in moves:
+            get_san(move)
+
+    return run, len(moves)
+
+
+def get_clar_str(game_state):
+    """Board.get_clar_str, for every legal move which get_san passes to it."""
+
+    board = game_state.board
+    clarify = [(move, board.get_piece(*move.start_posn))
+               for move in game_state.get_all_moves(get_player(game_state))
+               if not move.castle]
+    clarify = [(move, piece) for move, piece in clarify
+               if piece.type != p_type.pawn]
+
+    get_clar_str = board.get_clar_str
+
+    def run():
+        for move, piece in clarify:
+            get_clar_str(move, piece)
+
+    return run, len(clarify)
+
+
+def board_eval(game_state):
+    """JOE_AI.board_eval, for the player to move."""
+
+    JOE_AI = import_ai("JOE_AI")
+    board = game_state.board
+    player = get_player(game_state)
+    evaluate = JOE_AI.board_eval
+
+    def run():
+        evaluate(board, player)
+
+    return run, 1
+
+
+def import_ai(name):
+    """Return the AI module of that name in ../Scripts.
+
+    The directory above Chess is added to sys.path, as in profiling.py.
+
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+    return importlib.import_module("Scripts." + name)
+
+
+# The cases by name, in the order they are run
+CASES = {
+    "make_takeback": make_takeback,
+    "is_in_check": is_in_check,
+    "search_direction": search_direction,
+    "get_all_moves": get_all_moves,
+    "get_status": get_status,
+    "get_san": get_san,
+    "get_clar_str": get_clar_str,
+    "board_eval": board_eval,
+}
@@ -0,0 +1,39 @@
+"""Contains the fixed positions which the benchmarks are timed on"""
+
+import Gamestate
+
+
+# (name, phase, FEN) of each position. These must not change, or results
+# from before and after the change cannot be compared.
+CORPUS = [
+    ("start", "opening", Gamestate.START_FEN),
+    ("ruy_lopez", "opening",
+     "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"),
+    ("sicilian", "opening",
+     "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"),
+    ("queens_gambit", "middlegame",
+     "r1bq1rk1/pppnbppp/4pn2/3p2B1/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 2 7"),
+    ("kiwipete", "middlegame",
+     "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian", "middlegame",
+     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1"
+     " w - - 0 10"),
+    ("rook_pawns", "endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("lucena", "endgame", "1K1k4/1P6/8/8/8/8/r7/2R5 w - - 0 1"),
+    ("queen_rook", "endgame", "8/8/3k4/8/8/4r3/2Q5/1K6 w - - 0 1"),
+]
+
+PHASES = ("opening", "middlegame", "endgame")
+
+
+def load(backend="array", phases=PHASES):
+    """Return a list of (name, Gamestate) for the positions of some phases.
+
+    Args:
+        - backend:  the board backend to use (see Board.make_board)
+        - phases:  the phases of the game to include
+
+    """
+
+    return [(name, Gamestate.from_fen(fen, backend))
+            for name, phase, fen in CORPUS if phase in phases]
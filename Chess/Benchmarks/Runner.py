@@ -0,0 +1,228 @@
+"""Contains the timing, reporting and comparison of benchmark results"""
+
+import gc
+import json
+import platform
+import statistics
+import time
+from Benchmarks import Cases
+from Benchmarks import Corpus
+
+
+# The version of the results format written by save
+FORMAT_VERSION = 1
+
+
+def calibrate(run, min_time):
+    """Return how many calls of run take at least min_time seconds."""
+
+    loops = 1
+
+    while True:
+        start = time.perf_counter()
+        for _loop in range(loops):
+            run()
+        if time.perf_counter() - start >= min_time:
+            return loops
+        loops *= 2
+
+
+def time_case(case, positions, repeat=5, min_time=0.02):
+    """Time a case on some positions and return its result.
+
+    Each sample times the case on every position in turn, calling it
+    often enough on each to take min_time seconds, and gives the rate of
+    the whole sample. The garbage collector is off while timing, as in
+    timeit.
+
+    Returns a dict with the mean, standard deviation and samples of the
+    rate in operations per second, and the mean rate for each position.
+
+    Args:
+        - case:  a function from Cases.CASES
+        - positions:  a list of (name, Gamestate), as given by Corpus.load
+        - repeat:  the number of samples to take
+        - min_time:  the least time in seconds to spend on each position in
+                     each sample
+
+    """
+
+    runs = []
+
+    for name, game_state in positions:
+        run, ops = case(game_state)
+
+        if ops > 0:
+            runs.append((name, run, ops, calibrate(run, min_time)))
+
+    samples = []
+    position_rates = {name: [] for name, run, ops, loops in runs}
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        for _sample in range(repeat):
+            total_ops = 0
+            total_time = 0.0
+
+            for name, run, ops, loops in runs:
+                start = time.perf_counter()
+                for _loop in range(loops):
+                    run()
+                elapsed = time.perf_counter() - start
+
+                total_ops += ops * loops
+                total_time += elapsed
+                position_rates[name].append(ops * loops / elapsed)
+
+            samples.append(total_ops / total_time)
+
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return {"ops_per_sec": statistics.mean(samples),
+            "stdev": statistics.stdev(samples) if repeat > 1 else 0.0,
+            "samples": samples,
+            "positions": {name: statistics.mean(rates)
+                          for name, rates in position_rates.items()}}
+
+
+def run(cases=None, backend="array", phases=Corpus.PHASES, repeat=5,
+        min_time=0.02, report=None):
+    """Time cases on the corpus and return the results as a dict.
+
+    Args:
+        - cases:  the names of the cases to run, by default all of
+                  Cases.CASES
+        - backend:  the board backend to use (see Board.make_board)
+        - phases:  the phases of the corpus to use
+        - repeat, min_time:  as in time_case
+        - report:  a function called with the name and result of each case
+                   as it finishes, or None
+
+    """
+
+    if cases is None:
+        cases = list(Cases.CASES)
+
+    results = {"version": FORMAT_VERSION,
+               "backend": backend,
+               "phases": list(phases),
+               "repeat": repeat,
+               "min_time": min_time,
+               "python": platform.python_implementation() + " "
+               + platform.python_version(),
+               "machine": platform.machine(),
+               "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "cases": {}}
+
+    for name in cases:
+        positions = Corpus.load(backend, phases)
+        result = time_case(Cases.CASES[name], positions, repeat, min_time)
+        results["cases"][name] = result
+
+        if report is not None:
+            report(name, result)
+
+    return results
+
+
+def save(results, path):
+    """Write results, as returned by run, to a JSON file."""
+
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path):
+    """Return the results saved in a JSON file by save.
+
+    Raises:
+        - ValueError if the file is not in a format that can be read.
+
+    """
+
+    with open(path) as f:
+        results = json.load(f)
+
+    if results.get("version") != FORMAT_VERSION:
+        raise ValueError(path + " is not a version "
+                         + str(FORMAT_VERSION) + " results file")
+
+    return results
+
+
+def compare(old, new, threshold=0.05):
+    """Compare two sets of results, case by case.
+
+    A case has regressed if its rate fell by more than threshold and by
+    more than the sum of the two standard deviations, so that a change
+    within the noise of either run is not flagged.
+
+    Returns a list of (name, old rate, new rate, change, verdict) for the
+    cases in both, where change is the fractional change in rate and
+    verdict is "slower", "faster" or "".
+
+    Args:
+        - old, new:  results, as returned by run or load
+        - threshold:  the least fractional change which is reported
+
+    """
+
+    rows = []
+
+    for name, new_result in new["cases"].items():
+        old_result = old["cases"].get(name)
+
+        if old_result is None:
+            continue
+
+        old_rate = old_result["ops_per_sec"]
+        new_rate = new_result["ops_per_sec"]
+        change = new_rate / old_rate - 1
+        noise = old_result["stdev"] + new_result["stdev"]
+
+        if abs(change) <= threshold or abs(new_rate - old_rate) <= noise:
+            verdict = ""
+        elif change < 0:
+            verdict = "slower"
+        else:
+            verdict = "faster"
+
+        rows.append((name, old_rate, new_rate, change, verdict))
+
+    return rows
+
+
+def setting_changes(old, new):
+    """Return the settings of two results which differ, other than the date.
+
+    Rates found with different settings, for instance on other phases of
+    the corpus, should not be compared.
+
+    """
+
+    keys = ("backend", "phases", "repeat", "min_time", "python", "machine")
+
+    return [key for key in keys if old.get(key) != new.get(key)]
+
+
+def format_result(name, result):
+    """Return a line describing the result of one case."""
+
+    rate = result["ops_per_sec"]
+    spread = 100 * result["stdev"] / rate if rate else 0.0
+
+    return "{:<18}{:>14,.0f} ops/s  +/- {:.1f}%".format(name, rate, spread)
+
+
+def format_comparison(row):
+    """Return a line describing a row returned by compare."""
+
+    name, old_rate, new_rate, change, verdict = row
+
+    return "{:<18}{:>14,.0f}{:>14,.0f}{:>+9.1%}  {}".format(
+        name, old_rate, new_rate, change, verdict).rstrip()
@@ -0,0 +1,9 @@
+"""Microbenchmarks of the hot paths of move generation and evaluation
+
+Each case in Cases.CASES is timed on every position of Corpus.CORPUS, and
+the rates are written to a JSON file which compare can check against an
+earlier one. Run from the Chess directory:
+
+    python3 -m Benchmarks run [--output FILE] [--backend NAME] [--repeat N]
+    python3 -m Benchmarks compare OLD NEW [--threshold FRACTION]
+"""
@@ -0,0 +1,82 @@
+"""Runs the benchmarks from the command line (see the Benchmarks package)"""
+
+import argparse
+import sys
+from Benchmarks import Cases
+from Benchmarks import Corpus
+from Benchmarks import Runner
+import Benchmarks
+
+
+def main(argv=None):
+    """Run or compare benchmarks, returning an exit status.
+
+    The status of compare is 1 if any case is slower.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m Benchmarks",
+        description=Benchmarks.__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="time the cases")
+    run_parser.add_argument("--output", "-o",
+                            help="JSON file to write the results to")
+    run_parser.add_argument("--backend", default="array",
+                            choices=["array", "mailbox", "bitboard"])
+    run_parser.add_argument("--case", action="append",
+                            choices=list(Cases.CASES),
+                            help="case to run (may be repeated)")
+    run_parser.add_argument("--phase", action="append",
+                            choices=Corpus.PHASES,
+                            help="positions to use (may be repeated)")
+    run_parser.add_argument("--repeat", type=int, default=5,
+                            help="samples to take of each case")
+    run_parser.add_argument("--min-time", type=float, default=0.02,
+                            help="least seconds per position per sample")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.05,
+                                help="least fractional change to report")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        print("Backend " + args.backend + ", " + str(args.repeat)
+              + " samples")
+
+        results = Runner.run(args.case, args.backend,
+                             args.phase or Corpus.PHASES, args.repeat,
+                             args.min_time,
+                             lambda name, result:
+                             print(Runner.format_result(name, result)))
+
+        if args.output is not None:
+            Runner.save(results, args.output)
+
+        return 0
+
+    old = Runner.load(args.old)
+    new = Runner.load(args.new)
+
+    for key in Runner.setting_changes(old, new):
+        print("Warning: " + key + " differs (" + str(old.get(key)) + " then "
+              + str(new.get(key)) + ")")
+
+    rows = Runner.compare(old, new, args.threshold)
+
+    print("{:<18}{:>14}{:>14}{:>9}".format("case", "old ops/s", "new ops/s",
+                                           "change"))
+    for row in rows:
+        print(Runner.format_comparison(row))
+
+    return 1 if any(row[4] == "slower" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
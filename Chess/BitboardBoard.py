@@ -0,0 +1,1305 @@
+"""Contains the BitboardBoard class"""
+
+from array import array
+import Piece
+import Move
+import Board
+import Tables
+import Zobrist
+from Piece import PieceType as p_type
+from Piece import PieceColour as Colour
+
+
+# Squares are numbered as in the Tables module, so White pawns move towards
+# lower square numbers.
+WHITE = 0
+BLACK = 1
+
+ALL_SQUARES = (1 << 64) - 1
+
+
+square = Tables.square
+
+
+def side(colour):
+    """Return WHITE or BLACK for a member of the PieceColour enum."""
+    if colour == Colour.black:
+        return BLACK
+    return WHITE
+
+
+KNIGHT_ATTACKS = Tables.KNIGHT_MASKS
+KING_ATTACKS = Tables.KING_MASKS
+
+# PAWN_ATTACKS[side][sq] is the set of squares a pawn of side on sq attacks
+PAWN_ATTACKS = [Tables.PAWN_ATTACK_MASKS[Colour.white],
+                Tables.PAWN_ATTACK_MASKS[Colour.black]]
+
+# Ray tables for each slider direction, with a flag for whether the ray runs
+# towards higher square numbers (so that its nearest blocker is the lowest
+# set bit).
+VER_HOR_RAYS = [(Tables.RAY_MASKS[direction], Tables.is_positive(direction))
+                for direction in Tables.VER_HOR_DIRECTIONS]
+DIAG_RAYS = [(Tables.RAY_MASKS[direction], Tables.is_positive(direction))
+             for direction in Tables.DIAG_DIRECTIONS]
+
+# Every square on a rank or file (or diagonal) through each square, so that
+# the rays of a square need only be walked if a slider stands on one
+VER_HOR_LINES = [sum(ray_table[sq] for ray_table, positive in VER_HOR_RAYS)
+                 for sq in range(64)]
+DIAG_LINES = [sum(ray_table[sq] for ray_table, positive in DIAG_RAYS)
+              for sq in range(64)]
+
+RANKS = Tables.RANK_MASKS
+
+# The squares on which a pawn is promoted
+LAST_RANKS = RANKS[0] | RANKS[7]
+
+NOT_A_FILE = ALL_SQUARES ^ sum(1 << square(0, y) for y in range(8))
+NOT_H_FILE = ALL_SQUARES ^ sum(1 << square(7, y) for y in range(8))
+
+# PAWN_STEPS[side] is the step of a pawn move forward, the rank a pawn
+# reaches by the first step of a double move, and the step and the pawns
+# which can make it for each capture
+PAWN_STEPS = [(-8, RANKS[5], ((-9, NOT_A_FILE), (-7, NOT_H_FILE))),
+              (8, RANKS[2], ((7, NOT_A_FILE), (9, NOT_H_FILE)))]
+
+# CASTLE_PATHS[side][king_side] is the set of squares between the king and
+# the rook, which must be empty to castle (see Board.CASTLE_EMPTY_FILES)
+CASTLE_PATHS = [{king_side: sum(1 << square(x, y) for x in files)
+                 for king_side, files in Board.CASTLE_EMPTY_FILES.items()}
+                for y in (7, 0)]
+
+
+def slider_attacks(sq, occupied, rays):
+    """Return the squares attacked from sq along rays, stopping at pieces.
+
+    Args:
+        - sq:  the square number the slider stands on
+        - occupied:  bitboard of every piece on the board
+        - rays:  VER_HOR_RAYS or DIAG_RAYS
+
+    """
+
+    attacks = 0
+
+    for ray_table, positive in rays:
+        ray = ray_table[sq]
+        blockers = ray & occupied
+
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= ray_table[first]
+
+        attacks |= ray
+
+    return attacks
+
+
+def shift(bitboard, step):
+    """Return bitboard with every square moved on by step (which may be
+    negative), dropping squares which leave the board."""
+    if step > 0:
+        return (bitboard << step) & ALL_SQUARES
+    return bitboard >> -step
+
+
+def squares_of(bitboard):
+    """Yield the square numbers of the set bits of a bitboard."""
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+def posns_of(bitboard):
+    """Return the set of (x, y) positions of the set bits of a bitboard."""
+    return {(sq % 8, sq // 8) for sq in squares_of(bitboard)}
+
+
+def count_of(bitboard):
+    """Return the number of set bits of a bitboard."""
+    return bin(bitboard).count("1")
+
+
+# The shared Piece for each type and colour, indexed [side][type]
+PIECES = [[Piece.make_piece(t, Colour.white) for t in range(7)],
+          [Piece.make_piece(t, Colour.black) for t in range(7)]]
+BLANK = Piece.BLANK
+
+# The snapshot code (see Board.piece_code) of each shared Piece
+CODES = {piece: sq_code for sq_code, piece in Board.CODE_PIECES.items()}
+
+
+class BitboardBoard(Board.Board):
+
+    """A Board stored as one 64 bit integer per piece type and colour.
+
+    Attack sets are computed set-wise from the precomputed tables above, so
+    check detection tests every attacker of a square at once instead of
+    walking the board one square at a time. A 64 entry list of pieces is
+    kept alongside the bitboards so that get_piece stays O(1). The public
+    Board API is unchanged; piece_array is provided as a read only view.
+
+    Attributes:
+        - bitboards:  bitboards[side][piece_type] is the set of squares
+                      holding a piece of that type and side
+        - occupied:  occupied[side] is the set of squares holding a piece
+                     of that side
+        - squares:  a list of the 64 pieces on the board
+        - zobrist_key:  a 64 bit hash of the pieces on the board (see the
+                        Zobrist module)
+
+    Every change to the board goes through _set_square and _clear_square,
+    which keep any attack maps (see Board.enable_attack_maps) up to date.
+
+    """
+
+    BACKEND = "bitboard"
+
+    def clear(self):
+        """Initialise the board as an empty board."""
+        self.bitboards = [[0] * 7, [0] * 7]
+        self.occupied = [0, 0]
+        self.squares = [BLANK] * 64
+        self.zobrist_key = 0
+
+        if self.attack_counts is not None:
+            self.attack_counts = {Colour.white: [0] * 64,
+                                  Colour.black: [0] * 64}
+
+    @property
+    def piece_array(self):
+        """Return an 8 x 8 list of the pieces on the board (read only)."""
+        return [[self.squares[square(x, y)] for y in range(Board.Board.SIZE)]
+                for x in range(Board.Board.SIZE)]
+
+    def draw_pieces(self, canvas):
+
+        sq_width = int(canvas["width"])/8
+
+        for sq in squares_of(self.occupied[WHITE] | self.occupied[BLACK]):
+            self.squares[sq].draw(canvas, (sq % 8)*sq_width,
+                                  (sq // 8)*sq_width)
+
+    def copy(self):
+        """Return an independent copy of the board."""
+
+        board = BitboardBoard.__new__(BitboardBoard)
+        board.bitboards = [self.bitboards[WHITE][:], self.bitboards[BLACK][:]]
+        board.occupied = self.occupied[:]
+        board.squares = self.squares[:]
+        board.zobrist_key = self.zobrist_key
+
+        if self.attack_counts is not None:
+            board.attack_counts = {colour: counts[:] for colour, counts
+                                   in self.attack_counts.items()}
+
+        return board
+
+    def snapshot(self):
+        """Return an immutable encoding of the pieces on the board.
+
+        See Board.snapshot.
+
+        """
+
+        codes = bytearray(64)
+
+        for s in (WHITE, BLACK):
+            for piece_type in range(p_type.king, p_type.pawn + 1):
+                sq_code = CODES[PIECES[s][piece_type]]
+
+                for sq in squares_of(self.bitboards[s][piece_type]):
+                    codes[sq] = sq_code
+
+        return bytes(codes)
+
+    def restore(self, snapshot):
+        """Set the pieces on the board to those of a snapshot."""
+
+        self.clear()
+
+        for sq, sq_code in enumerate(snapshot):
+            if sq_code:
+                self._set_square(sq, Board.CODE_PIECES[sq_code])
+
+    def make_move(self, move):
+        """Adjust the state of the board to reflect the passed move.
+
+        The universe may explode if this is not a legal move.
+
+        Args:
+            - move:  a Move object
+        """
+
+        if move.castle:
+            self.castle(move)
+            return
+
+        if move.en_passant:
+            self._clear_square(square(*move.en_passant_posn))
+
+        start = square(*move.start_posn)
+        end = square(*move.end_posn)
+        piece = self.squares[start]
+
+        if move.promotion is not None:
+            piece = PIECES[side(piece.colour)][move.promotion]
+
+        self._clear_square(start)
+        self._clear_square(end)
+        self._set_square(end, piece)
+
+    def takeback_move(self, move, taken_piece):
+
+        if move.castle:
+            self.takeback_castle(move)
+            return
+
+        end = square(*move.end_posn)
+        piece = self.squares[end]
+
+        if move.en_passant:
+            self._set_square(square(*move.en_passant_posn),
+                             PIECES[1 - side(piece.colour)][p_type.pawn])
+
+        if move.promotion is not None:
+            piece = PIECES[side(piece.colour)][p_type.pawn]
+
+        self._clear_square(end)
+        self._set_square(square(*move.start_posn), piece)
+
+        if taken_piece is not None and taken_piece.type != p_type.blank:
+            self._set_square(end, taken_piece)
+
+    def promote_pawn(self, piece_colour, piece_type):
+        """Promote a pawn of a given colour to the given piece type.
+
+        Args:
+            - piece_colour:  a member of the PieceColour enum
+            - piece_type:  a member of the PieceType enum
+
+        Raises:
+            - TypeError if there is no valid pawn to promote.
+
+        """
+
+        s = side(piece_colour)
+
+        if s == WHITE:
+            rank = RANKS[0]
+        else:
+            rank = RANKS[7]
+
+        pawns = self.bitboards[s][p_type.pawn] & rank
+
+        if not pawns:
+            raise TypeError(
+                "Promote Pawn called, but no pawn is available for promotion.")
+
+        sq = (pawns & -pawns).bit_length() - 1
+        self._clear_square(sq)
+        self._set_square(sq, PIECES[s][piece_type])
+
+    ###########################################################################
+    ############################# HELPER FUNCTIONS ############################
+    ###########################################################################
+
+    def _set_square(self, sq, piece):
+        """Put piece on the empty square sq."""
+        s = side(piece.colour)
+        bit = 1 << sq
+        self.bitboards[s][piece.type] |= bit
+        self.occupied[s] |= bit
+        self.squares[sq] = PIECES[s][piece.type]
+        self.zobrist_key ^= Zobrist.PIECE_KEYS[(piece.type, piece.colour)][sq]
+
+        if self.attack_counts is not None:
+            self._add_piece_attacks(sq % 8, sq // 8, piece,
+                                    self.attack_counts[piece.colour], 1)
+            self._update_rays_through(sq % 8, sq // 8, -1)
+
+    def _clear_square(self, sq):
+        """Remove whatever piece stands on sq."""
+        piece = self.squares[sq]
+
+        if piece.type != p_type.blank:
+            s = side(piece.colour)
+            mask = ~(1 << sq)
+            self.bitboards[s][piece.type] &= mask
+            self.occupied[s] &= mask
+            self.squares[sq] = BLANK
+            self.zobrist_key ^= Zobrist.PIECE_KEYS[(piece.type,
+                                                    piece.colour)][sq]
+
+            if self.attack_counts is not None:
+                self._add_piece_attacks(sq % 8, sq // 8, piece,
+                                        self.attack_counts[piece.colour], -1)
+                self._update_rays_through(sq % 8, sq // 8, 1)
+
+    def get_piece(self, x, y):
+        """Return the piece at position x, y on the board.
+
+        Returns None if indeices out of bounds
+        """
+
+        if not self.is_square(x, y):
+            return None
+
+        return self.squares[square(x, y)]
+
+    def get_piece_posns(self, piece_colour):
+        """Return the set of positions of the pieces of the passed colour."""
+
+        return posns_of(self.occupied[side(piece_colour)])
+
+    def get_king_posn(self, piece_colour):
+        """Return the position of the king of the passed colour, or None."""
+
+        king = self.bitboards[side(piece_colour)][p_type.king]
+
+        if not king:
+            return None
+
+        sq = king.bit_length() - 1
+        return (sq % 8, sq // 8)
+
+    def place_piece(self, x, y, piece_type, piece_colour):
+        """Place a piece of the passed type at the passed location.
+
+        Args:
+            - x, y:  ints specifying the position on the board to place piece
+            - type:  a member of the PieceType enum
+            - piece_colour:  a member of the PieceColour enum
+
+        Will raise IndexError if the indices are not valid.
+        """
+
+        if not self.is_square(x, y):
+            raise IndexError
+
+        sq = square(x, y)
+        self._clear_square(sq)
+
+        if piece_type != p_type.blank:
+            self._set_square(sq, PIECES[side(piece_colour)][piece_type])
+
+    def remove_piece(self, x, y):
+        """Remove the piece at the passed location.
+
+        Args:
+            - x, y:  ints specifying the position on the board to remove piece
+
+        Will raise IndexError if the indices are not valid.
+        """
+
+        if not self.is_square(x, y):
+            raise IndexError
+
+        self._clear_square(square(x, y))
+
+    def search_direction(self, x, y, up_down, left_right, no_legal=False):
+        """Move along the board in a given direction and return information.
+
+        See Board.search_direction for the meaning of the arguments and the
+        returned tuple.
+
+        """
+
+        num_squares = 0
+        found_piece = None
+        move_list = []
+
+        new_x = x + left_right
+        new_y = y + up_down
+
+        while 0 <= new_x < 8 and 0 <= new_y < 8:
+
+            piece_at_move = self.squares[square(new_x, new_y)]
+
+            if not no_legal:
+                move = Move.Move((x, y), (new_x, new_y))
+
+                if self.is_possible_valid_move(move):
+                    move_list.append(move)
+
+            if piece_at_move.type != p_type.blank:
+                found_piece = piece_at_move
+                break
+
+            num_squares += 1
+            new_x += left_right
+            new_y += up_down
+
+        return (num_squares, found_piece, move_list)
+
+    def attackers(self, sq, by_side, occupied, captured=0):
+        """Return the set of pieces of by_side which attack sq.
+
+        Args:
+            - sq:  the square number being attacked
+            - by_side:  WHITE or BLACK
+            - occupied:  bitboard of every piece on the board
+            - captured:  bitboard of pieces to ignore (e.g. a piece which is
+                         being captured by the move under test)
+
+        """
+
+        bb = self.bitboards[by_side]
+        queens = bb[p_type.queen]
+        diag_sliders = (bb[p_type.bishop] | queens) & ~captured
+        ver_hor_sliders = (bb[p_type.rook] | queens) & ~captured
+
+        found = (KNIGHT_ATTACKS[sq] & bb[p_type.knight]
+                 | KING_ATTACKS[sq] & bb[p_type.king]
+                 | PAWN_ATTACKS[1 - by_side][sq] & bb[p_type.pawn]) & ~captured
+
+        if diag_sliders & DIAG_LINES[sq]:
+            found |= slider_attacks(sq, occupied, DIAG_RAYS) & diag_sliders
+        if ver_hor_sliders & VER_HOR_LINES[sq]:
+            found |= (slider_attacks(sq, occupied, VER_HOR_RAYS)
+                      & ver_hor_sliders)
+
+        return found
+
+    def _leaves_king_safe(self, s, start, end, captured):
+        """Return true if moving side s's piece from start to end is legal.
+
+        Args:
+            - s:  the side to move
+            - start, end:  square numbers of the move
+            - captured:  bitboard of the piece removed by the move (the end
+                         square, or the en passant pawn), or 0
+
+        """
+
+        occupied = ((self.occupied[WHITE] | self.occupied[BLACK])
+                    & ~(1 << start) & ~captured) | (1 << end)
+
+        king = self.bitboards[s][p_type.king]
+
+        if king & (1 << start):
+            king_sq = end
+        elif king:
+            king_sq = king.bit_length() - 1
+        else:
+            return True
+
+        return not self.attackers(king_sq, 1 - s, occupied, captured)
+
+    ###########################################################################
+    ############################# MOVE EVALUATION #############################
+    ###########################################################################
+
+    def is_possible_move(self, move):
+        """Return True if the passed move is possible.
+
+        See Board.is_possible_move.
+
+        """
+
+        if move.castle:
+            return self.is_possible_castle_move(move)
+
+        x, y = move.end_posn
+
+        if not (0 <= x < 8 and 0 <= y < 8):
+            return False
+
+        moving = self.squares[square(*move.start_posn)]
+        target = self.squares[square(x, y)]
+
+        return target.type == p_type.blank or target.colour != moving.colour
+
+    def is_valid_move(self, move):
+        """Return true if the passed move is valid.
+
+        A move is valid if after is it made, the king of the player who made it
+        is not in check.
+
+        Args:
+            - move:  a Move object
+
+        """
+
+        if move.castle:
+            return self.is_valid_castle_move(move)
+
+        start = square(*move.start_posn)
+        end = square(*move.end_posn)
+        s = side(self.squares[start].colour)
+
+        if move.en_passant:
+            captured = 1 << square(*move.en_passant_posn)
+        else:
+            captured = self.occupied[1 - s] & (1 << end)
+
+        return self._leaves_king_safe(s, start, end, captured)
+
+    def is_take_move(self, move):
+        """Return true if the passed move is a taking move."""
+        return self.squares[square(*move.end_posn)].type != p_type.blank
+
+    ###########################################################################
+    ############################## MOVE FETCHING ##############################
+    ###########################################################################
+
+    def get_pin_info(self, piece_colour):
+        """Return the check evasion mask and the pinned pieces of a colour.
+
+        See Board.get_pin_info. The squares are given as (x, y) positions,
+        converted from the bitboards of pin_masks.
+
+        """
+
+        return self.find_pin_info(piece_colour)
+
+    def find_pin_info(self, piece_colour):
+        """Return the result of get_pin_info, computed from the board."""
+
+        s = side(piece_colour)
+        king = self.bitboards[s][p_type.king]
+
+        if not king:
+            return (None, None, {})
+
+        king_sq = king.bit_length() - 1
+        mask, pins = self.pin_masks(s)
+
+        if mask == ALL_SQUARES:
+            check_mask = None
+        else:
+            check_mask = posns_of(mask)
+
+        return ((king_sq % 8, king_sq // 8), check_mask,
+                {(sq % 8, sq // 8): posns_of(line)
+                 for sq, line in pins.items()})
+
+    def pin_masks(self, s):
+        """Return the check mask and the pinned pieces of side s.
+
+        Both are found once per position from the rays out of the king, so
+        that only king moves and en passant moves need an attackers test.
+
+        Returns: a tuple containing two pieces of information:
+            [0] The squares side s's pieces other than the king may move
+                to: every square unless the king is in check. In check it
+                is the checking piece and the squares between it and the
+                king, or no squares at all in double check.
+            [1] A dictionary mapping the square of each pinned piece to the
+                set of squares on the line from the king to the pinning
+                piece (inclusive of the pinning piece)
+
+        """
+
+        king = self.bitboards[s][p_type.king]
+
+        if not king:
+            return (ALL_SQUARES, {})
+
+        king_sq = king.bit_length() - 1
+        occupied = self.occupied[WHITE] | self.occupied[BLACK]
+        own = self.occupied[s]
+        bb = self.bitboards[1 - s]
+        queens = bb[p_type.queen]
+
+        checkers = (KNIGHT_ATTACKS[king_sq] & bb[p_type.knight]
+                    | PAWN_ATTACKS[s][king_sq] & bb[p_type.pawn])
+        check_line = 0
+        pins = {}
+
+        for rays, sliders in ((VER_HOR_RAYS, bb[p_type.rook] | queens),
+                              (DIAG_RAYS, bb[p_type.bishop] | queens)):
+            for ray_table, positive in rays:
+                ray = ray_table[king_sq]
+
+                if not ray & sliders:
+                    continue
+
+                blockers = ray & occupied
+
+                if positive:
+                    first = blockers & -blockers
+                else:
+                    first = 1 << (blockers.bit_length() - 1)
+
+                if first & sliders:
+                    checkers |= first
+                    check_line = ray ^ ray_table[first.bit_length() - 1]
+                    continue
+
+                if not first & own:
+                    continue
+
+                # A piece of side s is pinned if the next piece along the
+                # ray is an enemy slider
+                blockers ^= first
+
+                if not blockers:
+                    continue
+
+                if positive:
+                    second = (blockers & -blockers).bit_length() - 1
+                else:
+                    second = blockers.bit_length() - 1
+
+                if (1 << second) & sliders:
+                    pins[first.bit_length() - 1] = ray ^ ray_table[second]
+
+        if not checkers:
+            return (ALL_SQUARES, pins)
+        if checkers & (checkers - 1):
+            return (0, pins)
+
+        return (check_line or checkers, pins)
+
+    def _get_pin_masks(self, s, pin_info):
+        """Return pin_masks(s), or the same converted from pin_info.
+
+        Args:
+            - s:  the side
+            - pin_info:  the result of get_pin_info for the side, or None
+
+        """
+
+        if pin_info is None:
+            return self.pin_masks(s)
+
+        king_posn, check_mask, pins = pin_info
+
+        if check_mask is None:
+            mask = ALL_SQUARES
+        else:
+            mask = Tables.to_mask(check_mask)
+
+        return (mask, {square(*posn): Tables.to_mask(line)
+                       for posn, line in pins.items()})
+
+    def get_allowed_squares(self, x, y, pin_info=None):
+        """Return the squares the piece at (x, y) may move to.
+
+        See Board.get_allowed_squares.
+
+        """
+
+        start = square(x, y)
+        mask, pins = self._get_pin_masks(side(self.squares[start].colour),
+                                         pin_info)
+        allowed = mask & pins.get(start, ALL_SQUARES)
+
+        if allowed == ALL_SQUARES:
+            return None
+
+        return posns_of(allowed)
+
+    def get_piece_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for the piece at (x, y).
+
+        Given a position (x, y), return a list of moves which it is legal for
+        the piece at (x, y) to make. Note that this list is not completely
+        exhaustive: the function will not return any castle moves or en passant
+        moves.
+
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - pin_info:  the result of get_pin_info for the colour of the
+                         piece, if already known
+
+        """
+
+        codes = array("H")
+        self.add_piece_codes(x, y, codes, pin_info)
+
+        return Move.decode_all(codes)
+
+    def add_piece_codes(self, x, y, codes, pin_info=None):
+        """Append the encoded legal moves of the piece at (x, y) to codes.
+
+        See Board.add_piece_codes.
+
+        """
+
+        start = square(x, y)
+        piece = self.squares[start]
+
+        if piece.type == p_type.blank:
+            return
+
+        mask, pins = self._get_pin_masks(side(piece.colour), pin_info)
+        self._add_square_codes(start, codes, mask, pins)
+
+    def add_uncached_codes(self, x, y, piece_type, allowed, codes):
+        """Append the encoded moves of the piece at (x, y) other than a king.
+
+        See Board.add_uncached_codes.
+
+        """
+
+        start = square(x, y)
+        s = side(self.squares[start].colour)
+        targets = self.get_targets(start, piece_type, s)
+
+        if allowed is not None:
+            targets &= Tables.to_mask(allowed)
+
+        self._add_target_codes(start, piece_type, targets,
+                               self.occupied[1 - s], codes)
+
+    def get_legal_moves(self, piece_colour):
+        """Return a list of the legal moves of every piece of a colour.
+
+        See Board.get_legal_moves.
+
+        """
+
+        return Move.decode_all(self.get_move_codes(piece_colour))
+
+    def get_move_codes(self, piece_colour):
+        """Return an array('H') of the encoded legal moves of a colour.
+
+        See Board.get_move_codes.
+
+        """
+
+        s = side(piece_colour)
+        mask, pins = self.pin_masks(s)
+        codes = array("H")
+        king = self.bitboards[s][p_type.king]
+
+        if king:
+            self._add_king_codes(king.bit_length() - 1, s, codes)
+
+        self._add_side_codes(s, mask, pins, codes)
+
+        return codes
+
+    def get_evasion_codes(self, piece_colour, pin_info=None):
+        """Return an array('H') of the encoded legal moves of a colour whose
+        king is in check.
+
+        See Board.get_evasion_codes. Every piece is still tried, but only
+        moves onto the check mask are generated for pieces other than the
+        king.
+
+        """
+
+        s = side(piece_colour)
+        mask, pins = self._get_pin_masks(s, pin_info)
+
+        if mask == ALL_SQUARES:
+            return self.get_move_codes(piece_colour)
+
+        codes = array("H")
+        king = self.bitboards[s][p_type.king]
+        self._add_king_codes(king.bit_length() - 1, s, codes)
+        self._add_side_codes(s, mask, pins, codes)
+
+        return codes
+
+    def add_interposition_codes(self, square, piece_colour, pins, codes):
+        """Append the encoded moves of pieces other than the king to square.
+
+        See Board.add_interposition_codes.
+
+        """
+
+        end = Tables.square(*square)
+        s = side(piece_colour)
+        enemy = self.occupied[1 - s]
+        pinned = Tables.to_mask(pins)
+        bit = 1 << end
+
+        for start in squares_of(self.occupied[s] & ~pinned):
+            piece_type = self.squares[start].type
+
+            if (piece_type != p_type.king
+                    and self.get_targets(start, piece_type, s) & bit):
+                self._add_target_codes(start, piece_type, bit, enemy, codes)
+
+    def evasion_mask(self, s):
+        """Return the squares side s's pieces other than the king may move to.
+
+        This is every square unless the king is in check. In check it is
+        the checking piece and the squares between it and the king, or no
+        squares at all in double check.
+
+        """
+
+        return self.pin_masks(s)[0]
+
+    def iter_piece_codes(self, piece_colour):
+        """Yield an array('H') of encoded legal moves for each piece in turn.
+
+        See Board.iter_piece_codes.
+
+        """
+
+        s = side(piece_colour)
+        mask, pins = self.pin_masks(s)
+
+        for sq in squares_of(self.occupied[s]):
+            codes = array("H")
+            self._add_square_codes(sq, codes, mask, pins)
+            yield codes
+
+    def get_king_moves(self, x, y):
+        """Return a list of available moves for a king at (x, y).
+
+        See Board.get_king_moves.
+
+        """
+
+        codes = array("H")
+        self.add_king_codes(x, y, codes)
+
+        return Move.decode_all(codes)
+
+    def get_queen_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a queen at (x, y).
+
+        See Board.get_queen_moves.
+
+        """
+
+        return self._get_type_moves(x, y, p_type.queen, pin_info)
+
+    def get_bishop_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a bishop at (x, y).
+
+        See Board.get_bishop_moves.
+
+        """
+
+        return self._get_type_moves(x, y, p_type.bishop, pin_info)
+
+    def get_knight_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a knight at (x, y).
+
+        See Board.get_knight_moves.
+
+        """
+
+        return self._get_type_moves(x, y, p_type.knight, pin_info)
+
+    def get_rook_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a rook at (x, y).
+
+        See Board.get_rook_moves.
+
+        """
+
+        return self._get_type_moves(x, y, p_type.rook, pin_info)
+
+    def get_pawn_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a pawn at (x, y).
+
+        Given a position (x, y) returns a list of moves which it is legal for
+        a pawn at (x, y) to make, excluding en passant moves. A move to the
+        last rank is returned once for each piece in Board.PROMOTION_PIECES.
+
+        """
+
+        return self._get_type_moves(x, y, p_type.pawn, pin_info)
+
+    def _get_type_moves(self, x, y, piece_type, pin_info):
+        """Return the legal moves from (x, y) of a piece of piece_type."""
+
+        start = square(x, y)
+        s = side(self.squares[start].colour)
+        mask, pins = self._get_pin_masks(s, pin_info)
+        targets = (self.get_targets(start, piece_type, s) & mask
+                   & pins.get(start, ALL_SQUARES))
+        codes = array("H")
+        self._add_target_codes(start, piece_type, targets,
+                               self.occupied[1 - s], codes)
+
+        return Move.decode_all(codes)
+
+    def add_king_codes(self, x, y, codes):
+        """Append the encoded moves of a king at (x, y) to codes.
+
+        See Board.add_king_codes.
+
+        """
+
+        start = square(x, y)
+        self._add_king_codes(start, side(self.squares[start].colour), codes)
+
+    def add_slider_codes(self, x, y, directions, allowed, codes):
+        """Append the encoded moves along directions from (x, y) to codes."""
+
+        start = square(x, y)
+        s = side(self.squares[start].colour)
+        rays = [(Tables.RAY_MASKS[dirn], Tables.is_positive(dirn))
+                for dirn in directions]
+        targets = (slider_attacks(start, self.occupied[WHITE]
+                                  | self.occupied[BLACK], rays)
+                   & ~self.occupied[s])
+
+        if allowed is not None:
+            targets &= Tables.to_mask(allowed)
+
+        self._add_target_codes(start, p_type.queen, targets,
+                               self.occupied[1 - s], codes)
+
+    def add_knight_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a knight at (x, y) to codes."""
+        self.add_uncached_codes(x, y, p_type.knight, allowed, codes)
+
+    def add_pawn_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a pawn at (x, y) to codes."""
+        self.add_uncached_codes(x, y, p_type.pawn, allowed, codes)
+
+    def _add_square_codes(self, start, codes, mask, pins):
+        """Append the encoded legal moves of the piece on start to codes.
+
+        Unless the piece is a king, only moves to squares in mask and, if
+        the piece is pinned, along its pin line are considered (see
+        pin_masks), so no move needs to be tested.
+
+        """
+
+        piece = self.squares[start]
+
+        if piece.type == p_type.blank:
+            return
+
+        s = side(piece.colour)
+
+        if piece.type == p_type.king:
+            self._add_king_codes(start, s, codes)
+            return
+
+        targets = self.get_targets(start, piece.type, s) & mask
+        pin_line = pins.get(start)
+
+        if pin_line is not None:
+            targets &= pin_line
+
+        self._add_target_codes(start, piece.type, targets,
+                               self.occupied[1 - s], codes)
+
+    def _add_side_codes(self, s, mask, pins, codes):
+        """Append the encoded legal moves of side s's pieces other than the
+        king to codes.
+
+        Moves are generated a piece type at a time, and pawn moves a whole
+        bitboard at a time. Only moves onto mask are generated, and pinned
+        pieces are left to _add_square_codes.
+
+        Args:
+            - s:  the side to move
+            - mask, pins:  as returned by pin_masks(s)
+            - codes:  an array('H') to append the codes to
+
+        """
+
+        bb = self.bitboards[s]
+        enemy = self.occupied[1 - s]
+        occupied = self.occupied[s] | enemy
+        quiet = mask & ~occupied
+        captures = mask & enemy
+        pinned = 0
+
+        for sq in pins:
+            pinned |= 1 << sq
+            self._add_square_codes(sq, codes, mask, pins)
+
+        for piece_type in (p_type.knight, p_type.bishop, p_type.rook,
+                           p_type.queen):
+            pieces = bb[piece_type] & ~pinned
+
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                start = low.bit_length() - 1
+
+                if piece_type == p_type.knight:
+                    targets = KNIGHT_ATTACKS[start]
+                elif piece_type == p_type.bishop:
+                    targets = slider_attacks(start, occupied, DIAG_RAYS)
+                elif piece_type == p_type.rook:
+                    targets = slider_attacks(start, occupied, VER_HOR_RAYS)
+                else:
+                    targets = (slider_attacks(start, occupied, DIAG_RAYS)
+                               | slider_attacks(start, occupied,
+                                                VER_HOR_RAYS))
+
+                for end in squares_of(targets & captures):
+                    codes.append(start | end << 6 | Board.CAPTURE_FLAG)
+                for end in squares_of(targets & quiet):
+                    codes.append(start | end << 6)
+
+        # Each pawn move comes from the square one step back from its end
+        pawns = bb[p_type.pawn] & ~pinned
+        step, double_rank, capture_steps = PAWN_STEPS[s]
+
+        one = shift(pawns, step) & ~occupied
+        two = shift(one & double_rank, step) & quiet
+        one &= mask
+
+        for end in squares_of(one & ~LAST_RANKS):
+            codes.append(end - step | end << 6)
+        for end in squares_of(one & LAST_RANKS):
+            Board.add_pawn_code(codes, end - step | end << 6)
+        for end in squares_of(two):
+            codes.append(end - 2 * step | end << 6 | Board.DOUBLE_PUSH_FLAG)
+
+        for capture_step, can_capture in capture_steps:
+            for end in squares_of(shift(pawns & can_capture, capture_step)
+                                  & captures):
+                Board.add_pawn_code(codes, end - capture_step | end << 6
+                                    | Board.CAPTURE_FLAG)
+
+    def _add_king_codes(self, start, s, codes):
+        """Append the encoded moves of side s's king on start to codes.
+
+        Each destination is tested with attackers, with the king taken out
+        of the occupancy so that the squares behind it on a checking line
+        are seen to be attacked.
+
+        """
+
+        enemy = self.occupied[1 - s]
+        occupied = ((self.occupied[WHITE] | self.occupied[BLACK])
+                    & ~(1 << start))
+
+        for end in squares_of(KING_ATTACKS[start] & ~self.occupied[s]):
+            if not self.attackers(end, 1 - s, occupied):
+                if enemy & (1 << end):
+                    codes.append(start | end << 6 | Board.CAPTURE_FLAG)
+                else:
+                    codes.append(start | end << 6)
+
+    def _add_target_codes(self, start, piece_type, targets, enemy, codes):
+        """Append the encoded moves from start to each square of targets.
+
+        Args:
+            - start:  the square number of the piece
+            - piece_type:  the type of the piece, which is not a king
+            - targets:  bitboard of the squares it moves to
+            - enemy:  bitboard of the pieces it may capture
+            - codes:  an array('H') to append the codes to
+
+        """
+
+        if piece_type != p_type.pawn:
+            for end in squares_of(targets):
+                if enemy & (1 << end):
+                    codes.append(start | end << 6 | Board.CAPTURE_FLAG)
+                else:
+                    codes.append(start | end << 6)
+            return
+
+        for end in squares_of(targets):
+            if enemy & (1 << end):
+                Board.add_pawn_code(codes,
+                                    start | end << 6 | Board.CAPTURE_FLAG)
+            elif abs(end - start) == 16:
+                codes.append(start | end << 6 | Board.DOUBLE_PUSH_FLAG)
+            else:
+                Board.add_pawn_code(codes, start | end << 6)
+
+    def get_targets(self, sq, piece_type, s):
+        """Return the set of squares the piece on sq can pseudo-legally reach.
+
+        Castling and en passant are not included, and the result does not
+        account for whether the move would leave the king in check.
+
+        """
+
+        occupied = self.occupied[WHITE] | self.occupied[BLACK]
+        own = self.occupied[s]
+
+        if piece_type == p_type.knight:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if piece_type == p_type.king:
+            return KING_ATTACKS[sq] & ~own
+        if piece_type == p_type.bishop:
+            return slider_attacks(sq, occupied, DIAG_RAYS) & ~own
+        if piece_type == p_type.rook:
+            return slider_attacks(sq, occupied, VER_HOR_RAYS) & ~own
+        if piece_type == p_type.queen:
+            return (slider_attacks(sq, occupied, DIAG_RAYS)
+                    | slider_attacks(sq, occupied, VER_HOR_RAYS)) & ~own
+
+        # Pawns
+        empty = ~occupied & ALL_SQUARES
+        targets = PAWN_ATTACKS[s][sq] & self.occupied[1 - s]
+
+        if s == WHITE:
+            one = (1 << sq) >> 8 & empty
+            targets |= one
+            if sq // 8 == 6:
+                targets |= one >> 8 & empty
+        else:
+            one = (1 << sq) << 8 & empty
+            targets |= one
+            if sq // 8 == 1:
+                targets |= one << 8 & empty
+
+        return targets
+
+    ###########################################################################
+    ############################ BOARD EVALUATION #############################
+    ###########################################################################
+
+    def is_in_check(self, piece_colour):
+        """Return true if the king of the passed colour is in check.
+
+        Note that if no king of the passed colour is found, this function will
+        return false.
+
+        Args:
+            piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        s = side(piece_colour)
+        king = self.bitboards[s][p_type.king]
+
+        if not king:
+            return False
+
+        return bool(self.attackers(king.bit_length() - 1, 1 - s,
+                                   self.occupied[WHITE]
+                                   | self.occupied[BLACK]))
+
+    def is_square_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        See Board.is_square_attacked.
+
+        """
+
+        if self.attack_counts is not None:
+            return self.attack_counts[by_colour][y * 8 + x] > 0
+
+        return bool(self.attackers(square(x, y), side(by_colour),
+                                   self.occupied[WHITE]
+                                   | self.occupied[BLACK]))
+
+    def scan_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        See Board.scan_attacked.
+
+        """
+
+        return bool(self.attackers(square(x, y), side(by_colour),
+                                   self.occupied[WHITE]
+                                   | self.occupied[BLACK]))
+
+    def is_castle_path_empty(self, y, king_side):
+        """Return true if no piece stands between king and rook on rank y.
+
+        See Board.is_castle_path_empty.
+
+        """
+
+        path = CASTLE_PATHS[BLACK if y == 0 else WHITE][king_side]
+
+        return not (self.occupied[WHITE] | self.occupied[BLACK]) & path
+
+    def has_any_legal_move(self, piece_colour):
+        """Return true if the team of the passed colour can make a legal move.
+
+        See Board.has_any_legal_move.
+
+        """
+
+        s = side(piece_colour)
+        mask, pins = self.pin_masks(s)
+        king = self.bitboards[s][p_type.king]
+
+        # The king, whose moves are the slowest to test, is tried last
+        for start in squares_of(self.occupied[s] & ~king):
+            targets = (self.get_targets(start, self.squares[start].type, s)
+                       & mask & pins.get(start, ALL_SQUARES))
+
+            if targets:
+                return True
+
+        if king:
+            codes = array("H")
+            self._add_king_codes(king.bit_length() - 1, s, codes)
+            return len(codes) > 0
+
+        return False
+
+    def count_legal_moves(self, piece_colour):
+        """Return the number of legal moves the passed colour can make.
+
+        See Board.count_legal_moves. As in _add_side_codes, the moves of
+        unpinned pawns are counted a whole bitboard at a time.
+
+        """
+
+        s = side(piece_colour)
+        mask, pins = self.pin_masks(s)
+        bb = self.bitboards[s]
+        enemy = self.occupied[1 - s]
+        empty = ~(self.occupied[s] | enemy)
+        pawns = bb[p_type.pawn]
+        count = 0
+        promotions = 0
+
+        for start in squares_of(self.occupied[s] & ~bb[p_type.king]):
+            piece_type = self.squares[start].type
+
+            # Unpinned pawns are counted together below
+            if piece_type == p_type.pawn and start not in pins:
+                continue
+
+            targets = (self.get_targets(start, piece_type, s) & mask
+                       & pins.get(start, ALL_SQUARES))
+            count += count_of(targets)
+
+            if piece_type == p_type.pawn:
+                pawns ^= 1 << start
+                promotions += count_of(targets & LAST_RANKS)
+
+        step, double_rank, capture_steps = PAWN_STEPS[s]
+        pushes = shift(pawns, step) & empty
+        count += count_of(shift(pushes & double_rank, step) & empty & mask)
+
+        for targets in ([pushes & mask]
+                        + [shift(pawns & can_capture, capture_step)
+                           & enemy & mask
+                           for capture_step, can_capture in capture_steps]):
+            count += count_of(targets)
+            promotions += count_of(targets & LAST_RANKS)
+
+        # Each promoting move is counted once per promotion piece
+        count += (len(Board.PROMOTION_PIECES) - 1) * promotions
+
+        if bb[p_type.king]:
+            codes = array("H")
+            self._add_king_codes(bb[p_type.king].bit_length() - 1, s, codes)
+            count += len(codes)
+
+        return count
+
+    def is_king_draw(self):
+        """Return true if the Kings are the only pieces left on the board."""
+        kings = (self.bitboards[WHITE][p_type.king]
+                 | self.bitboards[BLACK][p_type.king])
+
+        return (self.occupied[WHITE] | self.occupied[BLACK]) == kings
+
+    def can_promote_pawn(self, piece_colour):
+        """Return true if the player of passed colour can promote a pawn."""
+
+        if (piece_colour == Colour.white):
+            rank = RANKS[0]
+        else:
+            rank = RANKS[7]
+
+        pawns = (self.bitboards[WHITE][p_type.pawn]
+                 | self.bitboards[BLACK][p_type.pawn])
+
+        return bool(pawns & rank)
@@ -1,13 +1,67 @@
 """Contains the Board class"""
 
-import copy
-import itertools
+from array import array
 import Piece
 import Move
+import Tables
+import Zobrist
 from Piece import PieceType as p_type
 from Piece import PieceColour as Colour
-# Tkinter graphics package
-from tkinter import *
+
+
+CAPTURE_FLAG = Move.CAPTURE << Move.FLAG_SHIFT
+DOUBLE_PUSH_FLAG = Move.DOUBLE_PAWN_PUSH << Move.FLAG_SHIFT
+
+# A pawn reaching the last rank makes one move for each piece it may be
+# promoted to, in this order (queen first, so that it is found first)
+PROMOTION_PIECES = (p_type.queen, p_type.knight, p_type.rook, p_type.bishop)
+PROMOTION_FLAGS = tuple(
+    (Move.PROMOTION | Move.PROMOTION_TYPES.index(piece_type))
+    << Move.FLAG_SHIFT for piece_type in PROMOTION_PIECES)
+
+
+def add_pawn_code(codes, code):
+    """Append the code of a pawn move to codes.
+
+    If the pawn reaches the last rank, one promotion code is appended for
+    each piece it may become instead.
+
+    """
+
+    end = (code >> 6) & 63
+
+    if end < 8 or end >= 56:
+        for flag in PROMOTION_FLAGS:
+            codes.append(code | flag)
+    else:
+        codes.append(code)
+
+# The files which must be empty to castle King's side (True) or Queen's side
+# (False), and the steps from the king's file to the squares which must not
+# be attacked. The king's own square is included, as it may not castle out
+# of check. The b file square must be empty to castle Queen's side, but it
+# may be attacked, as the king does not pass through it.
+CASTLE_EMPTY_FILES = {True: (5, 6), False: (1, 2, 3)}
+CASTLE_SAFE_STEPS = {True: (0, 1, 2), False: (0, -1, -2)}
+
+# Snapshots (and MailboxBoard) store each piece as a small integer code: its
+# PieceType value, with BLACK_CODE added for black pieces.
+BLACK_CODE = 8
+
+
+def piece_code(piece_type, colour):
+    """Return the code of a piece of the passed type and colour."""
+    if piece_type == p_type.blank:
+        return 0
+    if colour == Colour.black:
+        return piece_type + BLACK_CODE
+    return piece_type
+
+
+# The shared Piece for each code
+CODE_PIECES = {0: Piece.BLANK}
+for _piece in Piece.PIECES.values():
+    CODE_PIECES[piece_code(_piece.type, _piece.colour)] = _piece
 
 
 class Board:
@@ -16,20 +70,44 @@ class Board:
 
     Attributes:
         - piece_array:  a 2d list of pieces
+        - king_posns:  a dictionary mapping each colour to the position of
+                       its king (or None if it has no king)
+        - piece_posns:  a dictionary mapping each colour to the set of
+                        positions of its pieces (including the king)
+        - zobrist_key:  a 64 bit hash of the pieces on the board (see the
+                        Zobrist module)
+        - attack_counts:  None, unless enable_attack_maps has been called,
+                          in which case a dictionary mapping each colour to
+                          a list of the number of its pieces attacking each
+                          square (numbered as in the Tables module)
+        - move_cache:  None, unless enable_move_cache has been called, in
+                       which case a dictionary mapping the square number of
+                       each piece other than a king to the array('H') of
+                       its legal moves when the king is not in check. A
+                       square with no entry is dirty.
+        - pin_cache:  if move_cache is not None, a dictionary mapping each
+                      colour to the result of get_pin_info for it, emptied
+                      whenever the board changes
+
+    piece_array, king_posns, piece_posns, zobrist_key, attack_counts and
+    move_cache are kept consistent by place_piece and remove_piece, which
+    every change to the board goes through.
 
     """
 
     SIZE = 8
+    # The name of this backend, as passed to make_board
+    BACKEND = "array"
     FILE_LABELS = ["a", "b", "c", "d", "e", "f", "g", "h"]
 
+    attack_counts = None
+    move_cache = None
+    pin_cache = None
+
     def __init__(self):
         """Create clear board."""
         self.clear()
 
-        self.ver_hor_list = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-
-        self.diag_list = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-
     def draw_board(self, canvas):
         """Draw the current state of the board on a canvas.
 
@@ -57,68 +135,148 @@ class Board:
         sq_width = int(canvas["width"])/8
 
         # draw all pieces on the board
-        for i in range(8):
-            for j in range(8):
+        for posns in self.piece_posns.values():
+            for i, j in posns:
 
                 self.piece_array[i][j].draw(canvas, i*sq_width, j*sq_width)
 
     def copy(self):
-        return copy.deepcopy(self)
+        """Return an independent copy of the board.
+
+        Pieces are immutable and shared, so only the containers holding
+        them are copied.
+
+        """
+
+        board = Board.__new__(Board)
+        board.piece_array = [column[:] for column in self.piece_array]
+        board.king_posns = dict(self.king_posns)
+        board.piece_posns = {colour: set(posns)
+                             for colour, posns in self.piece_posns.items()}
+        board.zobrist_key = self.zobrist_key
+
+        if self.attack_counts is not None:
+            board.attack_counts = {colour: counts[:] for colour, counts
+                                   in self.attack_counts.items()}
+
+        # The cached arrays are never changed, so they can be shared
+        if self.move_cache is not None:
+            board.move_cache = dict(self.move_cache)
+            board.pin_cache = dict(self.pin_cache)
+
+        return board
+
+    def snapshot(self):
+        """Return an immutable encoding of the pieces on the board.
+
+        The snapshot is a bytes object holding the code (see piece_code) of
+        the piece on each of the 64 squares, numbered as in the Tables
+        module. It can be passed to restore on a board of any backend.
+
+        """
+
+        codes = bytearray(Board.SIZE * Board.SIZE)
+        piece_array = self.piece_array
+
+        for posns in self.piece_posns.values():
+            for x, y in posns:
+                piece = piece_array[x][y]
+                codes[y * 8 + x] = piece_code(piece.type, piece.colour)
+
+        return bytes(codes)
+
+    def restore(self, snapshot):
+        """Set the pieces on the board to those of a snapshot."""
+
+        self.clear()
+
+        piece_array = self.piece_array
+        piece_posns = self.piece_posns
+        key = 0
+
+        for sq, sq_code in enumerate(snapshot):
+            if sq_code:
+                piece = CODE_PIECES[sq_code]
+                x = sq % 8
+                y = sq // 8
+
+                piece_array[x][y] = piece
+                piece_posns[piece.colour].add((x, y))
+                key ^= Zobrist.PIECE_KEYS[(piece.type, piece.colour)][sq]
+
+                if piece.type == p_type.king:
+                    self.king_posns[piece.colour] = (x, y)
+
+        self.zobrist_key = key
+
+        if self.attack_counts is not None:
+            self.enable_attack_maps()
 
     def clear(self):
         """Initialise piece_array as an 8 x 8 array of blank pieces."""
-        self.piece_array = [[Piece.Piece() for i in range(Board.SIZE)]
+        self.piece_array = [[Piece.BLANK] * Board.SIZE
                             for i in range(Board.SIZE)]
+        self.king_posns = {Colour.white: None, Colour.black: None}
+        self.piece_posns = {Colour.white: set(), Colour.black: set()}
+        self.zobrist_key = 0
+
+        if self.attack_counts is not None:
+            self.attack_counts = {Colour.white: [0] * 64,
+                                  Colour.black: [0] * 64}
+
+        if self.move_cache is not None:
+            self.move_cache = {}
+            self.pin_cache = {}
 
     def setup(self):
         """Set the board to the arrangement for the beginning of a game."""
 
         self.clear()
         for x in range(Board.SIZE):
-            self.piece_array[x][1] = Piece.Pawn(Colour.black)
-            self.piece_array[x][6] = Piece.Pawn(Colour.white)
-
-        self.piece_array[0][0] = Piece.Rook(Colour.black)
-        self.piece_array[7][0] = Piece.Rook(Colour.black)
-        self.piece_array[1][0] = Piece.Knight(Colour.black)
-        self.piece_array[6][0] = Piece.Knight(Colour.black)
-        self.piece_array[2][0] = Piece.Bishop(Colour.black)
-        self.piece_array[5][0] = Piece.Bishop(Colour.black)
-        self.piece_array[3][0] = Piece.Queen(Colour.black)
-        self.piece_array[4][0] = Piece.King(Colour.black)
-
-        self.piece_array[0][7] = Piece.Rook(Colour.white)
-        self.piece_array[7][7] = Piece.Rook(Colour.white)
-        self.piece_array[1][7] = Piece.Knight(Colour.white)
-        self.piece_array[6][7] = Piece.Knight(Colour.white)
-        self.piece_array[2][7] = Piece.Bishop(Colour.white)
-        self.piece_array[5][7] = Piece.Bishop(Colour.white)
-        self.piece_array[3][7] = Piece.Queen(Colour.white)
-        self.piece_array[4][7] = Piece.King(Colour.white)
+            self.place_piece(x, 1, p_type.pawn, Colour.black)
+            self.place_piece(x, 6, p_type.pawn, Colour.white)
+
+        self.place_piece(0, 0, p_type.rook, Colour.black)
+        self.place_piece(7, 0, p_type.rook, Colour.black)
+        self.place_piece(1, 0, p_type.knight, Colour.black)
+        self.place_piece(6, 0, p_type.knight, Colour.black)
+        self.place_piece(2, 0, p_type.bishop, Colour.black)
+        self.place_piece(5, 0, p_type.bishop, Colour.black)
+        self.place_piece(3, 0, p_type.queen, Colour.black)
+        self.place_piece(4, 0, p_type.king, Colour.black)
+
+        self.place_piece(0, 7, p_type.rook, Colour.white)
+        self.place_piece(7, 7, p_type.rook, Colour.white)
+        self.place_piece(1, 7, p_type.knight, Colour.white)
+        self.place_piece(6, 7, p_type.knight, Colour.white)
+        self.place_piece(2, 7, p_type.bishop, Colour.white)
+        self.place_piece(5, 7, p_type.bishop, Colour.white)
+        self.place_piece(3, 7, p_type.queen, Colour.white)
+        self.place_piece(4, 7, p_type.king, Colour.white)
 
     def test_setup(self):
 
         for x in range(Board.SIZE):
-            self.piece_array[x][1] = Piece.Pawn(Colour.black)
-            self.piece_array[x][6] = Piece.Pawn(Colour.white)
-
-        self.piece_array[0][0] = Piece.Rook(Colour.black)
-        self.piece_array[7][3] = Piece.Rook(Colour.black)
-        self.piece_array[1][4] = Piece.Knight(Colour.black)
-        self.piece_array[6][7] = Piece.Knight(Colour.black)
-        self.piece_array[2][1] = Piece.Bishop(Colour.black)
-        self.piece_array[5][0] = Piece.Bishop(Colour.black)
-        self.piece_array[3][2] = Piece.Queen(Colour.black)
-        self.piece_array[4][0] = Piece.King(Colour.black)
-
-        self.piece_array[0][4] = Piece.Rook(Colour.white)
-        self.piece_array[7][7] = Piece.Rook(Colour.white)
-        self.piece_array[1][7] = Piece.Knight(Colour.white)
-        self.piece_array[6][5] = Piece.Knight(Colour.white)
-        self.piece_array[2][7] = Piece.Bishop(Colour.white)
-        self.piece_array[5][5] = Piece.Bishop(Colour.white)
-        self.piece_array[3][6] = Piece.Queen(Colour.white)
-        self.piece_array[4][2] = Piece.King(Colour.white)
+            self.place_piece(x, 1, p_type.pawn, Colour.black)
+            self.place_piece(x, 6, p_type.pawn, Colour.white)
+
+        self.place_piece(0, 0, p_type.rook, Colour.black)
+        self.place_piece(7, 3, p_type.rook, Colour.black)
+        self.place_piece(1, 4, p_type.knight, Colour.black)
+        self.place_piece(6, 7, p_type.knight, Colour.black)
+        self.place_piece(2, 1, p_type.bishop, Colour.black)
+        self.place_piece(5, 0, p_type.bishop, Colour.black)
+        self.place_piece(3, 2, p_type.queen, Colour.black)
+        self.place_piece(4, 0, p_type.king, Colour.black)
+
+        self.place_piece(0, 4, p_type.rook, Colour.white)
+        self.place_piece(7, 7, p_type.rook, Colour.white)
+        self.place_piece(1, 7, p_type.knight, Colour.white)
+        self.place_piece(6, 5, p_type.knight, Colour.white)
+        self.place_piece(2, 7, p_type.bishop, Colour.white)
+        self.place_piece(5, 5, p_type.bishop, Colour.white)
+        self.place_piece(3, 6, p_type.queen, Colour.white)
+        self.place_piece(4, 2, p_type.king, Colour.white)
 
 
     def make_move(self, move):
@@ -138,9 +296,14 @@ class Board:
 
         piece = self.piece_array[move.start_posn[0]][move.start_posn[1]]
 
+        if move.promotion is None:
+            piece_type = piece.type
+        else:
+            piece_type = move.promotion
+
         self.remove_piece(*move.start_posn)
         self.place_piece(move.end_posn[0], move.end_posn[1],
-                         piece.type, piece.colour)
+                         piece_type, piece.colour)
 
     def takeback_move(self, move, taken_piece):
 
@@ -162,9 +325,14 @@ class Board:
 
         
 
+        if move.promotion is None:
+            piece_type = piece.type
+        else:
+            piece_type = p_type.pawn
+
         self.remove_piece(*move.end_posn)
         self.place_piece(move.start_posn[0], move.start_posn[1],
-                         piece.type, piece.colour)
+                         piece_type, piece.colour)
 
         if taken_piece is not None:
 
@@ -180,7 +348,7 @@ class Board:
             - move: a move object which is a castling move.
         """
 
-        piece = self.piece_array[move.start_posn[0]][move.start_posn[1]]
+        piece = self.get_piece(*move.start_posn)
         col = piece.colour
 
         # If king is moving to the right
@@ -204,7 +372,8 @@ class Board:
 
     def takeback_castle(self, move):
 
-        piece = self.piece_array[move.start_posn[0]][move.start_posn[1]]
+        # The king has already castled, so it stands on the end square
+        piece = self.get_piece(*move.end_posn)
         col = piece.colour
 
         # If king is moving to the right
@@ -243,8 +412,10 @@ class Board:
         else:
             y = 7
 
+        pawn = Piece.make_piece(p_type.pawn, piece_colour)
+
         for i in range(Board.SIZE):
-            if self.piece_array[i][y] == Piece.Pawn(piece_colour):
+            if self.get_piece(i, y) == pawn:
                 self.place_piece(i, y, piece_type, piece_colour)
                 break
         else:
@@ -275,6 +446,24 @@ class Board:
 
         return piece
 
+    def get_piece_posns(self, piece_colour):
+        """Return the set of positions of the pieces of the passed colour.
+
+        The set is owned by the board, so copy it before making moves while
+        iterating over it.
+
+        """
+
+        return self.piece_posns[piece_colour]
+
+    def get_king_posn(self, piece_colour):
+        """Return the position of the king of the passed colour, or None."""
+        return self.king_posns[piece_colour]
+
+    def get_hash(self):
+        """Return the 64 bit Zobrist hash of the pieces on the board."""
+        return self.zobrist_key
+
     def place_piece(self, x, y, piece_type, piece_colour):
         """Place a piece of the passed type at the passed location.
 
@@ -286,7 +475,27 @@ class Board:
         Will raise IndexError if the indices are not valid.
         """
 
+        self.remove_piece(x, y)
+
+        if piece_type == p_type.blank:
+            return
+
         self.piece_array[x][y] = Piece.make_piece(piece_type, piece_colour)
+        self.piece_posns[piece_colour].add((x, y))
+        self.zobrist_key ^= Zobrist.PIECE_KEYS[(piece_type, piece_colour)][
+            y * 8 + x]
+
+        if piece_type == p_type.king:
+            self.king_posns[piece_colour] = (x, y)
+
+        if self.attack_counts is not None:
+            piece = self.piece_array[x][y]
+            self._add_piece_attacks(x, y, piece,
+                                    self.attack_counts[piece_colour], 1)
+            self._update_rays_through(x, y, -1)
+
+        if self.move_cache is not None:
+            self._dirty_moves_near(x, y)
 
     def remove_piece(self, x, y):
         """Remove the piece at the passed location.
@@ -297,7 +506,183 @@ class Board:
         Will raise IndexError if the indices are not valid.
         """
 
-        self.piece_array[x][y] = Piece.Piece()
+        piece = self.piece_array[x][y]
+
+        if piece.type == p_type.blank:
+            return
+
+        self.piece_array[x][y] = Piece.BLANK
+        self.piece_posns[piece.colour].discard((x, y))
+        self.zobrist_key ^= Zobrist.PIECE_KEYS[(piece.type, piece.colour)][
+            y * 8 + x]
+
+        if self.king_posns[piece.colour] == (x, y):
+            self.king_posns[piece.colour] = None
+
+        if self.attack_counts is not None:
+            self._add_piece_attacks(x, y, piece,
+                                    self.attack_counts[piece.colour], -1)
+            self._update_rays_through(x, y, 1)
+
+        if self.move_cache is not None:
+            self._dirty_moves_near(x, y)
+
+    def enable_attack_maps(self):
+        """Start keeping attack_counts up to date as the board changes.
+
+        This makes every change to the board slower, but lets
+        is_square_attacked (and so is_in_check) answer in O(1). The maps
+        are built and kept up to date through get_piece_posns and
+        get_piece, so that every backend can keep them.
+
+        """
+
+        self.attack_counts = {Colour.white: [0] * 64, Colour.black: [0] * 64}
+
+        for colour, counts in self.attack_counts.items():
+            for i, j in self.get_piece_posns(colour):
+                self._add_piece_attacks(i, j, self.get_piece(i, j), counts, 1)
+
+    def disable_attack_maps(self):
+        """Stop keeping attack_counts up to date."""
+        self.attack_counts = None
+
+    def get_attack_counts(self, piece_colour):
+        """Return a list of the number of pieces of the passed colour
+        attacking each square (numbered as in the Tables module).
+
+        The list is owned by the board if attack maps are enabled, otherwise
+        it is computed from scratch.
+
+        """
+
+        if self.attack_counts is not None:
+            return self.attack_counts[piece_colour]
+
+        counts = [0] * 64
+
+        for i, j in self.get_piece_posns(piece_colour):
+            self._add_piece_attacks(i, j, self.get_piece(i, j), counts, 1)
+
+        return counts
+
+    def _add_piece_attacks(self, x, y, piece, counts, delta):
+        """Add delta to counts for each square attacked by piece at (x, y)."""
+
+        sq = y * 8 + x
+
+        if piece.type == p_type.pawn:
+            targets = Tables.PAWN_ATTACK_SQUARES[piece.colour][sq]
+        elif piece.type == p_type.knight:
+            targets = Tables.KNIGHT_SQUARES[sq]
+        elif piece.type == p_type.king:
+            targets = Tables.KING_SQUARES[sq]
+        else:
+            get_piece = self.get_piece
+
+            if piece.type == p_type.rook:
+                directions = Tables.VER_HOR_DIRECTIONS
+            elif piece.type == p_type.bishop:
+                directions = Tables.DIAG_DIRECTIONS
+            else:
+                directions = Tables.DIRECTIONS
+
+            for dirn in directions:
+                for i, j in Tables.RAYS[dirn][sq]:
+                    counts[j * 8 + i] += delta
+                    if get_piece(i, j).type != p_type.blank:
+                        break
+            return
+
+        for i, j in targets:
+            counts[j * 8 + i] += delta
+
+    def _update_rays_through(self, x, y, delta):
+        """Update the attacks of sliders whose rays pass through (x, y).
+
+        When a piece is placed on (x, y), each slider attacking the square
+        no longer attacks the squares behind it (delta = -1), and when a
+        piece is removed it attacks them again (delta = 1). Only these rays
+        are visited.
+
+        """
+
+        get_piece = self.get_piece
+        sq = y * 8 + x
+
+        for dirn in Tables.DIRECTIONS:
+            for i, j in Tables.RAYS[dirn][sq]:
+                slider = get_piece(i, j)
+                if slider.type != p_type.blank:
+                    break
+            else:
+                continue
+
+            if slider.type == p_type.queen:
+                pass
+            elif slider.type == p_type.rook:
+                if dirn not in Tables.VER_HOR_DIRECTIONS:
+                    continue
+            elif slider.type == p_type.bishop:
+                if dirn not in Tables.DIAG_DIRECTIONS:
+                    continue
+            else:
+                continue
+
+            counts = self.attack_counts[slider.colour]
+
+            # The squares behind (x, y) as seen from the slider
+            for i, j in Tables.RAYS[(-dirn[0], -dirn[1])][sq]:
+                counts[j * 8 + i] += delta
+                if get_piece(i, j).type != p_type.blank:
+                    break
+
+    def enable_move_cache(self):
+        """Start keeping the legal moves of each piece between moves.
+
+        add_piece_codes (and so get_move_codes, get_piece_moves and
+        has_any_legal_move) then only regenerates the moves of a piece if
+        something has changed on a line, or a knight's move, away from it.
+        King moves and moves made while in check are never cached.
+
+        """
+
+        self.move_cache = {}
+        self.pin_cache = {}
+
+    def disable_move_cache(self):
+        """Stop keeping the legal moves of each piece."""
+        self.move_cache = None
+        self.pin_cache = None
+
+    def _dirty_moves_near(self, x, y):
+        """Mark dirty the cached moves which a change on (x, y) may affect.
+
+        These are the moves of the piece on (x, y), of the nearest piece in
+        each direction from it (whose moves, or pin, may pass through the
+        square) and of any knight a knight's move away.
+
+        """
+
+        self.pin_cache.clear()
+        move_cache = self.move_cache
+
+        if not move_cache:
+            return
+
+        piece_array = self.piece_array
+        sq = y * 8 + x
+
+        move_cache.pop(sq, None)
+
+        for dirn in Tables.DIRECTIONS:
+            for i, j in Tables.RAYS[dirn][sq]:
+                if piece_array[i][j].type != p_type.blank:
+                    move_cache.pop(j * 8 + i, None)
+                    break
+
+        for i, j in Tables.KNIGHT_SQUARES[sq]:
+            move_cache.pop(j * 8 + i, None)
 
     def search_direction(self, x, y, up_down, left_right, no_legal=False):
         """Move along the board in a given direction and return information.
@@ -334,8 +719,9 @@ class Board:
                 (x, y) in the given direction (or empty list if no_legal is 
                 true)
 
-        Will raise ValueError if up_down == left_right == 0, or IndexError if
-        x and y do not refer to a physical square on the board.
+        Will raise KeyError unless up_down and left_right are each -1, 0 or 1
+        and not both 0, or IndexError if x and y do not refer to a physical
+        square on the board.
 
         """
 
@@ -357,16 +743,11 @@ class Board:
         num_squares = 0
         found_piece = None
         move_list = []
+        piece_array = self.piece_array
 
-        new_x = x
-        new_y = y
-
-        new_x += left_right
-        new_y += up_down
-
-        while(self.is_square(new_x, new_y)):
+        for new_x, new_y in Tables.RAYS[(up_down, left_right)][y * 8 + x]:
 
-            piece_at_move = self.piece_array[new_x][new_y]
+            piece_at_move = piece_array[new_x][new_y]
 
             if not no_legal:
                 move = Move.Move((x, y), (new_x, new_y))
@@ -379,8 +760,6 @@ class Board:
                 break
 
             num_squares += 1
-            new_x += left_right
-            new_y += up_down
 
         return (num_squares, found_piece, move_list)
 
@@ -469,38 +848,45 @@ class Board:
         if not move.castle:
             return False
 
-        king = self.piece_array[move.start_posn[0]][move.start_posn[1]]
+        king = self.get_piece(*move.start_posn)
 
-        if king.type != p_type.king:
+        if king is None or king.type != p_type.king:
             return False
 
         if king.colour == Colour.white:
             y = 7
-            friendly_rook = Piece.Rook(Colour.white)
-        elif king.colour == Colour.black:
+        else:
             y = 0
-            friendly_rook = Piece.Rook(Colour.black)
 
         # If king is not at correct position for castling
         if move.start_posn != (4, y):
             return False
 
-        if (move.end_posn[0] > move.start_posn[0]):
-            # Castling King's side
+        king_side = move.end_posn[0] > move.start_posn[0]
 
-            search_results = self.search_direction(
-                move.start_posn[0], move.start_posn[1], 0, 1, no_legal=True)
-            if search_results[0] != 2:
-                return False
-            if search_results[1] != friendly_rook:
-                return False
+        if king_side:
+            rook = self.get_piece(7, y)
         else:
-            # Castling Queen's side
-            search_results = self.search_direction(
-                move.start_posn[0], move.start_posn[1], 0, -1, no_legal=True)
-            if search_results[0] != 3:
-                return False
-            if search_results[1] != friendly_rook:
+            rook = self.get_piece(0, y)
+
+        if rook.type != p_type.rook or rook.colour != king.colour:
+            return False
+
+        return self.is_castle_path_empty(y, king_side)
+
+    def is_castle_path_empty(self, y, king_side):
+        """Return true if no piece stands between king and rook on rank y.
+
+        Args:
+            - y:  the rank of the king and rook
+            - king_side:  true for castling King's side, false for Queen's
+
+        """
+
+        piece_array = self.piece_array
+
+        for x in CASTLE_EMPTY_FILES[king_side]:
+            if piece_array[x][y].type != p_type.blank:
                 return False
 
         return True
@@ -521,24 +907,11 @@ class Board:
         if not move.castle:
             return False
 
-        king = self.piece_array[move.start_posn[0]][move.start_posn[1]]
-
-        if self.is_in_check(king.colour):
-            return False
-
-        if (move.end_posn[0] > move.start_posn[0]):
-            # Castling King's side
+        x, y = move.start_posn
+        enemy = -self.get_piece(x, y).colour
 
-            search_results = self.search_direction(
-                move.start_posn[0], move.start_posn[1], 0, 1)
-            if len(search_results[2]) != 2:
-                return False
-        else:
-            # Castling Queen's side
-
-            search_results = self.search_direction(
-                move.start_posn[0], move.start_posn[1], 0, -1)
-            if len(search_results[2]) != 3:
+        for step in CASTLE_SAFE_STEPS[move.end_posn[0] > x]:
+            if self.is_square_attacked(x + step, y, enemy):
                 return False
 
         return True
@@ -553,11 +926,364 @@ class Board:
 
         return piece_at_move.type != p_type.blank
 
+    def get_pin_info(self, piece_colour):
+        """Return the check evasion mask and the pinned pieces of a colour.
+
+        This is computed once per position, so that the legality of every
+        move other than a king move can then be decided without making it.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        Returns: a tuple containing three pieces of information:
+            [0] The position of the king of the passed colour, or None if
+                there is no such king (in which case every move is treated
+                as legal)
+            [1] None if the king is not in check. Otherwise the set of
+                squares which a piece other than the king must move to in
+                order to capture or block the checking piece (this is empty
+                if the king is in double check)
+            [2] A dictionary mapping the position of each pinned piece to
+                the set of squares on the line between the king and the
+                pinning piece (inclusive of the pinning piece)
+
+        The result is shared with later calls if the move cache is enabled,
+        so it must not be changed.
+
+        """
+
+        if self.pin_cache is not None:
+            pin_info = self.pin_cache.get(piece_colour)
+
+            if pin_info is None:
+                pin_info = self.find_pin_info(piece_colour)
+                self.pin_cache[piece_colour] = pin_info
+
+            return pin_info
+
+        return self.find_pin_info(piece_colour)
+
+    def find_pin_info(self, piece_colour):
+        """Return the result of get_pin_info, computed from the board."""
+
+        piece_array = self.piece_array
+        king_posn = self.king_posns[piece_colour]
+
+        if king_posn is None:
+            return (None, None, {})
+
+        x, y = king_posn
+
+        sq = y * 8 + x
+        checks = []
+        pins = {}
+
+        for i, j in Tables.PAWN_ATTACK_SQUARES[piece_colour][sq]:
+            piece = piece_array[i][j]
+            if piece.type == p_type.pawn and piece.colour != piece_colour:
+                checks.append({(i, j)})
+
+        for i, j in Tables.KNIGHT_SQUARES[sq]:
+            piece = piece_array[i][j]
+            if piece.type == p_type.knight and piece.colour != piece_colour:
+                checks.append({(i, j)})
+
+        for directions, slider in ((Tables.VER_HOR_DIRECTIONS, p_type.rook),
+                                   (Tables.DIAG_DIRECTIONS, p_type.bishop)):
+            for dirn in directions:
+                line = []
+                friendly = None
+
+                for i, j in Tables.RAYS[dirn][sq]:
+                    line.append((i, j))
+                    piece = piece_array[i][j]
+
+                    if piece.type == p_type.blank:
+                        continue
+
+                    if piece.colour == piece_colour:
+                        # A second friendly piece shields the first
+                        if friendly is not None:
+                            break
+                        friendly = (i, j)
+                        continue
+
+                    if piece.type in (slider, p_type.queen):
+                        if friendly is None:
+                            checks.append(set(line))
+                        else:
+                            pins[friendly] = set(line)
+                    break
+
+        if not checks:
+            check_mask = None
+        elif len(checks) == 1:
+            check_mask = checks[0]
+        else:
+            check_mask = set()
+
+        return (king_posn, check_mask, pins)
+
+    def get_allowed_squares(self, x, y, pin_info=None):
+        """Return the squares the piece at (x, y) may move to.
+
+        Only squares which would not leave the king in check are returned,
+        so this should not be used for the king itself.
+
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - pin_info:  the result of get_pin_info for the colour of the
+                         piece, if already known
+
+        Returns None if the piece may move to any square, otherwise a set of
+        positions.
+
+        """
+
+        if pin_info is None:
+            pin_info = self.get_pin_info(self.piece_array[x][y].colour)
+
+        check_mask = pin_info[1]
+        pin_line = pin_info[2].get((x, y))
+
+        if pin_line is None:
+            return check_mask
+        if check_mask is None:
+            return pin_line
+
+        return pin_line & check_mask
+
     ###########################################################################
     ############################## MOVE FETCHING ##############################
     ###########################################################################
 
-    def get_piece_moves(self, x, y):
+    def get_legal_moves(self, piece_colour):
+        """Return a list of the legal moves of every piece of a colour.
+
+        As with get_piece_moves, no castle or en passant moves are returned.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        return Move.decode_all(self.get_move_codes(piece_colour))
+
+    def get_move_codes(self, piece_colour):
+        """Return an array('H') of the encoded legal moves of a colour.
+
+        This returns the same moves as get_legal_moves, but as 16 bit codes
+        (see Move.encode), so that no Move objects are needed.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        pin_info = self.get_pin_info(piece_colour)
+
+        if pin_info[1] is not None:
+            return self.get_evasion_codes(piece_colour, pin_info)
+
+        codes = array("H")
+
+        for i, j in self.piece_posns[piece_colour]:
+            self.add_piece_codes(i, j, codes, pin_info)
+
+        return codes
+
+    def get_evasion_codes(self, piece_colour, pin_info=None):
+        """Return an array('H') of the encoded legal moves of a colour whose
+        king is in check.
+
+        Rather than generating the moves of every piece, only king moves
+        out of check, captures of the checking piece and moves onto the
+        line between it and the king are generated. No castle or en
+        passant moves are returned. If the king is not in check, this
+        returns the same moves as get_move_codes.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+            - pin_info:  the result of get_pin_info for the colour, if
+                         already known
+
+        """
+
+        if pin_info is None:
+            pin_info = self.get_pin_info(piece_colour)
+
+        king_posn, check_mask, pins = pin_info
+
+        if check_mask is None:
+            return self.get_move_codes(piece_colour)
+
+        codes = array("H")
+
+        self.add_king_codes(king_posn[0], king_posn[1], codes)
+
+        # In double check only the king can move
+        for square in check_mask:
+            self.add_interposition_codes(square, piece_colour, pins, codes)
+
+        return codes
+
+    def add_interposition_codes(self, square, piece_colour, pins, codes):
+        """Append the encoded moves of pieces other than the king to square.
+
+        Pinned pieces are skipped, as they can never resolve a check.
+
+        Args:
+            - square:  the position being moved to (a checking piece or a
+                       square between it and the king)
+            - piece_colour:  the colour of the pieces to move
+            - pins:  the pinned pieces, as returned by get_pin_info
+            - codes:  an array('H') to append the codes to
+
+        """
+
+        piece_array = self.piece_array
+        x, y = square
+        end = (y * 8 + x) << 6
+
+        if piece_array[x][y].type != p_type.blank:
+            end |= CAPTURE_FLAG
+
+            for i, j in Tables.PAWN_ATTACK_SQUARES[-piece_colour][y * 8 + x]:
+                piece = piece_array[i][j]
+                if (piece.type == p_type.pawn and piece.colour == piece_colour
+                        and (i, j) not in pins):
+                    add_pawn_code(codes, j * 8 + i | end)
+        else:
+            # Pawn pushes, where m is the direction the pawns move in
+            m = -piece_colour
+            behind = y - m
+
+            if 0 <= behind < Board.SIZE:
+                piece = piece_array[x][behind]
+
+                if piece.type == p_type.blank:
+                    if piece_colour == Colour.white:
+                        double_from = 6
+                    else:
+                        double_from = 1
+
+                    if behind - m == double_from:
+                        piece = piece_array[x][double_from]
+                        if (piece.type == p_type.pawn
+                                and piece.colour == piece_colour
+                                and (x, double_from) not in pins):
+                            codes.append(double_from * 8 + x | end
+                                         | DOUBLE_PUSH_FLAG)
+                elif (piece.type == p_type.pawn
+                        and piece.colour == piece_colour
+                        and (x, behind) not in pins):
+                    add_pawn_code(codes, behind * 8 + x | end)
+
+        for i, j in Tables.KNIGHT_SQUARES[y * 8 + x]:
+            piece = piece_array[i][j]
+            if (piece.type == p_type.knight and piece.colour == piece_colour
+                    and (i, j) not in pins):
+                codes.append(j * 8 + i | end)
+
+        for directions, slider in ((Tables.VER_HOR_DIRECTIONS, p_type.rook),
+                                   (Tables.DIAG_DIRECTIONS, p_type.bishop)):
+            for dirn in directions:
+                for i, j in Tables.RAYS[dirn][y * 8 + x]:
+                    piece = piece_array[i][j]
+
+                    if piece.type != p_type.blank:
+                        if (piece.type in (slider, p_type.queen)
+                                and piece.colour == piece_colour
+                                and (i, j) not in pins):
+                            codes.append(j * 8 + i | end)
+                        break
+
+    def iter_piece_codes(self, piece_colour):
+        """Yield an array('H') of encoded legal moves for each piece in turn.
+
+        The moves of each piece are only generated when the next array is
+        asked for (if the king is in check, a single array of the evasions
+        from get_evasion_codes is yielded instead). The board must be the
+        same as when iteration began each time the generator is resumed
+        (moves made in between must be taken back).
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        pin_info = self.get_pin_info(piece_colour)
+
+        # In check, the few legal moves are generated together
+        if pin_info[1] is not None:
+            yield self.get_evasion_codes(piece_colour, pin_info)
+            return
+
+        # Copied, as moves may be made while the generator is suspended
+        for i, j in list(self.piece_posns[piece_colour]):
+            codes = array("H")
+            self.add_piece_codes(i, j, codes, pin_info)
+            yield codes
+
+    def iter_captures(self, piece_colour, quiet=None):
+        """Yield the legal capturing moves of a colour, one piece at a time.
+
+        As with get_legal_moves, no castle or en passant moves are returned.
+        See iter_piece_codes for the restrictions on the board.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+            - quiet:  if given, an array('H') to which the codes of the
+                      non-capturing moves found along the way are appended,
+                      so that they need not be generated again
+
+        """
+
+        for codes in self.iter_piece_codes(piece_colour):
+            for code in codes:
+                if code & CAPTURE_FLAG:
+                    yield Move.decode(code)
+                elif quiet is not None:
+                    quiet.append(code)
+
+    def iter_quiet_moves(self, piece_colour):
+        """Yield the legal non-capturing moves of a colour.
+
+        As with get_legal_moves, no castle or en passant moves are returned.
+        See iter_piece_codes for the restrictions on the board.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        for codes in self.iter_piece_codes(piece_colour):
+            for code in codes:
+                if not code & CAPTURE_FLAG:
+                    yield Move.decode(code)
+
+    def encode_move(self, move):
+        """Return the 16 bit code of a move in the current position.
+
+        Unlike Move.encode, this sets the capture and double pawn push flags
+        from the board, so the move must not have been made yet.
+
+        """
+
+        code = Move.encode(move)
+
+        if move.castle or move.en_passant:
+            return code
+
+        if self.is_take_move(move):
+            code |= Move.CAPTURE << Move.FLAG_SHIFT
+        elif (self.get_piece(*move.start_posn).type == p_type.pawn
+              and abs(move.end_posn[1] - move.start_posn[1]) == 2):
+            code |= Move.DOUBLE_PAWN_PUSH << Move.FLAG_SHIFT
+
+        return code
+
+    def get_piece_moves(self, x, y, pin_info=None):
         """Return a list of available moves for the piece at (x, y).
 
         Given a position (x, y), return a list of moves which it is legal for
@@ -565,24 +1291,79 @@ class Board:
         exhaustive: the function will not return any castle moves or en passant
         moves.
 
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - pin_info:  the result of get_pin_info for the colour of the
+                         piece, if already known
+
+        """
+
+        codes = array("H")
+        self.add_piece_codes(x, y, codes, pin_info)
+
+        return Move.decode_all(codes)
+
+    def add_piece_codes(self, x, y, codes, pin_info=None):
+        """Append the encoded legal moves of the piece at (x, y) to codes.
+
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - codes:  an array('H') to append the codes to
+            - pin_info:  the result of get_pin_info for the colour of the
+                         piece, if already known
+
         """
 
-        piece_to_move = self.piece_array[x][y]
+        piece = self.piece_array[x][y]
+        piece_type = piece.type
+
+        if piece_type == p_type.blank:
+            return
+        if piece_type == p_type.king:
+            self.add_king_codes(x, y, codes)
+            return
+
+        if self.move_cache is not None:
+            if pin_info is None:
+                pin_info = self.get_pin_info(piece.colour)
+
+            if pin_info[1] is None:
+                cached = self.move_cache.get(y * 8 + x)
+
+                if cached is None:
+                    cached = array("H")
+                    self.add_uncached_codes(x, y, piece_type,
+                                            pin_info[2].get((x, y)), cached)
+                    self.move_cache[y * 8 + x] = cached
+
+                codes.extend(cached)
+                return
+
+        allowed = self.get_allowed_squares(x, y, pin_info)
+        self.add_uncached_codes(x, y, piece_type, allowed, codes)
+
+    def add_uncached_codes(self, x, y, piece_type, allowed, codes):
+        """Append the encoded moves of the piece at (x, y) other than a king.
+
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - piece_type:  the type of the piece
+            - allowed:  the result of get_allowed_squares for the piece
+            - codes:  an array('H') to append the codes to
 
-        if piece_to_move.type == p_type.king:
-            return self.get_king_moves(x, y)
-        if piece_to_move.type == p_type.queen:
-            return self.get_queen_moves(x, y)
-        if piece_to_move.type == p_type.bishop:
-            return self.get_bishop_moves(x, y)
-        if piece_to_move.type == p_type.knight:
-            return self.get_knight_moves(x, y)
-        if piece_to_move.type == p_type.rook:
-            return self.get_rook_moves(x, y)
-        if piece_to_move.type == p_type.pawn:
-            return self.get_pawn_moves(x, y)
+        """
 
-        return []
+        if piece_type == p_type.queen:
+            self.add_slider_codes(x, y, Tables.DIRECTIONS, allowed, codes)
+        elif piece_type == p_type.bishop:
+            self.add_slider_codes(x, y, Tables.DIAG_DIRECTIONS, allowed, codes)
+        elif piece_type == p_type.rook:
+            self.add_slider_codes(x, y, Tables.VER_HOR_DIRECTIONS, allowed,
+                                  codes)
+        elif piece_type == p_type.knight:
+            self.add_knight_codes(x, y, allowed, codes)
+        elif piece_type == p_type.pawn:
+            self.add_pawn_codes(x, y, allowed, codes)
 
     def get_king_moves(self, x, y):
         """Return a list of available moves for a king at (x, y).
@@ -593,20 +1374,18 @@ class Board:
         on the board, this function will return without error but with
         incorrect results.
 
-        """
+        Unlike other pieces, the legality of each king move is checked by
+        lifting the king off the board and asking scan_attacked whether the
+        destination is attacked.
 
-        move_list = []
-        square_list = [(x+1, y+1), (x+1, y),   (x+1, y-1), (x, y+1),
-                       (x, y-1),   (x-1, y+1), (x-1, y),   (x-1, y-1)]
+        """
 
-        for square in square_list:
-            move = Move.Move((x, y), square)
-            if self.is_possible_valid_move(move):
-                move_list.append(move)
+        codes = array("H")
+        self.add_king_codes(x, y, codes)
 
-        return move_list
+        return Move.decode_all(codes)
 
-    def get_queen_moves(self, x, y):
+    def get_queen_moves(self, x, y, pin_info=None):
         """Return a list of available moves for a queen at (x, y).
 
         Given a position (x, y) returns a list of moves which it is legal for
@@ -614,12 +1393,10 @@ class Board:
 
         """
 
-        move_list = []
-        move_list.extend(self.get_bishop_moves(x, y))
-        move_list.extend(self.get_rook_moves(x, y))
-        return move_list
+        return self.get_slider_moves(x, y, Tables.DIRECTIONS,
+                                     self.get_allowed_squares(x, y, pin_info))
 
-    def get_bishop_moves(self, x, y):
+    def get_bishop_moves(self, x, y, pin_info=None):
         """Return a list of available moves for a bishop at (x, y).
 
         Given a position (x, y) returns a list of moves which it is legal for
@@ -627,17 +1404,10 @@ class Board:
 
         """
 
-        move_list = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+        return self.get_slider_moves(x, y, Tables.DIAG_DIRECTIONS,
+                                     self.get_allowed_squares(x, y, pin_info))
 
-        for direction in directions:
-            direction_moves = self.search_direction(
-                x, y, direction[0], direction[1])
-            move_list.extend(direction_moves[2])
-
-        return move_list
-
-    def get_knight_moves(self, x, y):
+    def get_knight_moves(self, x, y, pin_info=None):
         """Return a list of available moves for a knight at (x, y).
 
         Given a position (x, y) returns a list of moves which it is legal for
@@ -645,18 +1415,13 @@ class Board:
 
         """
 
-        move_list = []
-        square_list = [(x+1, y+2), (x-1, y+2), (x+2, y+1), (x-2, y+1),
-                       (x+2, y-1), (x-2, y-1), (x+1, y-2), (x-1, y-2)]
-
-        for square in square_list:
-            move = Move.Move((x, y), square)
-            if self.is_possible_valid_move(move):
-                move_list.append(move)
+        codes = array("H")
+        self.add_knight_codes(x, y, self.get_allowed_squares(x, y, pin_info),
+                              codes)
 
-        return move_list
+        return Move.decode_all(codes)
 
-    def get_rook_moves(self, x, y):
+    def get_rook_moves(self, x, y, pin_info=None):
         """Return a list of available moves for a rook at (x, y).
 
         Given a position (x, y) returns a list of moves which it is legal for
@@ -664,17 +1429,25 @@ class Board:
 
         """
 
-        move_list = []
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        return self.get_slider_moves(x, y, Tables.VER_HOR_DIRECTIONS,
+                                     self.get_allowed_squares(x, y, pin_info))
+
+    def get_slider_moves(self, x, y, directions, allowed):
+        """Return the moves along the passed directions from (x, y).
 
-        for direction in directions:
-            direction_moves = self.search_direction(
-                x, y, direction[0], direction[1])
-            move_list.extend(direction_moves[2])
+        Args:
+            - x, y:  ints specifying the position of the piece
+            - directions:  (up_down, left_right) pairs to slide along
+            - allowed:  the result of get_allowed_squares for the piece
+
+        """
+
+        codes = array("H")
+        self.add_slider_codes(x, y, directions, allowed, codes)
 
-        return move_list
+        return Move.decode_all(codes)
 
-    def get_pawn_moves(self, x, y):
+    def get_pawn_moves(self, x, y, pin_info=None):
         """Return a list of available moves for a pawn at (x, y).
 
         Given a position (x, y) returns a list of moves which it is legal for
@@ -682,50 +1455,190 @@ class Board:
 
         """
 
-        move_list = []
-        can_double = False   # True if the pawn can move two squares forward.
-        pawn = self.piece_array[x][y]
+        codes = array("H")
+        self.add_pawn_codes(x, y, self.get_allowed_squares(x, y, pin_info),
+                            codes)
+
+        return Move.decode_all(codes)
+
+    def add_king_codes(self, x, y, codes):
+        """Append the encoded moves of a king at (x, y) to codes.
+
+        Each move is tested with attack queries rather than by making it,
+        so the board (and any move cache) is left untouched.
+
+        """
+
+        piece_array = self.piece_array
+        king = piece_array[x][y]
+        colour = king.colour
+        start = y * 8 + x
+
+        # Lift the king, so that the squares behind it on a checking line
+        # are seen to be attacked
+        piece_array[x][y] = Piece.BLANK
+
+        for i, j in Tables.KING_SQUARES[start]:
+            piece = piece_array[i][j]
 
-        if pawn.colour == Colour.white:
-            m = -1  # m is a multiplier which ensures white pieces move up the
-            # board (in the negative y direction) and vice versa
+            if piece.colour == colour:
+                continue
 
-            if y == 6:
-                can_double = True
-        elif pawn.colour == Colour.black:
-            m = 1
+            if not self.scan_attacked(i, j, -colour):
+                if piece.type != p_type.blank:
+                    codes.append(start | (j * 8 + i) << 6 | CAPTURE_FLAG)
+                else:
+                    codes.append(start | (j * 8 + i) << 6)
+
+        piece_array[x][y] = king
+
+    def add_slider_codes(self, x, y, directions, allowed, codes):
+        """Append the encoded moves along directions from (x, y) to codes."""
+
+        piece_array = self.piece_array
+        colour = piece_array[x][y].colour
+        start = y * 8 + x
+
+        for dirn in directions:
+            for square in Tables.RAYS[dirn][start]:
+                i, j = square
+                piece = piece_array[i][j]
+
+                if piece.colour == colour:
+                    break
+
+                if piece.type != p_type.blank:
+                    if allowed is None or square in allowed:
+                        codes.append(start | (j * 8 + i) << 6 | CAPTURE_FLAG)
+                    break
+
+                if allowed is None or square in allowed:
+                    codes.append(start | (j * 8 + i) << 6)
+
+    def add_knight_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a knight at (x, y) to codes."""
+
+        piece_array = self.piece_array
+        colour = piece_array[x][y].colour
+        start = y * 8 + x
+
+        for square in Tables.KNIGHT_SQUARES[start]:
+            i, j = square
+            piece = piece_array[i][j]
+
+            if piece.colour == colour:
+                continue
+
+            if allowed is None or square in allowed:
+                if piece.type != p_type.blank:
+                    codes.append(start | (j * 8 + i) << 6 | CAPTURE_FLAG)
+                else:
+                    codes.append(start | (j * 8 + i) << 6)
+
+    def add_pawn_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a pawn at (x, y) to codes."""
 
-            if y == 1:
-                can_double = True
+        piece_array = self.piece_array
+        colour = piece_array[x][y].colour
+        start = y * 8 + x
 
-        one_forward = Move.Move((x, y), (x, y + 1*m))
-        two_forward = Move.Move((x, y), (x, y + 2*m))
-        left_take = Move.Move((x, y), (x - 1, y + 1*m))
-        right_take = Move.Move((x, y), (x + 1, y + 1*m))
+        # m is a multiplier which ensures white pieces move up the board (in
+        # the negative y direction) and vice versa
+        m = -colour
+
+        if colour == Colour.white:
+            can_double = (y == 6)
+        else:
+            can_double = (y == 1)
 
-        if (self.is_possible_valid_move(one_forward)
-                and not self.is_take_move(one_forward)):
-            move_list.append(one_forward)
+        one_forward = (x, y + m)
 
-            if (self.is_possible_valid_move(two_forward)
-                    and can_double
-                    and not self.is_take_move(two_forward)):
-                move_list.append(two_forward)
+        if (0 <= y + m < Board.SIZE
+                and piece_array[x][y + m].type == p_type.blank):
+            if allowed is None or one_forward in allowed:
+                add_pawn_code(codes, start | ((y + m) * 8 + x) << 6)
 
-        if (self.is_possible_valid_move(left_take)):
-            if (self.is_take_move(left_take)):
-                move_list.append(left_take)
+            # The double move may block a check that the single move does not
+            two_forward = (x, y + 2*m)
 
-        if (self.is_possible_valid_move(right_take)):
-            if (self.is_take_move(right_take)):
-                move_list.append(right_take)
+            if (can_double
+                    and piece_array[x][y + 2*m].type == p_type.blank
+                    and (allowed is None or two_forward in allowed)):
+                codes.append(start | ((y + 2*m) * 8 + x) << 6
+                             | DOUBLE_PUSH_FLAG)
 
-        return move_list
+        for square in Tables.PAWN_ATTACK_SQUARES[colour][start]:
+            i, j = square
+            if piece_array[i][j].colour == -colour:
+                if allowed is None or square in allowed:
+                    add_pawn_code(codes,
+                                  start | (j * 8 + i) << 6 | CAPTURE_FLAG)
 
     ###########################################################################
     ############################ BOARD EVALUATION #############################
     ###########################################################################
 
+    def is_square_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        This is O(1) if attack maps are enabled.
+
+        Args:
+            - x, y:  ints specifying the square
+            - by_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        if self.attack_counts is not None:
+            return self.attack_counts[by_colour][y * 8 + x] > 0
+
+        return self.scan_attacked(x, y, by_colour)
+
+    def scan_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        Unlike is_square_attacked, this always looks at the board itself
+        rather than the attack maps.
+
+        """
+
+        sq = y * 8 + x
+        piece_array = self.piece_array
+
+        # Look for pawns
+        for i, j in Tables.PAWN_ATTACK_SQUARES[-by_colour][sq]:
+            piece = piece_array[i][j]
+            if piece.type == p_type.pawn and piece.colour == by_colour:
+                return True
+
+        # Look for knights
+        for i, j in Tables.KNIGHT_SQUARES[sq]:
+            piece = piece_array[i][j]
+            if piece.type == p_type.knight and piece.colour == by_colour:
+                return True
+
+        # The enemy king
+        for i, j in Tables.KING_SQUARES[sq]:
+            piece = piece_array[i][j]
+            if piece.type == p_type.king and piece.colour == by_colour:
+                return True
+
+        # Radiate outwards and check for enemy rooks, bishops and queens:
+        # Vertically/Horizontally, and Finally, Diagonally
+        for directions, slider in ((Tables.VER_HOR_DIRECTIONS, p_type.rook),
+                                   (Tables.DIAG_DIRECTIONS, p_type.bishop)):
+            for dirn in directions:
+                for i, j in Tables.RAYS[dirn][sq]:
+                    piece = piece_array[i][j]
+
+                    if piece.type != p_type.blank:
+                        if (piece.type in (slider, p_type.queen)
+                                and piece.colour == by_colour):
+                            return True
+                        break
+
+        return False
+
     def is_in_check(self, piece_colour):
         """Return true if the king of the passed colour is in check.
 
@@ -737,70 +1650,94 @@ class Board:
 
         """
 
-        # Find King
-        for i, j in itertools.product(range(Board.SIZE), range(Board.SIZE)):
-            piece = self.piece_array[i][j]
-            if piece.type == p_type.king and piece.colour == piece_colour:
-                x = i
-                y = j
-                break
-        else:
+        king_posn = self.king_posns[piece_colour]
+
+        if king_posn is None:
             return False
 
-        # Radiate outwards and check for enemy rooks, bishops and queens:
+        return self.is_square_attacked(king_posn[0], king_posn[1],
+                                       -piece_colour)
 
-        # Look for pawns
-        
-        square_list = [(x+1, y-piece_colour), (x-1, y-piece_colour)]
+    def gives_check(self, move):
+        """Return true if making the passed move would check the enemy king.
 
-        for square in square_list:
-            piece = self.get_piece(*square)
-            if piece is not None:
-                if piece.type == p_type.pawn:
-                    if piece.colour != piece_colour:
-                        return True
+        Both direct checks (by the piece moved, or the rook when castling)
+        and discovered checks are found without making the move. Only the
+        lines from the enemy king through the squares the move changes are
+        examined. The move should be a legal move.
 
-        # Look for knights
-        square_list = [(x+1, y+2), (x-1, y+2), (x+2, y+1), (x-2, y+1),
-                       (x+2, y-1), (x-2, y-1), (x+1, y-2), (x-1, y-2)]
+        Args:
+            - move:  a Move object
 
-        for square in square_list:
-            piece = self.get_piece(*square)
-            if piece is not None:
-                if piece.type == p_type.knight:
-                    if piece.colour != piece_colour:
-                        return True
+        """
 
-        # The enemy king
-        square_list = [(x+1, y+1), (x+1, y),   (x+1, y-1), (x, y+1),
-                       (x, y-1),   (x-1, y+1), (x-1, y),   (x-1, y-1)]
+        piece = self.get_piece(*move.start_posn)
+        colour = piece.colour
+        king_posn = self.get_king_posn(-colour)
 
-        for square in square_list:
-            piece = self.get_piece(*square)
-            if piece is not None:
-                if piece.type == p_type.king:
-                    if piece.colour != piece_colour:
-                        return True
+        if king_posn is None:
+            return False
 
-        # Vertically/Horizontally
-        for dirn in self.ver_hor_list:
-            piece = self.search_direction(
-                x, y, dirn[0], dirn[1], no_legal=True)[1]
+        king_sq = king_posn[1] * 8 + king_posn[0]
+        end_sq = move.end_posn[1] * 8 + move.end_posn[0]
 
-            if piece is not None:
-                if piece.type in (p_type.rook, p_type.queen):
-                    if piece.colour != piece_colour:
-                        return True
+        # The squares the move empties, and the pieces it puts down
+        vacated = [move.start_posn]
+        filled = {move.end_posn: piece.type}
 
-        # And Finally, Diagonally
-        for dirn in self.diag_list:
-            piece = self.search_direction(
-                x, y, dirn[0], dirn[1], no_legal=True)[1]
+        if move.castle:
+            if move.end_posn[0] > move.start_posn[0]:
+                rook_from_x, rook_to_x = 7, 5
+            else:
+                rook_from_x, rook_to_x = 0, 3
+            vacated.append((rook_from_x, move.start_posn[1]))
+            filled[(rook_to_x, move.start_posn[1])] = p_type.rook
+        elif move.en_passant:
+            vacated.append(move.en_passant_posn)
+        elif move.promotion is not None:
+            filled[move.end_posn] = move.promotion
+
+        piece_type = filled[move.end_posn]
+
+        if piece_type == p_type.pawn:
+            if king_posn in Tables.PAWN_ATTACK_SQUARES[colour][end_sq]:
+                return True
+        elif piece_type == p_type.knight:
+            if king_posn in Tables.KNIGHT_SQUARES[end_sq]:
+                return True
+
+        # Only the lines through changed squares can have a new slider on
+        # them, as the enemy king cannot already be in check
+        directions = set()
 
-            if piece is not None:
-                if piece.type in (p_type.bishop, p_type.queen):
-                    if piece.colour != piece_colour:
-                        return True
+        for posn in vacated + list(filled):
+            dirn = Tables.LINE_DIRECTIONS[king_sq][posn[1] * 8 + posn[0]]
+            if dirn is not None:
+                directions.add(dirn)
+
+        for dirn in directions:
+            if dirn in Tables.VER_HOR_DIRECTIONS:
+                slider = p_type.rook
+            else:
+                slider = p_type.bishop
+
+            for posn in Tables.RAYS[dirn][king_sq]:
+                if posn in filled:
+                    found_type = filled[posn]
+                    found_colour = colour
+                elif posn in vacated:
+                    continue
+                else:
+                    found = self.get_piece(*posn)
+                    if found.type == p_type.blank:
+                        continue
+                    found_type = found.type
+                    found_colour = found.colour
+
+                if (found_colour == colour
+                        and found_type in (slider, p_type.queen)):
+                    return True
+                break
 
         return False
 
@@ -812,35 +1749,78 @@ class Board:
 
         """
 
-        if piece_colour == colour.white:
+        if piece_colour == Colour.white:
             enemy = Colour.black
         else:
             enemy = Colour.white
 
-        return (not legal_move_exists(enemy)) and self.is_in_check(enemy)
+        return (not self.has_any_legal_move(enemy)) and self.is_in_check(enemy)
 
     def legal_move_exists(self, piece_colour):
         """Return true if the team of the passed colour can make a legal move.
 
+        This is the same as has_any_legal_move.
+
+        """
+
+        return self.has_any_legal_move(piece_colour)
+
+    def has_any_legal_move(self, piece_colour):
+        """Return true if the team of the passed colour can make a legal move.
+
+        Castle and en passant moves are not considered. Pieces are tried one
+        at a time, stopping at the first which can move, and the king (whose
+        moves are the slowest to test) is tried last. No Move objects are
+        created.
+
         Args:
             - piece_colour:  a member of the Piece.PieceColour enum
 
         """
 
-        for i, j in itertools.product(range(Board.SIZE), range(Board.SIZE)):
-            piece = self.get_piece(i, j)
-            if piece.colour == piece_colour:
-                if len(self.get_piece_moves(i, j)) > 0:
+        pin_info = self.get_pin_info(piece_colour)
+        king_posn = pin_info[0]
+
+        if pin_info[1] is not None:
+            return len(self.get_evasion_codes(piece_colour, pin_info)) > 0
+
+        codes = array("H")
+
+        for i, j in self.piece_posns[piece_colour]:
+            if (i, j) != king_posn:
+                self.add_piece_codes(i, j, codes, pin_info)
+                if codes:
                     return True
 
-        return False
+        if king_posn is not None:
+            self.add_king_codes(king_posn[0], king_posn[1], codes)
+
+        return len(codes) > 0
+
+    def count_legal_moves(self, piece_colour):
+        """Return the number of legal moves the passed colour can make.
+
+        Castle and en passant moves are not counted, and no Move objects are
+        created.
+
+        Args:
+            - piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        count = 0
+
+        for codes in self.iter_piece_codes(piece_colour):
+            count += len(codes)
+
+        return count
 
     def is_king_draw(self):
         """Return true if the Kings are the only pieces left on the board."""
-        for i, j in itertools.product(range(Board.SIZE), range(Board.SIZE)):
-            piece = self.piece_array[i][j]
-            if not piece.type in (p_type.king, p_type.blank):
-                return False
+        for posns in self.piece_posns.values():
+            for i, j in posns:
+                if self.piece_array[i][j].type != p_type.king:
+                    return False
 
         return True
 
@@ -881,7 +1861,7 @@ class Board:
                 san += "-O"
 
         else:
-            piece = self.piece_array[move.start_posn[0]][move.start_posn[1]]
+            piece = self.get_piece(*move.start_posn)
 
             if(piece.type != p_type.pawn):
                 san += piece.get_san().upper()
@@ -915,26 +1895,23 @@ class Board:
         need_file = False
         need_rank = False
 
-        for i in range(Board.SIZE):
-            for j in range(Board.SIZE):
-
-                if not (i == move.start_posn[0] and j == move.start_posn[1]):
+        for i, j in list(self.get_piece_posns(piece.colour)):
 
-                    if self.piece_array[i][j].colour == piece.colour:
+            if not (i == move.start_posn[0] and j == move.start_posn[1]):
 
-                        if(self.piece_array[i][j].type == piece.type):
+                if(self.get_piece(i, j).type == piece.type):
 
-                            moves_list = self.get_piece_moves(i, j)
+                    moves_list = self.get_piece_moves(i, j)
 
-                            for m in moves_list:
+                    for m in moves_list:
 
-                                if(m.end_posn == move.end_posn):
+                        if(m.end_posn == move.end_posn):
 
-                                    if(i == move.start_posn[0]):
-                                        need_rank = True
+                            if(i == move.start_posn[0]):
+                                need_rank = True
 
-                                    else:
-                                        need_file = True
+                            else:
+                                need_file = True
 
         if(need_file):
             clar_str += Board.FILE_LABELS[move.start_posn[0]]
@@ -952,7 +1929,7 @@ class Board:
             board_str += "|"
 
             for j in range(Board.SIZE):
-                board_str += self.piece_array[j][i].get_san() + " "
+                board_str += self.get_piece(j, i).get_san() + " "
 
             board_str += "|\n"
 
@@ -970,27 +1947,50 @@ class Board:
         forsyth = ""
 
         for row in range(Board.SIZE):
-            column = 0
+            gap = 0
 
-            while column < BOARD_SIZE:
-                piece = self.piece_array[column][row]
+            for column in range(Board.SIZE):
+                piece = self.get_piece(column, row)
 
                 if piece.type == p_type.blank:
-                    gap = self.search_direction(
-                        column, row, 0, 1, no_legal=True)[0]
-                    forsyth += str(gap + 1)
-                    column += gap + 1
+                    gap += 1
                 else:
-                    forsyth += piece.get_san()
-                    gap = searchDirection(
-                        column, row, 0, 1, no_legal=True)[0]
-
                     if gap > 0:
                         forsyth += str(gap)
-                    column += gap + 1
+                        gap = 0
+                    forsyth += piece.get_san()
+
+            if gap > 0:
+                forsyth += str(gap)
 
-            if row < BOARD_SIZE - 1:
+            if row < Board.SIZE - 1:
                 forsyth += "/"
 
         forsyth += " "
         return forsyth
+
+
+def make_board(backend="array"):
+    """Return an empty board which stores its pieces using the given backend.
+
+    Args:
+        - backend:  "array" for the Board class, which stores a 2d list of
+                    pieces, "mailbox" for MailboxBoard, which stores a
+                    flat bytearray of piece codes, or "bitboard" for
+                    BitboardBoard, which stores one bitboard per piece
+
+    Raises:
+        - ValueError if backend is not a known backend.
+
+    """
+
+    if backend == "array":
+        return Board()
+    elif backend == "mailbox":
+        import MailboxBoard
+        return MailboxBoard.MailboxBoard()
+    elif backend == "bitboard":
+        import BitboardBoard
+        return BitboardBoard.BitboardBoard()
+    else:
+        raise ValueError("Unknown board backend: " + str(backend))
@@ -0,0 +1,647 @@
+"""Contains a fuzzer which checks the board backends against each other
+
+Seeded random games are played at once on a Gamestate of each backend and
+on a reference Gamestate, an array Gamestate whose moves are found without
+the move generation or attack code of any backend: every pseudo-legal
+move, found square by square with get_piece, is made and kept if it does
+not leave the king attacked, as the original move generator did. After
+every move the legal moves, check status, checks given, castling rights,
+en passant square, attack counts and SAN given by each backend are
+compared with those of the reference. When they differ, the game is
+shrunk to a short sequence of moves which still shows the difference.
+Run as a script:
+
+    python3 Fuzz.py [--games N] [--seed S] [--plies N] [--backend NAME]
+"""
+
+import argparse
+import random
+import sys
+import Gamestate
+import Move
+import Perft
+from Piece import PieceType as p_type
+from Piece import PieceColour as colour
+
+
+# The backends to check: those of Board.make_board, "cached" for the array
+# Board with its move cache on, and "attacks", "mailbox-attacks" and
+# "bitboard-attacks" for each backend with its attack maps on
+BACKENDS = ("array", "cached", "attacks", "mailbox", "mailbox-attacks",
+            "bitboard", "bitboard-attacks")
+
+# The backend of Board.make_board under each name with attack maps on
+ATTACK_BACKENDS = {"attacks": "array", "mailbox-attacks": "mailbox",
+                   "bitboard-attacks": "bitboard"}
+
+# The steps of the pieces, as (x, y) offsets
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2),
+                (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1),
+              (-1, 0), (-1, -1), (0, -1), (1, -1))
+ROOK_STEPS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+BISHOP_STEPS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+SLIDER_STEPS = {p_type.rook: ROOK_STEPS, p_type.bishop: BISHOP_STEPS,
+                p_type.queen: KING_STEPS}
+
+
+class Divergence:
+
+    """A difference between a backend and the reference.
+
+    Attributes:
+        - backend:  the name of the backend (see BACKENDS)
+        - fen:  the position the game started from
+        - codes:  the moves (see Move.encode) played from fen, after the
+                  last of which the difference was found
+        - description:  a string describing the difference
+        - diverged_fen:  the position in which the difference was found
+
+    """
+
+    def __init__(self, backend, fen, codes, description, diverged_fen):
+
+        self.backend = backend
+        self.fen = fen
+        self.codes = codes
+        self.description = description
+        self.diverged_fen = diverged_fen
+
+    def __str__(self):
+
+        moves = " ".join(Perft.move_name(Move.decode(code))
+                         for code in self.codes)
+
+        return (self.backend + " differs from the reference: "
+                + self.description + "\n  start: " + self.fen
+                + "\n  moves: " + (moves or "(none)")
+                + "\n  position: " + self.diverged_fen)
+
+
+def make_state(fen, backend):
+    """Return a Gamestate set to fen, using a backend named in BACKENDS."""
+
+    if backend == "cached":
+        game_state = Gamestate.from_fen(fen, "array")
+        game_state.board.enable_move_cache()
+    elif backend in ATTACK_BACKENDS:
+        game_state = Gamestate.from_fen(fen, ATTACK_BACKENDS[backend])
+        game_state.board.enable_attack_maps()
+    else:
+        game_state = Gamestate.from_fen(fen, backend)
+
+    return game_state
+
+
+def get_player(game_state):
+    """Return the colour of the player whose turn it is."""
+
+    return colour.white if game_state.is_white_turn else colour.black
+
+
+def on_board(x, y):
+    """Return true if (x, y) is a square of the board."""
+
+    return 0 <= x < 8 and 0 <= y < 8
+
+
+def attacked_squares(board, x, y):
+    """Yield the squares attacked by the piece at (x, y)."""
+
+    piece = board.get_piece(x, y)
+
+    if piece.type == p_type.pawn:
+        # Pawns move towards y = 0 for white and y = 7 for black
+        steps = ((-1, -piece.colour), (1, -piece.colour))
+    elif piece.type == p_type.knight:
+        steps = KNIGHT_STEPS
+    elif piece.type == p_type.king:
+        steps = KING_STEPS
+    else:
+        steps = ()
+
+    for dx, dy in steps:
+        if on_board(x + dx, y + dy):
+            yield x + dx, y + dy
+
+    for dx, dy in SLIDER_STEPS.get(piece.type, ()):
+        i = x + dx
+        j = y + dy
+
+        while on_board(i, j):
+            yield i, j
+
+            if board.get_piece(i, j).type != p_type.blank:
+                break
+
+            i += dx
+            j += dy
+
+
+def attack_counts(board, side):
+    """Return the number of pieces of side attacking each square y * 8 + x."""
+
+    counts = [0] * 64
+
+    for y in range(8):
+        for x in range(8):
+            if board.get_piece(x, y).colour == side:
+                for i, j in attacked_squares(board, x, y):
+                    counts[j * 8 + i] += 1
+
+    return counts
+
+
+def is_attacked(board, x, y, side):
+    """Return true if a piece of side attacks (x, y).
+
+    The pieces which could attack (x, y) are looked for from (x, y), each
+    with the steps it moves by.
+
+    """
+
+    def holds(i, j, types):
+        piece = board.get_piece(i, j)
+        return piece.colour == side and piece.type in types
+
+    # A pawn of side attacks from one rank behind, as side sees it
+    for i in (x - 1, x + 1):
+        if on_board(i, y + side) and holds(i, y + side, (p_type.pawn,)):
+            return True
+
+    for steps, types in ((KNIGHT_STEPS, (p_type.knight,)),
+                         (KING_STEPS, (p_type.king,))):
+        for dx, dy in steps:
+            if on_board(x + dx, y + dy) and holds(x + dx, y + dy, types):
+                return True
+
+    for steps, types in ((ROOK_STEPS, (p_type.rook, p_type.queen)),
+                         (BISHOP_STEPS, (p_type.bishop, p_type.queen))):
+        for dx, dy in steps:
+            i = x + dx
+            j = y + dy
+
+            while on_board(i, j):
+                if board.get_piece(i, j).type != p_type.blank:
+                    if holds(i, j, types):
+                        return True
+                    break
+
+                i += dx
+                j += dy
+
+    return False
+
+
+def is_in_check(board, side):
+    """Return true if the king of side is attacked."""
+
+    for y in range(8):
+        for x in range(8):
+            piece = board.get_piece(x, y)
+
+            if piece.type == p_type.king and piece.colour == side:
+                return is_attacked(board, x, y, -side)
+
+    return False
+
+
+def pseudo_legal_codes(game_state):
+    """Return the codes of the moves of the player to move, as Move.encode
+    gives them, including those which leave the king in check.
+
+    """
+
+    player = get_player(game_state)
+    board = game_state.board
+    codes = []
+
+    def add(x, y, i, j, flags=Move.QUIET):
+        codes.append(Move.make_code((x, y), (i, j), flags))
+
+    for y in range(8):
+        for x in range(8):
+            piece = board.get_piece(x, y)
+
+            if piece.colour != player:
+                continue
+
+            if piece.type == p_type.pawn:
+                ahead = y - player
+                last_rank = ahead in (0, 7)
+
+                def add_pawn(i, flags):
+                    if last_rank:
+                        for index in range(len(Move.PROMOTION_TYPES)):
+                            add(x, y, i, ahead, flags | Move.PROMOTION | index)
+                    else:
+                        add(x, y, i, ahead, flags)
+
+                if board.get_piece(x, ahead).type == p_type.blank:
+                    add_pawn(x, Move.QUIET)
+
+                    start_rank = 6 if player == colour.white else 1
+                    if (y == start_rank and board.get_piece(
+                            x, ahead - player).type == p_type.blank):
+                        add(x, y, x, ahead - player, Move.DOUBLE_PAWN_PUSH)
+
+                for i in (x - 1, x + 1):
+                    if (on_board(i, ahead)
+                            and board.get_piece(i, ahead).colour == -player):
+                        add_pawn(i, Move.CAPTURE)
+
+                if game_state.en_passant_sq is not None:
+                    ep_x, ep_y = game_state.en_passant_sq
+                    taken = board.get_piece(ep_x, y)
+
+                    if (ep_y == ahead and abs(ep_x - x) == 1
+                            and taken.type == p_type.pawn
+                            and taken.colour == -player):
+                        add(x, y, ep_x, ep_y, Move.EN_PASSANT)
+
+                continue
+
+            for i, j in attacked_squares(board, x, y):
+                target = board.get_piece(i, j)
+
+                if target.type == p_type.blank:
+                    add(x, y, i, j)
+                elif target.colour == -player:
+                    add(x, y, i, j, Move.CAPTURE)
+
+    # Castling, which the player may not do out of, through or into check
+    if player == colour.white:
+        rank = 7
+        rights = ((game_state.w_castle_K, 7, Move.KING_CASTLE),
+                  (game_state.w_castle_Q, 0, Move.QUEEN_CASTLE))
+    else:
+        rank = 0
+        rights = ((game_state.b_castle_K, 7, Move.KING_CASTLE),
+                  (game_state.b_castle_Q, 0, Move.QUEEN_CASTLE))
+
+    king = board.get_piece(4, rank)
+
+    for can_castle, rook_x, flags in rights:
+        rook = board.get_piece(rook_x, rank)
+        step = 1 if rook_x > 4 else -1
+
+        if (not can_castle or king.type != p_type.king
+                or king.colour != player or rook.type != p_type.rook
+                or rook.colour != player):
+            continue
+
+        between = range(4 + step, rook_x, step)
+        if any(board.get_piece(x, rank).type != p_type.blank
+               for x in between):
+            continue
+
+        if any(is_attacked(board, 4 + step * i, rank, -player)
+               for i in range(3)):
+            continue
+
+        add(4, rank, 4 + 2 * step, rank, flags)
+
+    return codes
+
+
+def reference_moves(game_state):
+    """Return the legal moves of the player to move, found by brute force.
+
+    Each pseudo-legal move is made with push and taken back with pop, and
+    kept if the mover's king is not then attacked.
+
+    Returns a list of (code, gives check) pairs.
+
+    """
+
+    player = get_player(game_state)
+    board = game_state.board
+    moves = []
+
+    for code in pseudo_legal_codes(game_state):
+        game_state.push(Move.decode(code))
+
+        if not is_in_check(board, player):
+            moves.append((code, is_in_check(board, -player)))
+
+        game_state.pop()
+
+    return moves
+
+
+def compare(reference, candidate, moves):
+    """Return a description of how two game states differ, or None.
+
+    Args:
+        - reference:  the reference Gamestate
+        - candidate:  the Gamestate of the backend being checked
+        - moves:  the result of reference_moves(reference)
+
+    """
+
+    player = get_player(reference)
+    codes = sorted(code for code, checks in moves)
+
+    # Backends need not agree on a move's capture flag (Move.__eq__ ignores
+    # it), so their moves are compared by the codes the board gives them
+    encode_move = reference.board.encode_move
+
+    generators = (("get_all_moves", candidate.get_all_moves),
+                  ("iter_moves", candidate.iter_moves))
+
+    for name, generator in generators:
+        found = sorted(encode_move(move) for move in generator(player))
+
+        if found != codes:
+            missing = [code for code in codes if code not in found]
+            extra = [code for code in found if code not in codes]
+            return (name + " is missing " + _names(missing)
+                    + " and has extra " + _names(extra))
+
+    if candidate.count_legal_moves(player) != len(codes):
+        return ("count_legal_moves gives "
+                + str(candidate.count_legal_moves(player))
+                + " not " + str(len(codes)))
+
+    if candidate.has_any_legal_move(player) != (len(codes) > 0):
+        return "has_any_legal_move is wrong"
+
+    for side in (colour.white, colour.black):
+        if (candidate.board.is_in_check(side)
+                != is_in_check(reference.board, side)):
+            return "is_in_check is wrong for " + _side_name(side)
+
+    for code, checks in moves:
+        if candidate.gives_check(Move.decode(code)) != checks:
+            return ("gives_check(" + Perft.move_name(Move.decode(code))
+                    + ") is not " + str(checks))
+
+    # Only the array Board keeps attack maps, when they are enabled
+    if getattr(candidate.board, "attack_counts", None) is not None:
+        for side in (colour.white, colour.black):
+            if (candidate.board.attack_counts[side]
+                    != attack_counts(reference.board, side)):
+                return "attack_counts differ for " + _side_name(side)
+
+    if candidate.board.snapshot() != reference.board.snapshot():
+        return "the pieces differ"
+
+    rights = ("w_castle_K", "w_castle_Q", "b_castle_K", "b_castle_Q",
+              "en_passant_sq")
+
+    for name in rights:
+        if getattr(candidate, name) != getattr(reference, name):
+            return (name + " is " + str(getattr(candidate, name))
+                    + " not " + str(getattr(reference, name)))
+
+    if candidate.get_hash() != reference.get_hash():
+        return "get_hash differs"
+
+    for code, checks in moves:
+        move = Move.decode(code)
+        san = candidate.get_san(move)
+
+        if san != reference.get_san(move):
+            return ("get_san(" + Perft.move_name(move) + ") is "
+                    + repr(san) + " not " + repr(reference.get_san(move)))
+
+    return None
+
+
+def _names(codes):
+    """Return a list of move codes as a string of move names."""
+
+    return "[" + ", ".join(Perft.move_name(Move.decode(code))
+                           for code in codes) + "]"
+
+
+def _side_name(side):
+    """Return the name of a colour."""
+
+    return "white" if side == colour.white else "black"
+
+
+def _play(fen, backends, choose):
+    """Play a game, comparing the backends before each move and after the last.
+
+    Returns a pair of the first Divergence found, or None, and the number
+    of moves played.
+
+    Args:
+        - fen:  the position to start from
+        - backends:  the names of the backends to compare (see BACKENDS)
+        - choose:  a function taking the reference Gamestate, the number of
+                   moves played and the codes of the reference's legal
+                   moves, which returns the code of the next move to play
+                   or None to stop
+
+    """
+
+    reference = make_state(fen, "array")
+    candidates = [(backend, make_state(fen, backend)) for backend in backends]
+    codes = []
+
+    while True:
+        moves = reference_moves(reference)
+
+        for backend, candidate in candidates:
+            description = compare(reference, candidate, moves)
+
+            if description is not None:
+                return (Divergence(backend, fen, codes, description,
+                                   reference.get_fen()), len(codes))
+
+        code = choose(reference, len(codes),
+                      [code for code, checks in moves])
+
+        if code is None:
+            return None, len(codes)
+
+        codes.append(code)
+        move = Move.decode(code)
+
+        reference.push(move)
+        for backend, candidate in candidates:
+            candidate.push(move)
+
+
+def replay(fen, codes, backends):
+    """Play given moves from a position, returning the first Divergence.
+
+    Returns None if there is no difference, or if a move is not legal for
+    the reference.
+
+    Args:
+        - fen:  the position to start from
+        - codes:  the moves to play, as in Move.encode
+        - backends:  the names of the backends to compare (see BACKENDS)
+
+    """
+
+    def choose(reference, ply, legal_codes):
+        if ply == len(codes) or codes[ply] not in legal_codes:
+            return None
+
+        return codes[ply]
+
+    return _play(fen, backends, choose)[0]
+
+
+def play_game(fen, rng, plies, backends):
+    """Play one random game.
+
+    Returns a pair of the first Divergence found, or None, and the number
+    of moves played.
+
+    The game stops at the end of a game, including by the fifty move rule,
+    or after the given number of moves.
+
+    Args:
+        - fen:  the position to start from
+        - rng:  a random.Random used to choose the moves
+        - plies:  the greatest number of moves to play
+        - backends:  the names of the backends to compare (see BACKENDS)
+
+    """
+
+    def choose(reference, ply, legal_codes):
+        if (not legal_codes or ply == plies
+                or reference.fifty_move_count >= 100
+                or reference.board.is_king_draw()):
+            return None
+
+        return rng.choice(sorted(legal_codes))
+
+    return _play(fen, backends, choose)
+
+
+def shrink(divergence, backends):
+    """Return a Divergence with as few moves as can be found.
+
+    First the game is started as late as it can be, from the FEN of a
+    position reached in it, which for most bugs leaves no moves at all.
+    Then runs of moves, halving in length, are taken out while it still
+    shows a difference between the same backend and the reference.
+
+    """
+
+    def reproduces(found):
+        return found is not None and found.backend == divergence.backend
+
+    codes = divergence.codes
+
+    # The FEN of the position after each move of the game
+    game_state = make_state(divergence.fen, "array")
+    fens = [divergence.fen]
+    for code in codes:
+        game_state.push(Move.decode(code))
+        fens.append(game_state.get_fen())
+
+    # Search for the last start which still shows the difference, taking
+    # the first move as one that does
+    low = 0
+    high = len(codes)
+
+    while low < high:
+        middle = (low + high + 1) // 2
+        found = replay(fens[middle], codes[middle:], backends)
+
+        if reproduces(found):
+            divergence = found
+            low = middle
+        else:
+            high = middle - 1
+
+    codes = divergence.codes
+    chunk = len(codes) // 2
+
+    while chunk > 0:
+        removed = False
+        i = 0
+
+        while i < len(codes):
+            found = replay(divergence.fen, codes[:i] + codes[i + chunk:],
+                           backends)
+
+            if reproduces(found):
+                divergence = found
+                codes = found.codes
+                removed = True
+            else:
+                i += chunk
+
+        if not removed:
+            chunk //= 2
+
+    return divergence
+
+
+def fuzz(games, seed=0, plies=200, backends=BACKENDS, fens=None):
+    """Play random games until the backends differ.
+
+    Game i starts from fens[i % len(fens)] and chooses its moves with a
+    random.Random seeded from seed and i, so any game can be played again.
+
+    Returns a pair of the shrunk Divergence, or None if no difference was
+    found, and the number of moves played.
+
+    Args:
+        - games:  the number of games to play
+        - seed:  the seed of the first game
+        - plies:  the greatest number of moves in a game
+        - backends:  the names of the backends to compare (see BACKENDS)
+        - fens:  the positions to start from, by default the start position
+                 and those of Perft.POSITIONS
+
+    """
+
+    if fens is None:
+        fens = [fen for name, fen, counts in Perft.POSITIONS]
+
+    played = 0
+
+    for i in range(games):
+        fen = fens[i % len(fens)]
+        rng = random.Random(str(seed) + "/" + str(i))
+
+        divergence, moves = play_game(fen, rng, plies, backends)
+        played += moves
+
+        if divergence is not None:
+            return shrink(divergence, backends), played
+
+    return None, played
+
+
+def main(argv=None):
+    """Run the fuzzer from the command line, returning an exit status.
+
+    The status is 1 if a difference was found, after printing it.
+
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plies", type=int, default=200,
+                        help="greatest number of moves in a game")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="backend to check (may be repeated)")
+    parser.add_argument("--fen", action="append",
+                        help="position to start from (may be repeated)")
+    args = parser.parse_args(argv)
+
+    divergence, played = fuzz(args.games, args.seed, args.plies,
+                              args.backend or BACKENDS, args.fen)
+
+    if divergence is not None:
+        print(divergence)
+        return 1
+
+    print("No differences in " + str(args.games) + " games ("
+          + str(played) + " moves)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
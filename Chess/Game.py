@@ -2,12 +2,8 @@
 
 # Tkinter graphics package
 from tkinter import *
-import Board
-import Gamestate
-import Player
+from GameLoop import GameLoop
 import Piece
-from Piece import PieceColour as colour
-from Piece import PieceType as p_type
 from Gamestate import Status as g_status
 from Images import Images
 import time
@@ -16,20 +12,17 @@ import time
 BOARD_SIZE = 900
 
 
-class Game:
+class Game(GameLoop):
 
     """Interface between gamestate and AI/human input and manages UI for game.
 
-    Attributes:
+    The turns themselves are taken by GameLoop, which can be used on its
+    own to play a game without a window.
+
+    Attributes (as well as those of GameLoop):
         -master: see ui elements
         -frame: see ui elements
-        -player1: AI type string of player 1 (either filename in
-                  ../Scripts or "Human")
-        -player2: see above
-        -listen: boolean for whether the UI should listen for user
-                 click events.
         -ui_draw: true if we are drawing to the ui
-        -game_state: current state of the game
 
     UI elements:
         - master: Master instance of tkinter
@@ -46,31 +39,19 @@ class Game:
 
     """
 
-    def __init__(self, player1, player2, ui_draw=False):
+    def __init__(self, player1, player2, ui_draw=False, fen=None,
+                 pgn_path="game.pgn"):
         """ Start a game against the two selected types of player and build UI.
+
+            Args:
+                - fen: the position to start from, in FEN, or None for the
+                       start of a game
+                - pgn_path: see attributes
         """
 
-        self.player1 = player1
-        self.player2 = player2
+        super(Game, self).__init__(player1, player2, fen, pgn_path)
 
         self.ui_draw = ui_draw
-        self.board_canvas = None
-
-        if (player1 == "Human"):
-            self.white_player = Player.HumanPlayer(colour.white)
-            self.listen = True
-        else:
-            self.white_player = Player.AIPlayer(
-                Piece.PieceColour.white, player1)
-            self.listen = False
-
-        if (player2 == "Human"):
-            self.black_player = Player.HumanPlayer(colour.black)
-        else:
-            self.black_player = Player.AIPlayer(
-                Piece.PieceColour.black, player2)
-
-        self.game_state = Gamestate.Gamestate()
 
         if(self.ui_draw):
             self.master = Tk()
@@ -90,9 +71,6 @@ class Game:
 
             self.master.mainloop()
 
-        f = open("game.pgn", 'w')
-        f.close()
-
     def build_ui(self):
         """ Build the UI window for the game.
         """
@@ -155,89 +133,49 @@ class Game:
     def play(self):
         """Play through a whole game, and return an enum indicating the result.
 
-        Returns a member of the GameState.Status enum.
+        Returns a member of the GameState.Status enum. When drawing to the
+        UI, one AI turn is taken and the next is left to the Tk event loop.
 
         """
 
+        if not self.ui_draw:
+            return super(Game, self).play()
+
         current_player = self.get_current_player()
 
         if current_player.is_human:
             self.listen = True
             return
 
-        else:
-            self.listen = False
-            status = self.take_ai_turn()
+        self.listen = False
+        status = self.take_ai_turn()
+
+        self.game_state.draw(self.board_canvas)
 
         if status not in (g_status.normal, g_status.white_check,
-                              g_status.black_check):
-            if self.ui_draw:
-                self.game_state.draw(self.board_canvas)
+                          g_status.black_check):
             return status
 
-        if(self.ui_draw):
-
-            self.game_state.draw(self.board_canvas)
-
-            if not self.listen:
-                self.master.after(1, self.play)
-
-        while(not self.ui_draw and not self.listen):
-
-            current_player = self.get_current_player()
-
-            if current_player.is_human:
-                self.listen = True
-                break
-
-            else:
-                self.listen = False
-                status = self.take_ai_turn()
-
-            if status not in (g_status.normal, g_status.white_check,
-                              g_status.black_check):
-                return status
-
-    def get_current_player(self):
-        """Return the player whose turn it currently is."""
-        if self.game_state.is_white_turn:
-            return self.white_player
-        else:
-            return self.black_player
-
-    def take_ai_turn(self):
-        """Take one turn of the game and change state.is_white_turn.
-
-        Get a valid move from the current player, changes game_state
-        to reflect the move being made (handling any pawn promotion), and
-        finally changes whose turn it is. Returns the result of
-        game_state.get_status() after making the move and also calls log_move.
-
-        """
-
-        current_player = self.get_current_player()
-
-        move = current_player.get_move(self.game_state)
-        move_SAN = self.game_state.get_san(move)
-        self.game_state.make_move(move, self.board_canvas)
-        promote_piece = self.ai_promote_pawn(current_player.colour)
-
-        status = self.game_state.get_status()
-        self.log_move(move_SAN, status, promote_piece)
-
-        self.game_state.swap_turn()
-
-        return status
+        self.master.after(1, self.play)
 
     def turn_taken(self, move):
 
+        move = self.choose_promotion(self.get_current_player(), move)
         move_SAN = self.game_state.get_san(move)
+        gives_check = self.game_state.gives_check(move)
 
         self.game_state.make_move(move, self.board_canvas)
 
-        promote_piece = self.human_promote_pawn()
+        if move.promotion is not None:
+            promote_piece = Piece.make_piece(move.promotion,
+                                             self.get_current_player().colour)
+        else:
+            promote_piece = self.human_promote_pawn()
+
+            if promote_piece is not None:
+                gives_check = None
 
-        status = self.game_state.get_status()
+        status = self.game_state.get_status(gives_check)
         self.log_move(move_SAN, status, promote_piece)
 
         self.game_state.swap_turn()
@@ -252,80 +190,3 @@ class Game:
 
     def human_promote_pawn(self):
         pass
-
-    def ai_promote_pawn(self, col):
-        """Handles any pawn promotion and returns the ai's chosen promotion.
-
-        Arguments:
-            - col: the colour of the player to check promotions for
-
-        Returns:
-            - a Piece object, the piece which was chosen by the player to
-              promote their pawn to. If no pawn is available for promotion,
-              returns None.
-
-        """
-
-        if self.game_state.can_promote_pawn(col):
-            current_player = self.get_current_player()
-            piece = current_player.get_promotion(self.game_state)
-            self.game_state.board.promote_pawn(col, piece.type)
-
-            return piece
-
-        return None
-
-    def log_move(self, move_SAN, status, promote_piece):
-        """Write a move into game.pgn.
-
-        Note that this function should be called BEFORE
-        state.swapTurn().
-
-        Inputs:
-            move_SAN:  a string representing the move made in SAN format,
-                       without check/checkmate or promotion appended
-            status:  the result of state.getStatus() after the move has
-                     been made.
-            promote_piece:  the piece which a pawn has been promoted to (the
-                            result of calling self.promote_pawn())
-
-        """
-
-        f = open("game.pgn", 'a')
-
-        # Note that state.moveCount is the number of HALF moves that have been
-        # made, INCLUDING this one.
-        move_number = int((self.game_state.count + 1) / 2)
-
-        if self.game_state.is_white_turn:
-            f.write(str(move_number) + ". " + move_SAN)
-        else:
-            f.write(move_SAN)
-
-        if promote_piece is not None:
-            if promote_piece.type == p_type.queen:
-                f.write("=Q")
-            elif promote_piece.type == p_type.knight:
-                f.write("=K")
-            elif promote_piece.type == p_type.bishop:
-                f.write("=B")
-            elif promote_piece.type == p_type.rook:
-                f.write("=R")
-
-        if status in (g_status.white_check, g_status.black_check):
-            f.write("+ ")
-        elif status == g_status.white_win:
-            f.write("# 1-0")
-        elif status == g_status.black_win:
-            f.write("# 0-1")
-        elif status in (g_status.king_draw, g_status.stalemate,
-                        g_status.agreement_draw, g_status.fifty_move_draw):
-            f.write(" 1/2-1/2")
-        else:
-            f.write(" ")
-
-        f.close()
-
-        #g = open("pict.txt", 'a')
-        #g.write(self.game_state.board.get_pictorial())
-        #g.close()
@@ -0,0 +1,243 @@
+"""Contains the GameLoop class"""
+
+import Gamestate
+import Move
+import Player
+import Piece
+from Piece import PieceColour as colour
+from Piece import PieceType as p_type
+from Gamestate import Status as g_status
+
+
+class GameLoop:
+
+    """Plays a game between two players, without a user interface.
+
+    Game adds the window; this class imports nothing from tkinter, so that
+    games between AIs can be played (and profiled) on machines without Tk.
+
+    Attributes:
+        -player1: AI type string of player 1 (either filename in
+                  ../Scripts or "Human")
+        -player2: see above
+        -white_player: the Player playing white
+        -black_player: the Player playing black
+        -listen: boolean for whether the game is waiting for a human
+                 player to move
+        -board_canvas: the canvas moves are drawn on, or None
+        -game_state: current state of the game
+        -pgn_path: the file the moves of the game are written to
+
+    """
+
+    def __init__(self, player1, player2, fen=None, pgn_path="game.pgn"):
+        """ Set up a game between the two selected types of player.
+
+            Args:
+                - fen: the position to start from, in FEN, or None for the
+                       start of a game
+                - pgn_path: see attributes
+        """
+
+        self.player1 = player1
+        self.player2 = player2
+
+        self.board_canvas = None
+        self.pgn_path = pgn_path
+
+        if (player1 == "Human"):
+            self.white_player = Player.HumanPlayer(colour.white)
+            self.listen = True
+        else:
+            self.white_player = Player.AIPlayer(
+                Piece.PieceColour.white, player1)
+            self.listen = False
+
+        if (player2 == "Human"):
+            self.black_player = Player.HumanPlayer(colour.black)
+        else:
+            self.black_player = Player.AIPlayer(
+                Piece.PieceColour.black, player2)
+
+        if fen is None:
+            self.game_state = Gamestate.Gamestate()
+        else:
+            self.game_state = Gamestate.from_fen(fen)
+
+        # Each turn the same moves are asked for by the UI, the player and
+        # get_status, so most can be kept from one call to the next
+        self.game_state.board.enable_move_cache()
+
+        f = open(self.pgn_path, 'w')
+        f.close()
+
+    def play(self):
+        """Play AI turns until the game ends or a human is to move.
+
+        Returns a member of the GameState.Status enum, or None if a human
+        player is to move.
+
+        """
+
+        while True:
+
+            current_player = self.get_current_player()
+
+            if current_player.is_human:
+                self.listen = True
+                return None
+
+            self.listen = False
+            status = self.take_ai_turn()
+
+            if status not in (g_status.normal, g_status.white_check,
+                              g_status.black_check):
+                return status
+
+    def get_current_player(self):
+        """Return the player whose turn it currently is."""
+        if self.game_state.is_white_turn:
+            return self.white_player
+        else:
+            return self.black_player
+
+    def take_ai_turn(self):
+        """Take one turn of the game and change state.is_white_turn.
+
+        Get a valid move from the current player, changes game_state
+        to reflect the move being made (handling any pawn promotion), and
+        finally changes whose turn it is. Returns the result of
+        game_state.get_status() after making the move and also calls log_move.
+
+        """
+
+        current_player = self.get_current_player()
+
+        move = current_player.get_move(self.game_state)
+        move = self.choose_promotion(current_player, move)
+        move_SAN = self.game_state.get_san(move)
+        gives_check = self.game_state.gives_check(move)
+        self.game_state.make_move(move, self.board_canvas)
+
+        if move.promotion is not None:
+            promote_piece = Piece.make_piece(move.promotion,
+                                             current_player.colour)
+        else:
+            # A pawn moved to the last rank without choosing a piece
+            promote_piece = self.ai_promote_pawn(current_player.colour)
+
+            # The promoted piece may give check where the pawn would not
+            if promote_piece is not None:
+                gives_check = None
+
+        status = self.game_state.get_status(gives_check)
+        self.log_move(move_SAN, status, promote_piece)
+
+        self.game_state.swap_turn()
+
+        return status
+
+    def choose_promotion(self, player, move):
+        """Return move, promoting to the piece chosen by player.
+
+        A pawn move to the last rank is one of four moves, one for each
+        piece it may be promoted to. Whichever of them player picked (the UI
+        gives the queen's), the piece is chosen by player.get_promotion,
+        called before the move is made. If it returns None the move is
+        kept as it is.
+
+        Arguments:
+            - player: the Player making the move
+            - move: the Move chosen by player
+
+        """
+
+        if move.promotion is None:
+            return move
+
+        piece = player.get_promotion(self.game_state)
+
+        if piece is None:
+            return move
+
+        return Move.with_promotion(move, piece.type)
+
+    def ai_promote_pawn(self, col):
+        """Handles any pawn promotion and returns the ai's chosen promotion.
+
+        Promotion moves (see Move.promotion) promote the pawn themselves, so
+        this is only needed for a move to the last rank which does not.
+
+        Arguments:
+            - col: the colour of the player to check promotions for
+
+        Returns:
+            - a Piece object, the piece which was chosen by the player to
+              promote their pawn to. If no pawn is available for promotion,
+              returns None.
+
+        """
+
+        if self.game_state.can_promote_pawn(col):
+            current_player = self.get_current_player()
+            piece = current_player.get_promotion(self.game_state)
+            self.game_state.board.promote_pawn(col, piece.type)
+
+            return piece
+
+        return None
+
+    def log_move(self, move_SAN, status, promote_piece):
+        """Write a move into the file at pgn_path.
+
+        Note that this function should be called BEFORE
+        state.swapTurn().
+
+        Inputs:
+            move_SAN:  a string representing the move made in SAN format,
+                       without check/checkmate or promotion appended
+            status:  the result of state.getStatus() after the move has
+                     been made.
+            promote_piece:  the piece which a pawn has been promoted to (the
+                            result of calling self.promote_pawn())
+
+        """
+
+        f = open(self.pgn_path, 'a')
+
+        # Note that state.moveCount is the number of HALF moves that have been
+        # made, INCLUDING this one.
+        move_number = int((self.game_state.count + 1) / 2)
+
+        if self.game_state.is_white_turn:
+            f.write(str(move_number) + ". " + move_SAN)
+        else:
+            f.write(move_SAN)
+
+        if promote_piece is not None:
+            if promote_piece.type == p_type.queen:
+                f.write("=Q")
+            elif promote_piece.type == p_type.knight:
+                f.write("=N")
+            elif promote_piece.type == p_type.bishop:
+                f.write("=B")
+            elif promote_piece.type == p_type.rook:
+                f.write("=R")
+
+        if status in (g_status.white_check, g_status.black_check):
+            f.write("+ ")
+        elif status == g_status.white_win:
+            f.write("# 1-0")
+        elif status == g_status.black_win:
+            f.write("# 0-1")
+        elif status in (g_status.king_draw, g_status.stalemate,
+                        g_status.agreement_draw, g_status.fifty_move_draw):
+            f.write(" 1/2-1/2")
+        else:
+            f.write(" ")
+
+        f.close()
+
+        #g = open("pict.txt", 'a')
+        #g.write(self.game_state.board.get_pictorial())
+        #g.close()
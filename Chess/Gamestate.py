@@ -1,13 +1,13 @@
 """Contains the Gamestate class"""
 
 from enum import Enum
+from array import array
 import Board
 import Move
+import Zobrist
 from Piece import *
 from Piece import PieceColour as colour
 from Piece import PieceType as p_type
-# Tkinter graphics package
-from tkinter import *
 
 
 class Status(Enum):
@@ -46,13 +46,18 @@ class Gamestate:
                   - selected_piece_moves: list of moves available to the 
                      selected piece
                   - selected_piece: position of the selected piece
+                  - undo_stack: a list with one record for each move made
+                     by push, holding what pop needs to undo it
     """
 
-    def __init__(self):
+    def __init__(self, backend="array"):
         """ Constructor for the game state - defaults to start of a game.
+
+            Args:
+                - backend: the board backend to use (see Board.make_board)
         """
 
-        self.board = Board.Board()
+        self.board = Board.make_board(backend)
         self.board.setup()
 
         # Set castling to true
@@ -72,6 +77,8 @@ class Gamestate:
         self.king_in_check = False
         self.is_white_turn = True
 
+        self.undo_stack = []
+
     def draw(self, canvas):
         """ Draw the gamestate to a Tkinter canvas element.
 
@@ -96,15 +103,19 @@ class Gamestate:
 
         for move in self.selected_piece_moves:
 
-            if(self.board.is_take_move(move)):
-
-                move.set_taking_move()
-
-            move.draw(canvas)
+            move.draw(canvas, self.board.is_take_move(move))
 
         self.board.draw_pieces(canvas)
 
     def select_square(self, square, canvas):
+        """Select a square clicked on, returning the move made or None.
+
+        If a piece is selected and square is one of its destinations, the
+        move there is returned. A pawn promoting on square has a move for
+        each promotion piece. The first of them is returned, and the piece
+        is then chosen by Game.choose_promotion.
+
+        """
 
         for move in self.selected_piece_moves:
 
@@ -158,6 +169,130 @@ class Gamestate:
         self.update_counts(move)
         self.board.make_move(move)
 
+    def push(self, move):
+        """ Make a move and swap turn, so that it can be undone by pop.
+
+            Unlike make_move, every part of the game state is restored by
+            pop, so a search can look many moves ahead without copying.
+
+            Args:
+                - move: a legal move for the player whose turn it is
+        """
+
+        moved = self.board.get_piece(*move.start_posn)
+        taken = self.board.get_piece(*move.end_posn)
+
+        if taken.type == PieceType.blank:
+            taken = None
+
+        self.undo_stack.append((move, moved, taken,
+                                self.w_castle_K, self.w_castle_Q,
+                                self.b_castle_K, self.b_castle_Q,
+                                self.en_passant_sq, self.count,
+                                self.fifty_move_count, self.get_hash()))
+
+        self.update_counts(move)
+        self.board.make_move(move)
+        self.swap_turn()
+
+    def pop(self):
+        """ Undo the last move made by push and return it.
+
+            Raises:
+                - IndexError if there is no move to undo.
+        """
+
+        (move, moved, taken,
+         self.w_castle_K, self.w_castle_Q,
+         self.b_castle_K, self.b_castle_Q,
+         self.en_passant_sq, self.count,
+         self.fifty_move_count, key) = self.undo_stack.pop()
+
+        self.swap_turn()
+        self.board.takeback_move(move, taken)
+
+        # The pawn may have been promoted since the move was pushed
+        if self.board.get_piece(*move.start_posn) != moved:
+            self.board.place_piece(move.start_posn[0], move.start_posn[1],
+                                   moved.type, moved.colour)
+
+        return move
+
+    def is_repetition(self):
+        """ Return true if the current position occurred earlier in the
+            moves made by push.
+        """
+
+        key = self.get_hash()
+
+        for record in self.undo_stack:
+            if record[-1] == key:
+                return True
+
+        return False
+
+    def snapshot(self):
+        """ Return an immutable, hashable encoding of the game state.
+
+            This is a tuple of the board snapshot (see Board.snapshot),
+            is_white_turn, the four castling flags, en_passant_sq, count and
+            fifty_move_count. It is cheap to make and can be passed to
+            restore, or sent to another process.
+        """
+
+        return (self.board.snapshot(), self.is_white_turn,
+                self.w_castle_K, self.w_castle_Q,
+                self.b_castle_K, self.b_castle_Q,
+                self.en_passant_sq, self.count, self.fifty_move_count)
+
+    def restore(self, snapshot):
+        """ Set the game state to a snapshot.
+
+            The undo stack and the selected piece are cleared.
+
+            Args:
+                - snapshot: a tuple returned by snapshot
+        """
+
+        (board, self.is_white_turn,
+         self.w_castle_K, self.w_castle_Q,
+         self.b_castle_K, self.b_castle_Q,
+         self.en_passant_sq, self.count, self.fifty_move_count) = snapshot
+
+        self.board.restore(board)
+        self.undo_stack = []
+        self.selected_piece = None
+        self.selected_piece_moves = []
+
+    def copy(self):
+        """ Return an independent copy of the game state.
+
+            The copy has the same undo stack, so moves pushed before the
+            copy was made can be popped from it, but no piece is selected.
+        """
+
+        game_state = Gamestate.__new__(Gamestate)
+        game_state.board = self.board.copy()
+
+        game_state.w_castle_K = self.w_castle_K
+        game_state.w_castle_Q = self.w_castle_Q
+        game_state.b_castle_K = self.b_castle_K
+        game_state.b_castle_Q = self.b_castle_Q
+
+        game_state.count = self.count
+        game_state.fifty_move_count = self.fifty_move_count
+
+        game_state.en_passant_sq = self.en_passant_sq
+        game_state.selected_piece = None
+        game_state.selected_piece_moves = []
+
+        game_state.king_in_check = self.king_in_check
+        game_state.is_white_turn = self.is_white_turn
+
+        game_state.undo_stack = self.undo_stack[:]
+
+        return game_state
+
     def update_counts(self, move):
         """ Update counters and set en passant square if appropriate.
 
@@ -232,58 +367,95 @@ class Gamestate:
             self.fifty_move_count += 1
 
     def get_piece_moves(self, square):
+        """ Return all the legal moves of the piece on a square.
+            (includes castling and en passant moves)
 
-        p_moves = []
-        piece = self.board.piece_array[square[0]][square[1]]
+            Args:
+                - square: position of the piece
+        """
 
-        p_moves.extend(self.board.get_piece_moves(*square))
+        p_moves = self.board.get_piece_moves(*square)
+        piece = self.board.get_piece(*square)
 
-        if piece.type == p_type.pawn and self.en_passant_sq is not None:
+        if piece.type == p_type.pawn:
 
+            for move in self.get_en_passant_moves(piece.colour):
+                if move.start_posn == square:
+                    p_moves.append(move)
 
-            if(abs(square[0] - self.en_passant_sq[0]) == 1 and
-               abs(square[1] - self.en_passant_sq[1]) == 1):
+        elif piece.type == p_type.king:
 
+            p_moves.extend(self.get_castle_moves(piece.colour))
 
-                pawn_square = (self.en_passant_sq[0], square[1])
+        return p_moves
 
-                p_moves.append(Move.Move((square[0], square[1]),
-                                         self.en_passant_sq,
-                                         en_passant=True,
-                                         en_passant_posn=pawn_square,
-                                         take_move=True))
+    def get_en_passant_moves(self, colour):
+        """ Return the legal en passant moves of the coloured player.
 
-        elif(piece.type == p_type.king):
+            Since en passant removes a piece that is not on the destination
+            square, these are checked by making and taking back the move.
 
-            if(self.w_castle_K == True and square[1] == 7):
+            Args:
+                - colour: colour of the player
+        """
 
-                castle = Move.Move((4, 7), (6, 7), castle=True)
-                if(self.board.is_possible_valid_move(castle)):
+        moves = []
 
-                    p_moves.append(castle)
+        if self.en_passant_sq is None:
+            return moves
 
-            if(self.w_castle_Q == True and square[1] == 7):
+        # The pawn that may be taken stands one square behind the en passant
+        # square, from the point of view of the player taking it
+        ep_x, ep_y = self.en_passant_sq
+        pawn_square = (ep_x, ep_y + colour)
+        taken = self.board.get_piece(*pawn_square)
 
-                castle = Move.Move((4, 7), (2, 7), castle=True)
-                if(self.board.is_possible_valid_move(castle)):
+        if (taken is None or taken.type != p_type.pawn
+                or taken.colour != -colour):
+            return moves
 
-                    p_moves.append(castle)
+        for x in (ep_x - 1, ep_x + 1):
 
-            if(self.b_castle_K == True and square[1] == 0):
+            piece = self.board.get_piece(x, pawn_square[1])
 
-                castle = Move.Move((4, 0), (6, 0), castle=True)
-                if(self.board.is_possible_valid_move(castle)):
+            if (piece is not None and piece.type == p_type.pawn
+                    and piece.colour == colour):
 
-                    p_moves.append(castle)
+                move = Move.get_move((x, pawn_square[1]), self.en_passant_sq,
+                                     Move.EN_PASSANT)
 
-            if(self.b_castle_Q == True and square[1] == 0):
+                if self.board.is_valid_move(move):
+                    moves.append(move)
 
-                castle = Move.Move((4, 0), (2, 0), castle=True)
-                if(self.board.is_possible_valid_move(castle)):
+        return moves
 
-                    p_moves.append(castle)
+    def get_castle_moves(self, colour):
+        """ Return the legal castling moves of the coloured player.
 
-        return p_moves
+            Args:
+                - colour: colour of the player
+        """
+
+        moves = []
+
+        if colour == PieceColour.white:
+            rights = ((self.w_castle_K, Move.get_move((4, 7), (6, 7),
+                                                      Move.KING_CASTLE)),
+                      (self.w_castle_Q, Move.get_move((4, 7), (2, 7),
+                                                      Move.QUEEN_CASTLE)))
+        else:
+            rights = ((self.b_castle_K, Move.get_move((4, 0), (6, 0),
+                                                      Move.KING_CASTLE)),
+                      (self.b_castle_Q, Move.get_move((4, 0), (2, 0),
+                                                      Move.QUEEN_CASTLE)))
+
+        for can_castle, castle in rights:
+
+            if can_castle and self.board.is_possible_valid_move(castle):
+
+                moves.append(castle)
+
+        return moves
 
     def get_all_moves(self, colour):
         """ Return all the legal moves that the coloured player can make.
@@ -293,17 +465,69 @@ class Gamestate:
                 - colour: colour of the player
         """
 
-        moves = []
+        moves = self.board.get_legal_moves(colour)
+        moves.extend(self.get_en_passant_moves(colour))
+        moves.extend(self.get_castle_moves(colour))
 
-        for i in range(Board.Board.SIZE):
-            for j in range(Board.Board.SIZE):
+        return moves
 
-                piece = self.board.piece_array[i][j]
+    def iter_moves(self, colour):
+        """ Yield all the legal moves of the coloured player, in stages.
 
-                if(piece.type != p_type.blank and piece.colour == colour):
-                    moves.extend(self.get_piece_moves((i, j)))
+            Captures come first, then quiet moves, then en passant and
+            castling moves. Each stage is only generated when the previous
+            one has been used up, so a caller which stops early does not pay
+            for the rest. The board must be as it was when iteration began
+            whenever the generator is resumed.
 
-        return moves
+            Args:
+                - colour: colour of the player
+        """
+
+        quiet = array("H")
+
+        for move in self.board.iter_captures(colour, quiet):
+            yield move
+
+        for code in quiet:
+            yield Move.decode(code)
+
+        for move in self.iter_special_moves(colour):
+            yield move
+
+    def iter_captures(self, colour):
+        """ Yield the legal captures of the coloured player (not including
+            en passant), generating them one piece at a time.
+
+            Args:
+                - colour: colour of the player
+        """
+
+        return self.board.iter_captures(colour)
+
+    def iter_quiet_moves(self, colour):
+        """ Yield the legal non-capturing moves of the coloured player (not
+            including castling), generating them one piece at a time.
+
+            Args:
+                - colour: colour of the player
+        """
+
+        return self.board.iter_quiet_moves(colour)
+
+    def iter_special_moves(self, colour):
+        """ Yield the legal en passant and castling moves of the coloured
+            player.
+
+            Args:
+                - colour: colour of the player
+        """
+
+        for move in self.get_en_passant_moves(colour):
+            yield move
+
+        for move in self.get_castle_moves(colour):
+            yield move
 
     def can_promote_pawn(self, colour):
         """ Check if a pawn can be promoted.
@@ -330,6 +554,44 @@ class Gamestate:
 
             return False
 
+    def get_hash(self):
+        """ Return a 64 bit Zobrist hash of the position.
+
+            The hash covers the pieces, the side to move, the castling
+            rights and the en passant square. The board keeps its part up
+            to date as moves are made, so this is O(1).
+        """
+
+        return self.board.get_hash() ^ Zobrist.state_key(
+            self.is_white_turn, self.w_castle_K, self.w_castle_Q,
+            self.b_castle_K, self.b_castle_Q, self.en_passant_sq)
+
+    def get_fen(self):
+        """ Return the game state in Forsyth-Edwards Notation.
+
+            The en passant square is given after every double pawn push,
+            whether or not a pawn can take en passant.
+        """
+
+        castling = ""
+        for can_castle, letter in ((self.w_castle_K, "K"),
+                                   (self.w_castle_Q, "Q"),
+                                   (self.b_castle_K, "k"),
+                                   (self.b_castle_Q, "q")):
+            if can_castle:
+                castling += letter
+
+        if self.en_passant_sq is None:
+            en_passant = "-"
+        else:
+            en_passant = square_name(self.en_passant_sq)
+
+        return (self.board.get_forsyth()
+                + ("w " if self.is_white_turn else "b ")
+                + (castling or "-") + " " + en_passant + " "
+                + str(self.fifty_move_count) + " "
+                + str(self.count // 2 + 1))
+
     def get_san(self, move):
         """ Return the SAN string for a given move.
 
@@ -340,15 +602,57 @@ class Gamestate:
         return self.board.get_san(move)
 
     def legal_move_exists(self, colour):
+        """ Return true if the coloured player can make a legal move.
+            This is the same as has_any_legal_move.
 
-        # if statement returns true if list of moves is empty
-        if(not self.get_all_moves(colour)):
-            return False
-        else:
-            return True
+            Args:
+                - colour: colour of the player
+        """
 
-    def get_status(self):
-        """Return a member of the Status enum."""
+        return self.has_any_legal_move(colour)
+
+    def has_any_legal_move(self, colour):
+        """ Return true if the coloured player can make a legal move,
+            stopping as soon as one is found.
+
+            Args:
+                - colour: colour of the player
+        """
+
+        return (self.board.has_any_legal_move(colour)
+                or len(self.get_en_passant_moves(colour)) > 0
+                or len(self.get_castle_moves(colour)) > 0)
+
+    def count_legal_moves(self, colour):
+        """ Return the number of legal moves the coloured player can make.
+            (includes castling and en passant moves)
+
+            Args:
+                - colour: colour of the player
+        """
+
+        return (self.board.count_legal_moves(colour)
+                + len(self.get_en_passant_moves(colour))
+                + len(self.get_castle_moves(colour)))
+
+    def gives_check(self, move):
+        """ Return true if the move would put the other player in check,
+            without making it (see Board.gives_check).
+
+            Args:
+                - move: a legal move for the player whose turn it is
+        """
+
+        return self.board.gives_check(move)
+
+    def get_status(self, in_check=None):
+        """Return a member of the Status enum.
+
+            Args:
+                - in_check: whether the player who moves next is in check,
+                   if already known (for instance from gives_check), so
+                   that it need not be tested again
+        """
 
         if self.is_white_turn:
             check = Status.white_check
@@ -366,8 +670,9 @@ class Gamestate:
         if self.board.is_king_draw():
             return Status.king_draw
 
-        in_check = self.board.is_in_check(enemy_colour)
-        legal_move_exists = self.legal_move_exists(enemy_colour)
+        if in_check is None:
+            in_check = self.board.is_in_check(enemy_colour)
+        legal_move_exists = self.has_any_legal_move(enemy_colour)
 
         if (not legal_move_exists) and in_check:
             return win
@@ -380,3 +685,82 @@ class Gamestate:
             self.king_in_check = Status.normal
 
         return Status.normal
+
+
+# Piece codes (see Board.piece_code) by their letter in FEN
+FEN_CODES = {piece.get_san(): code for code, piece in Board.CODE_PIECES.items()
+             if code}
+
+# The position at the beginning of a game
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def square_name(square):
+    """ Return the algebraic name of an (x, y) square, such as "e4". """
+
+    return "abcdefgh"[square[0]] + str(8 - square[1])
+
+
+def from_fen(fen, backend="array"):
+    """ Return a Gamestate set to a position in Forsyth-Edwards Notation.
+
+        The half move clock and full move number may be left out.
+
+        Args:
+            - fen: the FEN string of the position
+            - backend: the board backend to use (see Board.make_board)
+
+        Raises:
+            - ValueError if the string is not valid FEN.
+    """
+
+    fields = fen.split()
+
+    if len(fields) == 4:
+        fields += ["0", "1"]
+    if len(fields) != 6:
+        raise ValueError("FEN needs 4 or 6 fields: " + repr(fen))
+
+    placement, turn, castling, en_passant, fifty, full_moves = fields
+
+    ranks = placement.split("/")
+    if len(ranks) != 8:
+        raise ValueError("FEN needs 8 ranks: " + repr(fen))
+
+    board = bytearray()
+    for rank in ranks:
+        start = len(board)
+        for letter in rank:
+            if letter.isdigit():
+                board.extend(bytes(int(letter)))
+            elif letter in FEN_CODES:
+                board.append(FEN_CODES[letter])
+            else:
+                raise ValueError("Bad piece " + repr(letter) + " in FEN: "
+                                 + repr(fen))
+        if len(board) - start != 8:
+            raise ValueError("FEN rank is not 8 squares: " + repr(rank))
+
+    if turn not in ("w", "b") or (castling != "-" and
+                                  not set(castling) <= set("KQkq")):
+        raise ValueError("Bad side to move or castling in FEN: " + repr(fen))
+
+    if en_passant == "-":
+        en_passant_sq = None
+    elif (len(en_passant) == 2 and en_passant[0] in "abcdefgh"
+          and en_passant[1] in "36"):
+        en_passant_sq = ("abcdefgh".index(en_passant[0]),
+                         8 - int(en_passant[1]))
+    else:
+        raise ValueError("Bad en passant square in FEN: " + repr(fen))
+
+    is_white_turn = turn == "w"
+    count = 2 * (int(full_moves) - 1) + (0 if is_white_turn else 1)
+
+    game_state = Gamestate(backend)
+    game_state.restore((bytes(board), is_white_turn,
+                        "K" in castling, "Q" in castling,
+                        "k" in castling, "q" in castling,
+                        en_passant_sq, count, int(fifty)))
+
+    return game_state
@@ -0,0 +1,1296 @@
+"""Contains the MailboxBoard class"""
+
+from array import array
+import Move
+import Board
+import Zobrist
+from Piece import PieceType as p_type
+from Piece import PieceColour as Colour
+
+
+# Square codes stored in the mailbox. A piece is stored as its code (see
+# Board.piece_code). OFF_BOARD marks the border.
+EMPTY = 0
+BLACK = Board.BLACK_CODE
+OFF_BOARD = 0xFF
+
+WIDTH = 10
+
+# Mailbox steps, in the same (up_down, left_right) sense as
+# Board.search_direction. Note that "up" is the negative y direction.
+KNIGHT_STEPS = (-21, -19, -12, -8, 8, 12, 19, 21)
+KING_STEPS = (-11, -10, -9, -1, 1, 9, 10, 11)
+VER_HOR_STEPS = (-10, -1, 1, 10)
+DIAG_STEPS = (-11, -9, 9, 11)
+
+CAPTURE_FLAG = Board.CAPTURE_FLAG
+DOUBLE_PUSH_FLAG = Board.DOUBLE_PUSH_FLAG
+
+
+def index(x, y):
+    """Return the mailbox index of the board square (x, y)."""
+    return (y + 2) * WIDTH + x + 1
+
+
+def to_colour_bit(piece_colour):
+    """Return the colour bit of a square code for a PieceColour member."""
+    return BLACK if piece_colour == Colour.black else 0
+
+
+code = Board.piece_code
+
+# The shared Piece for each code
+PIECES = Board.CODE_PIECES
+
+# KEYS[sq_code][i] is the Zobrist key of the piece with that code on mailbox
+# index i (0 for empty and border squares)
+KEYS = [[0] * (12 * WIDTH) for _code in range(2 * BLACK)]
+for (_type, _colour), _keys in Zobrist.PIECE_KEYS.items():
+    for _sq, _key in enumerate(_keys):
+        KEYS[code(_type, _colour)][index(_sq % 8, _sq // 8)] = _key
+
+# Board coordinates of each mailbox index (None for border squares).
+COORDS = [None] * (12 * WIDTH)
+for _x in range(Board.Board.SIZE):
+    for _y in range(Board.Board.SIZE):
+        COORDS[index(_x, _y)] = (_x, _y)
+
+# The square number (y * 8 + x) of each mailbox index, as used in move codes
+# (see Move.encode), and the same shifted into the end square bits
+SQUARES = [0] * (12 * WIDTH)
+END_BITS = [0] * (12 * WIDTH)
+for _i, _coords in enumerate(COORDS):
+    if _coords is not None:
+        SQUARES[_i] = _coords[1] * 8 + _coords[0]
+        END_BITS[_i] = SQUARES[_i] << 6
+
+
+def allowed_indices(start, check_mask, pins):
+    """Return the indices a piece other than a king at start may move to.
+
+    Only indices which would not leave the king in check are returned, as
+    in Board.get_allowed_squares, or None if the piece may move anywhere.
+
+    Args:
+        - start:  the mailbox index of the piece
+        - check_mask, pins:  as returned by MailboxBoard._find_pin_info for
+                             the colour of the piece
+
+    """
+
+    pin_line = pins.get(start)
+
+    if pin_line is None:
+        return check_mask
+    if check_mask is None:
+        return pin_line
+
+    return pin_line & check_mask
+
+
+class MailboxBoard(Board.Board):
+
+    """A Board stored as a flat 10 x 12 mailbox of small integer codes.
+
+    The two outer files and ranks on each side are filled with OFF_BOARD, so
+    that walking off the edge of the board never needs a bounds check. The
+    public Board API is unchanged; piece_array is provided as a read only
+    view for callers (such as drawing code) which still index it directly.
+
+    Moves are generated as 16 bit codes (see Move.encode) straight from
+    squares, and are made legal with pin and check information rather than
+    by making them, as in Board.
+
+    Attributes:
+        - squares:  a bytearray of 120 square codes
+        - piece_indices:  a dictionary mapping each colour bit (0 for white,
+                          BLACK for black) to the set of mailbox indices of
+                          its pieces (including the king)
+        - king_indices:  a dictionary mapping each colour bit to the mailbox
+                         index of its king, or None if it has no king
+        - zobrist_key:  a 64 bit hash of the pieces on the board (see the
+                        Zobrist module)
+
+    Every change to squares goes through _set_code, which keeps
+    piece_indices, king_indices, zobrist_key and any attack maps (see
+    Board.enable_attack_maps) up to date.
+
+    """
+
+    BACKEND = "mailbox"
+
+    def clear(self):
+        """Initialise the mailbox as an empty board."""
+        self.squares = bytearray([OFF_BOARD]) * (12 * WIDTH)
+        self.piece_indices = {0: set(), BLACK: set()}
+        self.king_indices = {0: None, BLACK: None}
+        self.zobrist_key = 0
+
+        for y in range(Board.Board.SIZE):
+            start = index(0, y)
+            self.squares[start:start + Board.Board.SIZE] = \
+                bytes(Board.Board.SIZE)
+
+        if self.attack_counts is not None:
+            self.attack_counts = {Colour.white: [0] * 64,
+                                  Colour.black: [0] * 64}
+
+    @property
+    def piece_array(self):
+        """Return an 8 x 8 list of the pieces on the board (read only)."""
+        squares = self.squares
+        return [[PIECES[squares[index(x, y)]]
+                 for y in range(Board.Board.SIZE)]
+                for x in range(Board.Board.SIZE)]
+
+    def draw_pieces(self, canvas):
+
+        sq_width = int(canvas["width"])/8
+
+        for i, sq_code in enumerate(self.squares):
+            if sq_code != EMPTY and sq_code != OFF_BOARD:
+                x, y = COORDS[i]
+                PIECES[sq_code].draw(canvas, x*sq_width, y*sq_width)
+
+    def copy(self):
+        """Return an independent copy of the board."""
+
+        board = MailboxBoard.__new__(MailboxBoard)
+        board.squares = self.squares[:]
+        board.piece_indices = {bit: set(indices)
+                               for bit, indices in self.piece_indices.items()}
+        board.king_indices = dict(self.king_indices)
+        board.zobrist_key = self.zobrist_key
+
+        if self.attack_counts is not None:
+            board.attack_counts = {colour: counts[:] for colour, counts
+                                   in self.attack_counts.items()}
+
+        return board
+
+    def snapshot(self):
+        """Return an immutable encoding of the pieces on the board.
+
+        See Board.snapshot. The mailbox already stores piece codes, so this
+        just joins its eight ranks.
+
+        """
+
+        squares = self.squares
+
+        return b"".join(squares[index(0, y):index(0, y) + Board.Board.SIZE]
+                        for y in range(Board.Board.SIZE))
+
+    def restore(self, snapshot):
+        """Set the pieces on the board to those of a snapshot."""
+
+        squares = self.squares
+        piece_indices = self.piece_indices = {0: set(), BLACK: set()}
+        self.king_indices = {0: None, BLACK: None}
+        key = 0
+
+        for y in range(Board.Board.SIZE):
+            start = index(0, y)
+            squares[start:start + Board.Board.SIZE] = snapshot[y * 8:y * 8 + 8]
+
+            for i in range(start, start + Board.Board.SIZE):
+                sq_code = squares[i]
+                key ^= KEYS[sq_code][i]
+
+                if sq_code != EMPTY:
+                    piece_indices[sq_code & BLACK].add(i)
+                    if sq_code & ~BLACK == p_type.king:
+                        self.king_indices[sq_code & BLACK] = i
+
+        self.zobrist_key = key
+
+        if self.attack_counts is not None:
+            self.enable_attack_maps()
+
+    def make_move(self, move):
+        """Adjust the state of the board to reflect the passed move.
+
+        The universe may explode if this is not a legal move.
+
+        Args:
+            - move:  a Move object
+        """
+
+        if move.castle:
+            self.castle(move)
+            return
+
+        if move.en_passant:
+            self._set_code(index(*move.en_passant_posn), EMPTY)
+
+        start = index(*move.start_posn)
+        sq_code = self.squares[start]
+
+        if move.promotion is not None:
+            sq_code = (sq_code & BLACK) | move.promotion
+
+        self._set_code(index(*move.end_posn), sq_code)
+        self._set_code(start, EMPTY)
+
+    def takeback_move(self, move, taken_piece):
+
+        if move.castle:
+            self.takeback_castle(move)
+            return
+
+        end = index(*move.end_posn)
+        sq_code = self.squares[end]
+
+        if move.en_passant:
+            # The captured pawn is the opposite colour to the capturing one
+            self._set_code(index(*move.en_passant_posn), sq_code ^ BLACK)
+
+        if move.promotion is not None:
+            sq_code = (sq_code & BLACK) | p_type.pawn
+
+        self._set_code(index(*move.start_posn), sq_code)
+
+        if taken_piece is not None:
+            self._set_code(end, code(taken_piece.type, taken_piece.colour))
+        else:
+            self._set_code(end, EMPTY)
+
+    def promote_pawn(self, piece_colour, piece_type):
+        """Promote a pawn of a given colour to the given piece type.
+
+        Args:
+            - piece_colour:  a member of the PieceColour enum
+            - piece_type:  a member of the PieceType enum
+
+        Raises:
+            - TypeError if there is no valid pawn to promote.
+
+        """
+
+        if (piece_colour == Colour.white):
+            y = 0
+        else:
+            y = 7
+
+        start = index(0, y)
+        i = self.squares.find(code(p_type.pawn, piece_colour),
+                              start, start + Board.Board.SIZE)
+
+        if i == -1:
+            raise TypeError(
+                "Promote Pawn called, but no pawn is available for promotion.")
+
+        self._set_code(i, code(piece_type, piece_colour))
+
+    ###########################################################################
+    ############################# HELPER FUNCTIONS ############################
+    ###########################################################################
+
+    def get_piece(self, x, y):
+        """Return the piece at position x, y on the board.
+
+        Returns None if indeices out of bounds
+        """
+
+        if not self.is_square(x, y):
+            return None
+
+        return PIECES[self.squares[index(x, y)]]
+
+    def get_piece_posns(self, piece_colour):
+        """Return the set of positions of the pieces of the passed colour."""
+
+        return {COORDS[i]
+                for i in self.piece_indices[to_colour_bit(piece_colour)]}
+
+    def get_king_posn(self, piece_colour):
+        """Return the position of the king of the passed colour, or None."""
+
+        i = self.king_indices[to_colour_bit(piece_colour)]
+
+        if i is None:
+            return None
+
+        return COORDS[i]
+
+    def place_piece(self, x, y, piece_type, piece_colour):
+        """Place a piece of the passed type at the passed location.
+
+        Args:
+            - x, y:  ints specifying the position on the board to place piece
+            - type:  a member of the PieceType enum
+            - piece_colour:  a member of the PieceColour enum
+
+        Will raise IndexError if the indices are not valid.
+        """
+
+        if not self.is_square(x, y):
+            raise IndexError
+
+        self._set_code(index(x, y), code(piece_type, piece_colour))
+
+    def remove_piece(self, x, y):
+        """Remove the piece at the passed location.
+
+        Args:
+            - x, y:  ints specifying the position on the board to remove piece
+
+        Will raise IndexError if the indices are not valid.
+        """
+
+        if not self.is_square(x, y):
+            raise IndexError
+
+        self._set_code(index(x, y), EMPTY)
+
+    def _set_code(self, i, sq_code):
+        """Store sq_code at mailbox index i, updating the piece indices,
+        zobrist_key and any attack maps."""
+
+        squares = self.squares
+        old_code = squares[i]
+
+        self.zobrist_key ^= KEYS[old_code][i] ^ KEYS[sq_code][i]
+        squares[i] = sq_code
+
+        if old_code != EMPTY:
+            self.piece_indices[old_code & BLACK].discard(i)
+
+            # A king moving is put on its new square before it is taken off
+            # the old one
+            if self.king_indices[old_code & BLACK] == i:
+                self.king_indices[old_code & BLACK] = None
+
+        if sq_code != EMPTY:
+            self.piece_indices[sq_code & BLACK].add(i)
+
+            if sq_code & ~BLACK == p_type.king:
+                self.king_indices[sq_code & BLACK] = i
+
+        if self.attack_counts is not None and old_code != sq_code:
+            self._update_attack_maps(i, old_code, sq_code)
+
+    def _update_attack_maps(self, i, old_code, sq_code):
+        """Update the attack maps for old_code being replaced by sq_code on
+        mailbox index i. See Board.place_piece and Board.remove_piece."""
+
+        x, y = COORDS[i]
+
+        if old_code != EMPTY:
+            piece = PIECES[old_code]
+            self._add_piece_attacks(x, y, piece,
+                                    self.attack_counts[piece.colour], -1)
+
+        if sq_code != EMPTY:
+            piece = PIECES[sq_code]
+            self._add_piece_attacks(x, y, piece,
+                                    self.attack_counts[piece.colour], 1)
+
+        # Sliders are only blocked or unblocked if the square fills or empties
+        if old_code == EMPTY:
+            self._update_rays_through(x, y, -1)
+        elif sq_code == EMPTY:
+            self._update_rays_through(x, y, 1)
+
+    def search_direction(self, x, y, up_down, left_right, no_legal=False):
+        """Move along the board in a given direction and return information.
+
+        See Board.search_direction for the meaning of the arguments and the
+        returned tuple.
+
+        """
+
+        squares = self.squares
+        step = up_down * WIDTH + left_right
+        num_squares = 0
+        found_piece = None
+        move_list = []
+
+        i = index(x, y) + step
+        sq_code = squares[i]
+
+        while sq_code != OFF_BOARD:
+
+            if not no_legal:
+                move = Move.Move((x, y), COORDS[i])
+
+                if self.is_possible_valid_move(move):
+                    move_list.append(move)
+
+            if sq_code != EMPTY:
+                found_piece = PIECES[sq_code]
+                break
+
+            num_squares += 1
+            i += step
+            sq_code = squares[i]
+
+        return (num_squares, found_piece, move_list)
+
+    ###########################################################################
+    ############################# MOVE EVALUATION #############################
+    ###########################################################################
+
+    def is_possible_move(self, move):
+        """Return True if the passed move is possible.
+
+        See Board.is_possible_move.
+
+        """
+
+        if move.castle:
+            return self.is_possible_castle_move(move)
+
+        x, y = move.end_posn
+
+        if not (0 <= x < 8 and 0 <= y < 8):
+            return False
+
+        squares = self.squares
+        target = squares[index(x, y)]
+
+        if target == EMPTY:
+            return True
+
+        return (target & BLACK) != (squares[index(*move.start_posn)] & BLACK)
+
+    def is_valid_move(self, move):
+        """Return true if the passed move is valid.
+
+        A move is valid if after is it made, the king of the player who made it
+        is not in check.
+
+        Args:
+            - move:  a Move object
+
+        """
+
+        if move.castle:
+            return self.is_valid_castle_move(move)
+
+        squares = self.squares
+        start = index(*move.start_posn)
+        end = index(*move.end_posn)
+        moving = squares[start]
+        taken = squares[end]
+
+        squares[end] = moving
+        squares[start] = EMPTY
+
+        if move.en_passant:
+            ep = index(*move.en_passant_posn)
+            ep_code = squares[ep]
+            squares[ep] = EMPTY
+
+        # squares was changed directly, so king_indices is not up to date
+        if moving & ~BLACK == p_type.king:
+            king = end
+        else:
+            king = self.king_indices[moving & BLACK]
+
+        in_check = (king is not None
+                    and self._is_attacked(king, (moving & BLACK) ^ BLACK))
+
+        squares[start] = moving
+        squares[end] = taken
+
+        if move.en_passant:
+            squares[ep] = ep_code
+
+        return not in_check
+
+    def is_take_move(self, move):
+        """Return true if the passed move is a taking move."""
+        return self.squares[index(*move.end_posn)] != EMPTY
+
+    ###########################################################################
+    ############################## MOVE FETCHING ##############################
+    ###########################################################################
+
+    def get_pin_info(self, piece_colour):
+        """Return the check evasion mask and the pinned pieces of a colour.
+
+        See Board.get_pin_info. The squares are given as (x, y) positions,
+        converted from the mailbox indices of _find_pin_info.
+
+        """
+
+        return self.find_pin_info(piece_colour)
+
+    def find_pin_info(self, piece_colour):
+        """Return the result of get_pin_info, computed from the board."""
+
+        king, check_mask, pins = self._find_pin_info(
+            to_colour_bit(piece_colour))
+
+        if king is None:
+            return (None, None, {})
+
+        if check_mask is not None:
+            check_mask = {COORDS[i] for i in check_mask}
+
+        return (COORDS[king], check_mask,
+                {COORDS[i]: {COORDS[j] for j in line}
+                 for i, line in pins.items()})
+
+    def _find_pin_info(self, colour_bit):
+        """Return the king index, check mask and pins of a colour bit.
+
+        As Board.get_pin_info, but with mailbox indices in place of (x, y)
+        positions.
+
+        """
+
+        king = self.king_indices[colour_bit]
+
+        if king is None:
+            return (None, None, {})
+
+        squares = self.squares
+        enemy = colour_bit ^ BLACK
+        checks = []
+        pins = {}
+
+        # Pawns attack from the rank in front of the king
+        if enemy:
+            pawn_row = king - WIDTH
+        else:
+            pawn_row = king + WIDTH
+
+        pawn = p_type.pawn | enemy
+        for i in (pawn_row - 1, pawn_row + 1):
+            if squares[i] == pawn:
+                checks.append({i})
+
+        knight = p_type.knight | enemy
+        for step in KNIGHT_STEPS:
+            if squares[king + step] == knight:
+                checks.append({king + step})
+
+        queen = p_type.queen | enemy
+
+        for steps, slider in ((VER_HOR_STEPS, p_type.rook | enemy),
+                              (DIAG_STEPS, p_type.bishop | enemy)):
+            for step in steps:
+                i = king + step
+                sq_code = squares[i]
+                friendly = None
+
+                while sq_code != OFF_BOARD:
+                    if sq_code != EMPTY:
+                        if (sq_code & BLACK) == colour_bit:
+                            # A second friendly piece shields the first
+                            if friendly is not None:
+                                break
+                            friendly = i
+                        else:
+                            if sq_code == slider or sq_code == queen:
+                                line = set(range(king + step, i + step, step))
+                                if friendly is None:
+                                    checks.append(line)
+                                else:
+                                    pins[friendly] = line
+                            break
+
+                    i += step
+                    sq_code = squares[i]
+
+        if not checks:
+            check_mask = None
+        elif len(checks) == 1:
+            check_mask = checks[0]
+        else:
+            check_mask = set()
+
+        return (king, check_mask, pins)
+
+    def _index_pin_info(self, colour_bit, pin_info):
+        """Return _find_pin_info(colour_bit), or pin_info with indices.
+
+        Args:
+            - colour_bit:  the colour bit of the side
+            - pin_info:  the result of get_pin_info for the side, or None
+
+        """
+
+        if pin_info is None:
+            return self._find_pin_info(colour_bit)
+
+        king_posn, check_mask, pins = pin_info
+
+        if king_posn is None:
+            return (None, None, {})
+
+        if check_mask is not None:
+            check_mask = {index(x, y) for x, y in check_mask}
+
+        return (index(*king_posn), check_mask,
+                {index(*posn): {index(x, y) for x, y in line}
+                 for posn, line in pins.items()})
+
+    def get_allowed_squares(self, x, y, pin_info=None):
+        """Return the squares the piece at (x, y) may move to.
+
+        See Board.get_allowed_squares.
+
+        """
+
+        allowed = self._get_allowed(index(x, y), pin_info)
+
+        if allowed is None:
+            return None
+
+        return {COORDS[i] for i in allowed}
+
+    def get_piece_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for the piece at (x, y).
+
+        See Board.get_piece_moves.
+
+        """
+
+        codes = array("H")
+        self.add_piece_codes(x, y, codes, pin_info)
+
+        return Move.decode_all(codes)
+
+    def add_piece_codes(self, x, y, codes, pin_info=None):
+        """Append the encoded legal moves of the piece at (x, y) to codes.
+
+        See Board.add_piece_codes.
+
+        """
+
+        start = index(x, y)
+        sq_code = self.squares[start]
+
+        if sq_code == EMPTY:
+            return
+
+        king, check_mask, pins = self._index_pin_info(sq_code & BLACK,
+                                                      pin_info)
+        self._add_piece_codes(start, codes, check_mask, pins)
+
+    def add_uncached_codes(self, x, y, piece_type, allowed, codes):
+        """Append the encoded moves of the piece at (x, y) other than a king.
+
+        See Board.add_uncached_codes.
+
+        """
+
+        start = index(x, y)
+
+        if allowed is not None:
+            allowed = {index(i, j) for i, j in allowed}
+
+        if piece_type == p_type.queen:
+            self._add_ray_codes(start, KING_STEPS, allowed, codes)
+        elif piece_type == p_type.bishop:
+            self._add_ray_codes(start, DIAG_STEPS, allowed, codes)
+        elif piece_type == p_type.rook:
+            self._add_ray_codes(start, VER_HOR_STEPS, allowed, codes)
+        elif piece_type == p_type.knight:
+            self._add_step_codes(start, KNIGHT_STEPS, allowed, codes)
+        elif piece_type == p_type.pawn:
+            self._add_pawn_codes(start, allowed, codes)
+
+    def get_legal_moves(self, piece_colour):
+        """Return a list of the legal moves of every piece of a colour.
+
+        See Board.get_legal_moves.
+
+        """
+
+        return Move.decode_all(self.get_move_codes(piece_colour))
+
+    def get_move_codes(self, piece_colour):
+        """Return an array('H') of the encoded legal moves of a colour.
+
+        See Board.get_move_codes.
+
+        """
+
+        colour_bit = to_colour_bit(piece_colour)
+        king, check_mask, pins = self._find_pin_info(colour_bit)
+        codes = array("H")
+
+        if check_mask is not None:
+            self._add_evasion_codes(king, check_mask, pins, codes)
+            return codes
+
+        for i in self.piece_indices[colour_bit]:
+            self._add_piece_codes(i, codes, check_mask, pins)
+
+        return codes
+
+    def get_evasion_codes(self, piece_colour, pin_info=None):
+        """Return an array('H') of the encoded legal moves of a colour whose
+        king is in check.
+
+        See Board.get_evasion_codes.
+
+        """
+
+        king, check_mask, pins = self._index_pin_info(
+            to_colour_bit(piece_colour), pin_info)
+
+        if check_mask is None:
+            return self.get_move_codes(piece_colour)
+
+        codes = array("H")
+        self._add_evasion_codes(king, check_mask, pins, codes)
+
+        return codes
+
+    def _add_evasion_codes(self, king, check_mask, pins, codes):
+        """Append the encoded moves out of check of a king's side to codes.
+
+        Only king moves, captures of the checking piece and moves onto the
+        line between it and the king are generated.
+
+        Args:
+            - king:  the mailbox index of the king in check
+            - check_mask, pins:  as returned by _find_pin_info
+
+        """
+
+        self._add_king_codes(king, codes)
+        colour_bit = self.squares[king] & BLACK
+
+        # In double check only the king can move
+        for i in check_mask:
+            self._add_interposition_codes(i, colour_bit, pins, codes)
+
+    def add_interposition_codes(self, square, piece_colour, pins, codes):
+        """Append the encoded moves of pieces other than the king to square.
+
+        See Board.add_interposition_codes.
+
+        """
+
+        self._add_interposition_codes(index(*square),
+                                      to_colour_bit(piece_colour),
+                                      {index(x, y) for x, y in pins}, codes)
+
+    def _add_interposition_codes(self, end, colour_bit, pins, codes):
+        """Append the encoded moves of pieces other than the king to end.
+
+        See Board.add_interposition_codes. Pinned pieces are skipped, as
+        they can never resolve a check.
+
+        """
+
+        squares = self.squares
+        end_bits = END_BITS[end]
+
+        if colour_bit:
+            forward = WIDTH
+            double_rank = 1
+        else:
+            forward = -WIDTH
+            double_rank = 6
+
+        pawn = p_type.pawn | colour_bit
+
+        if squares[end] != EMPTY:
+            end_bits |= CAPTURE_FLAG
+
+            for i in (end - forward - 1, end - forward + 1):
+                if squares[i] == pawn and i not in pins:
+                    Board.add_pawn_code(codes, SQUARES[i] | end_bits)
+        else:
+            behind = end - forward
+
+            if squares[behind] == EMPTY:
+                i = behind - forward
+                if (squares[i] == pawn and SQUARES[i] >> 3 == double_rank
+                        and i not in pins):
+                    codes.append(SQUARES[i] | end_bits | DOUBLE_PUSH_FLAG)
+            elif squares[behind] == pawn and behind not in pins:
+                Board.add_pawn_code(codes, SQUARES[behind] | end_bits)
+
+        knight = p_type.knight | colour_bit
+        for step in KNIGHT_STEPS:
+            i = end + step
+            if squares[i] == knight and i not in pins:
+                codes.append(SQUARES[i] | end_bits)
+
+        queen = p_type.queen | colour_bit
+
+        for steps, slider in ((VER_HOR_STEPS, p_type.rook | colour_bit),
+                              (DIAG_STEPS, p_type.bishop | colour_bit)):
+            for step in steps:
+                i = end + step
+                sq_code = squares[i]
+
+                while sq_code == EMPTY:
+                    i += step
+                    sq_code = squares[i]
+
+                if (sq_code == slider or sq_code == queen) and i not in pins:
+                    codes.append(SQUARES[i] | end_bits)
+
+    def iter_piece_codes(self, piece_colour):
+        """Yield an array('H') of encoded legal moves for each piece in turn.
+
+        See Board.iter_piece_codes.
+
+        """
+
+        colour_bit = to_colour_bit(piece_colour)
+        king, check_mask, pins = self._find_pin_info(colour_bit)
+
+        # In check, the few legal moves are generated together
+        if check_mask is not None:
+            codes = array("H")
+            self._add_evasion_codes(king, check_mask, pins, codes)
+            yield codes
+            return
+
+        # Copied, as moves may be made while the generator is suspended
+        for i in list(self.piece_indices[colour_bit]):
+            codes = array("H")
+            self._add_piece_codes(i, codes, check_mask, pins)
+            yield codes
+
+    def get_king_moves(self, x, y):
+        """Return a list of available moves for a king at (x, y).
+
+        See Board.get_king_moves.
+
+        """
+
+        codes = array("H")
+        self._add_king_codes(index(x, y), codes)
+
+        return Move.decode_all(codes)
+
+    def get_queen_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a queen at (x, y).
+
+        See Board.get_queen_moves.
+
+        """
+
+        return self._get_ray_moves(x, y, KING_STEPS, pin_info)
+
+    def get_bishop_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a bishop at (x, y).
+
+        See Board.get_bishop_moves.
+
+        """
+
+        return self._get_ray_moves(x, y, DIAG_STEPS, pin_info)
+
+    def get_knight_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a knight at (x, y).
+
+        See Board.get_knight_moves.
+
+        """
+
+        start = index(x, y)
+        codes = array("H")
+        self._add_step_codes(start, KNIGHT_STEPS,
+                             self._get_allowed(start, pin_info), codes)
+
+        return Move.decode_all(codes)
+
+    def get_rook_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a rook at (x, y).
+
+        See Board.get_rook_moves.
+
+        """
+
+        return self._get_ray_moves(x, y, VER_HOR_STEPS, pin_info)
+
+    def get_pawn_moves(self, x, y, pin_info=None):
+        """Return a list of available moves for a pawn at (x, y).
+
+        Given a position (x, y) returns a list of moves which it is legal for
+        a pawn at (x, y) to make, excluding en passant moves. A move to the
+        last rank is returned once for each piece in Board.PROMOTION_PIECES.
+
+        """
+
+        start = index(x, y)
+        codes = array("H")
+        self._add_pawn_codes(start, self._get_allowed(start, pin_info), codes)
+
+        return Move.decode_all(codes)
+
+    def _get_ray_moves(self, x, y, steps, pin_info):
+        """Return the legal sliding moves from (x, y) along the steps."""
+
+        start = index(x, y)
+        codes = array("H")
+        self._add_ray_codes(start, steps, self._get_allowed(start, pin_info),
+                            codes)
+
+        return Move.decode_all(codes)
+
+    def _get_allowed(self, start, pin_info=None):
+        """Return the indices the piece at start may move to, or None.
+
+        See Board.get_allowed_squares.
+
+        """
+
+        king, check_mask, pins = self._index_pin_info(
+            self.squares[start] & BLACK, pin_info)
+
+        return allowed_indices(start, check_mask, pins)
+
+    def add_king_codes(self, x, y, codes):
+        """Append the encoded moves of a king at (x, y) to codes.
+
+        See Board.add_king_codes.
+
+        """
+
+        self._add_king_codes(index(x, y), codes)
+
+    def add_slider_codes(self, x, y, directions, allowed, codes):
+        """Append the encoded moves along directions from (x, y) to codes."""
+
+        if allowed is not None:
+            allowed = {index(i, j) for i, j in allowed}
+
+        self._add_ray_codes(index(x, y),
+                            [up_down * WIDTH + left_right
+                             for up_down, left_right in directions],
+                            allowed, codes)
+
+    def add_knight_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a knight at (x, y) to codes."""
+
+        if allowed is not None:
+            allowed = {index(i, j) for i, j in allowed}
+
+        self._add_step_codes(index(x, y), KNIGHT_STEPS, allowed, codes)
+
+    def add_pawn_codes(self, x, y, allowed, codes):
+        """Append the encoded moves of a pawn at (x, y) to codes."""
+
+        if allowed is not None:
+            allowed = {index(i, j) for i, j in allowed}
+
+        self._add_pawn_codes(index(x, y), allowed, codes)
+
+    def _add_piece_codes(self, start, codes, check_mask, pins):
+        """Append the encoded legal moves of the piece at start to codes.
+
+        Args:
+            - start:  the mailbox index of the piece
+            - codes:  an array('H') to append the codes to
+            - check_mask, pins:  as returned by _find_pin_info for the
+                                 colour of the piece
+
+        """
+
+        piece_type = self.squares[start] & ~BLACK
+
+        if piece_type == p_type.king:
+            self._add_king_codes(start, codes)
+            return
+
+        allowed = allowed_indices(start, check_mask, pins)
+
+        if piece_type == p_type.pawn:
+            self._add_pawn_codes(start, allowed, codes)
+        elif piece_type == p_type.knight:
+            self._add_step_codes(start, KNIGHT_STEPS, allowed, codes)
+        elif piece_type == p_type.bishop:
+            self._add_ray_codes(start, DIAG_STEPS, allowed, codes)
+        elif piece_type == p_type.rook:
+            self._add_ray_codes(start, VER_HOR_STEPS, allowed, codes)
+        elif piece_type == p_type.queen:
+            self._add_ray_codes(start, KING_STEPS, allowed, codes)
+
+    def _add_king_codes(self, start, codes):
+        """Append the encoded moves of the king at start to codes.
+
+        Each move is tested with _is_attacked, with the king lifted off the
+        board so that the squares behind it on a checking line are seen to
+        be attacked.
+
+        """
+
+        squares = self.squares
+        king = squares[start]
+        colour_bit = king & BLACK
+        enemy = colour_bit ^ BLACK
+        start_sq = SQUARES[start]
+
+        squares[start] = EMPTY
+
+        for step in KING_STEPS:
+            i = start + step
+            target = squares[i]
+
+            if target == EMPTY:
+                if not self._is_attacked(i, enemy):
+                    codes.append(start_sq | END_BITS[i])
+            elif target != OFF_BOARD and (target & BLACK) != colour_bit:
+                if not self._is_attacked(i, enemy):
+                    codes.append(start_sq | END_BITS[i] | CAPTURE_FLAG)
+
+        squares[start] = king
+
+    def _add_step_codes(self, start, steps, allowed, codes):
+        """Append the encoded single step moves from start to codes."""
+
+        squares = self.squares
+        colour_bit = squares[start] & BLACK
+        start_sq = SQUARES[start]
+
+        for step in steps:
+            i = start + step
+            target = squares[i]
+
+            if allowed is not None and i not in allowed:
+                continue
+
+            if target == EMPTY:
+                codes.append(start_sq | END_BITS[i])
+            elif target != OFF_BOARD and (target & BLACK) != colour_bit:
+                codes.append(start_sq | END_BITS[i] | CAPTURE_FLAG)
+
+    def _add_ray_codes(self, start, steps, allowed, codes):
+        """Append the encoded sliding moves from start along steps to codes."""
+
+        squares = self.squares
+        colour_bit = squares[start] & BLACK
+        start_sq = SQUARES[start]
+
+        for step in steps:
+            i = start + step
+            target = squares[i]
+
+            while target == EMPTY:
+                if allowed is None or i in allowed:
+                    codes.append(start_sq | END_BITS[i])
+
+                i += step
+                target = squares[i]
+
+            if (target != OFF_BOARD and (target & BLACK) != colour_bit
+                    and (allowed is None or i in allowed)):
+                codes.append(start_sq | END_BITS[i] | CAPTURE_FLAG)
+
+    def _add_pawn_codes(self, start, allowed, codes):
+        """Append the encoded moves of the pawn at start to codes."""
+
+        squares = self.squares
+        colour_bit = squares[start] & BLACK
+        start_sq = SQUARES[start]
+
+        if colour_bit:
+            step = WIDTH
+            can_double = (start_sq >> 3 == 1)
+        else:
+            step = -WIDTH
+            can_double = (start_sq >> 3 == 6)
+
+        one = start + step
+
+        if squares[one] == EMPTY:
+            if allowed is None or one in allowed:
+                Board.add_pawn_code(codes, start_sq | END_BITS[one])
+
+            # The double move may block a check that the single move does not
+            two = one + step
+            if (can_double and squares[two] == EMPTY
+                    and (allowed is None or two in allowed)):
+                codes.append(start_sq | END_BITS[two] | DOUBLE_PUSH_FLAG)
+
+        for i in (one - 1, one + 1):
+            target = squares[i]
+
+            if (target != EMPTY and target != OFF_BOARD
+                    and (target & BLACK) != colour_bit
+                    and (allowed is None or i in allowed)):
+                Board.add_pawn_code(codes,
+                                    start_sq | END_BITS[i] | CAPTURE_FLAG)
+
+    ###########################################################################
+    ############################ BOARD EVALUATION #############################
+    ###########################################################################
+
+    def is_in_check(self, piece_colour):
+        """Return true if the king of the passed colour is in check.
+
+        Note that if no king of the passed colour is found, this function will
+        return false.
+
+        Args:
+            piece_colour:  a member of the Piece.PieceColour enum
+
+        """
+
+        if piece_colour == Colour.black:
+            return self._is_attacked_code(BLACK)
+
+        return self._is_attacked_code(0)
+
+    def _is_attacked_code(self, colour_bit):
+        """Return true if the king with the passed colour bit is attacked."""
+
+        king = self.king_indices[colour_bit]
+
+        if king is None:
+            return False
+
+        return self._is_attacked(king, colour_bit ^ BLACK)
+
+    def is_square_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        See Board.is_square_attacked.
+
+        """
+
+        if self.attack_counts is not None:
+            return self.attack_counts[by_colour][y * 8 + x] > 0
+
+        if by_colour == Colour.black:
+            return self._is_attacked(index(x, y), BLACK)
+
+        return self._is_attacked(index(x, y), 0)
+
+    def scan_attacked(self, x, y, by_colour):
+        """Return true if a piece of colour by_colour attacks (x, y).
+
+        See Board.scan_attacked.
+
+        """
+
+        return self._is_attacked(index(x, y), to_colour_bit(by_colour))
+
+    def _is_attacked(self, king, enemy):
+        """Return true if mailbox index king is attacked by colour enemy.
+
+        enemy is the colour bit of the attacking side (0 or BLACK).
+
+        """
+
+        squares = self.squares
+
+        # Pawns attack from the rank in front of the king
+        if enemy:
+            pawn_row = king - WIDTH
+        else:
+            pawn_row = king + WIDTH
+
+        pawn = p_type.pawn | enemy
+        if squares[pawn_row - 1] == pawn or squares[pawn_row + 1] == pawn:
+            return True
+
+        knight = p_type.knight | enemy
+        for step in KNIGHT_STEPS:
+            if squares[king + step] == knight:
+                return True
+
+        enemy_king = p_type.king | enemy
+        for step in KING_STEPS:
+            if squares[king + step] == enemy_king:
+                return True
+
+        queen = p_type.queen | enemy
+        rook = p_type.rook | enemy
+        bishop = p_type.bishop | enemy
+
+        for steps, slider in ((VER_HOR_STEPS, rook), (DIAG_STEPS, bishop)):
+            for step in steps:
+                i = king + step
+                sq_code = squares[i]
+
+                while sq_code == EMPTY:
+                    i += step
+                    sq_code = squares[i]
+
+                if sq_code == slider or sq_code == queen:
+                    return True
+
+        return False
+
+    def is_castle_path_empty(self, y, king_side):
+        """Return true if no piece stands between king and rook on rank y.
+
+        See Board.is_castle_path_empty.
+
+        """
+
+        squares = self.squares
+        start = index(0, y)
+
+        for x in Board.CASTLE_EMPTY_FILES[king_side]:
+            if squares[start + x] != EMPTY:
+                return False
+
+        return True
+
+    def has_any_legal_move(self, piece_colour):
+        """Return true if the team of the passed colour can make a legal move.
+
+        See Board.has_any_legal_move.
+
+        """
+
+        colour_bit = to_colour_bit(piece_colour)
+        king, check_mask, pins = self._find_pin_info(colour_bit)
+        codes = array("H")
+
+        if check_mask is not None:
+            self._add_evasion_codes(king, check_mask, pins, codes)
+            return len(codes) > 0
+
+        # The king, whose moves are the slowest to test, is tried last
+        for i in self.piece_indices[colour_bit]:
+            if i != king:
+                self._add_piece_codes(i, codes, check_mask, pins)
+                if codes:
+                    return True
+
+        if king is not None:
+            self._add_king_codes(king, codes)
+
+        return len(codes) > 0
+
+    def count_legal_moves(self, piece_colour):
+        """Return the number of legal moves the passed colour can make.
+
+        See Board.count_legal_moves.
+
+        """
+
+        return len(self.get_move_codes(piece_colour))
+
+    def is_king_draw(self):
+        """Return true if the Kings are the only pieces left on the board."""
+
+        squares = self.squares
+
+        for indices in self.piece_indices.values():
+            for i in indices:
+                if squares[i] & ~BLACK != p_type.king:
+                    return False
+
+        return True
+
+    def can_promote_pawn(self, piece_colour):
+        """Return true if the player of passed colour can promote a pawn."""
+
+        if (piece_colour == Colour.white):
+            y = 0
+        else:
+            y = 7
+
+        start = index(0, y)
+        for sq_code in self.squares[start:start + Board.Board.SIZE]:
+            if sq_code & ~BLACK == p_type.pawn:
+                return True
+
+        return False
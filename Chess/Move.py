@@ -1,12 +1,31 @@
 """Contains the Move class"""
-# Tkinter graphics package
-from tkinter import *
+from Piece import PieceType as p_type
+
+
+# Moves can be encoded as 16 bit integers: bits 0-5 hold the start square,
+# bits 6-11 the end square (squares are numbered y * 8 + x) and bits 12-15
+# one of the flags below. Lists of encoded moves are kept in array('H').
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8
+
+# Promotion moves carry the index of the promotion piece in the low two bits
+# of the flags (and may also have the CAPTURE bit set).
+PROMOTION_TYPES = (p_type.knight, p_type.bishop, p_type.rook, p_type.queen)
+
+FLAG_SHIFT = 12
 
 
 class Move:
 
     """Contains all information required to make or display a move.
 
+    Moves are immutable, as those returned by decode are shared.
+
     Attributes:
         - castle:  true if the move is a castling move
         - en_passant:  true if the move is an enPassant move
@@ -15,13 +34,19 @@ class Move:
         - take_move: true if the move is a taking move
         - end_posn:  an integer tuple containing the x and y values of the
                     square the piece (king if castling move) is moving to
-        - en_passant_posn:  if en_passant, this is a tuple containing the x and
-                            y values of the pawn which will be taken by the move
+        - en_passant_posn:  if en_passant, this is a tuple containing the x
+                            and y values of the pawn which will be taken by
+                            the move
+        - promotion:  if the move promotes a pawn, the member of the PieceType
+                      enum it is promoted to, otherwise None
 
     """
 
+    __slots__ = ("start_posn", "end_posn", "castle", "take_move",
+                 "en_passant", "en_passant_posn", "promotion")
+
     def __init__(self, start_posn, end_posn, take_move=False, castle=False,
-                 en_passant=False, en_passant_posn=None):
+                 en_passant=False, en_passant_posn=None, promotion=None):
         """Initialise a move according to passed parameters.
 
         Raises:
@@ -36,32 +61,58 @@ class Move:
         #if (en_passant and en_passant_posn is None):
         #    raise ValueError("Must provide en_passant_posn")
 
-        self.start_posn = start_posn
-        self.end_posn = end_posn
-        self.castle = castle
-        self.take_move = take_move
-        self.en_passant = en_passant
-        self.en_passant_posn = en_passant_posn
+        object.__setattr__(self, "start_posn", start_posn)
+        object.__setattr__(self, "end_posn", end_posn)
+        object.__setattr__(self, "castle", castle)
+        object.__setattr__(self, "take_move", take_move)
+        object.__setattr__(self, "en_passant", en_passant)
+        object.__setattr__(self, "en_passant_posn", en_passant_posn)
+        object.__setattr__(self, "promotion", promotion)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Moves are immutable")
+
+    def __reduce__(self):
+        return (Move, (self.start_posn, self.end_posn, self.take_move,
+                       self.castle, self.en_passant, self.en_passant_posn,
+                       self.promotion))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, other):
-        return (self.start_posn == other.start_posn
-                and self.end_posn == other.colour
+        return (isinstance(other, Move)
+                and self.start_posn == other.start_posn
+                and self.end_posn == other.end_posn
                 and self.castle == other.castle
                 and self.en_passant == other.en_passant
-                and self.en_passant_posn == other.en_passant_posn)
+                and self.en_passant_posn == other.en_passant_posn
+                and self.promotion == other.promotion)
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def set_taking_move(self):
+    def __hash__(self):
+        return hash((self.start_posn, self.end_posn, self.castle,
+                     self.en_passant, self.promotion))
+
+    def draw(self, canvas, take_move=None):
+        """Draw the end square of the move, red if it takes a piece.
 
-        self.take_move = True
+        take_move overrides the move's own take_move attribute, as moves
+        are not always given it (see encode).
 
-    def draw(self, canvas):
+        """
 
         sq_width = int(canvas["width"])/8
 
-        if(self.take_move):
+        if take_move is None:
+            take_move = self.take_move
+
+        if(take_move):
             canvas.create_rectangle(self.end_posn[0]*sq_width,
                                     self.end_posn[1]*sq_width,
                                     (self.end_posn[0]+1)*sq_width,
@@ -73,3 +124,100 @@ class Move:
                                     (self.end_posn[0]+1)*sq_width,
                                     (self.end_posn[1]+1)*sq_width,
                                     stipple="gray75", fill="green")
+
+
+def make_code(start_posn, end_posn, flags=QUIET):
+    """Return the 16 bit code of a move between two (x, y) positions."""
+    return (flags << FLAG_SHIFT | (end_posn[1] * 8 + end_posn[0]) << 6
+            | start_posn[1] * 8 + start_posn[0])
+
+
+def encode(move):
+    """Return the 16 bit code of a Move object.
+
+    The capture flag is taken from move.take_move, and a double pawn push
+    cannot be recognised without the board, so use Board.encode_move when
+    the position is known.
+
+    """
+
+    if move.castle:
+        if move.end_posn[0] > move.start_posn[0]:
+            flags = KING_CASTLE
+        else:
+            flags = QUEEN_CASTLE
+    elif move.en_passant:
+        flags = EN_PASSANT
+    else:
+        flags = QUIET
+
+        if move.take_move:
+            flags |= CAPTURE
+        if move.promotion is not None:
+            flags |= PROMOTION | PROMOTION_TYPES.index(move.promotion)
+
+    return make_code(move.start_posn, move.end_posn, flags)
+
+
+# Interned Move objects, indexed by code and built the first time they are
+# asked for. These are shared, so they must not be changed.
+MOVE_TABLE = [None] * (1 << 16)
+
+
+def _build(code):
+    """Create the Move object for a code."""
+
+    start = code & 63
+    end = (code >> 6) & 63
+    flags = code >> FLAG_SHIFT
+    start_posn = (start % 8, start // 8)
+    end_posn = (end % 8, end // 8)
+
+    if flags == EN_PASSANT:
+        return Move(start_posn, end_posn, take_move=True, en_passant=True,
+                    en_passant_posn=(end_posn[0], start_posn[1]))
+
+    if flags in (KING_CASTLE, QUEEN_CASTLE):
+        return Move(start_posn, end_posn, castle=True)
+
+    if flags & PROMOTION:
+        promotion = PROMOTION_TYPES[flags & 3]
+    else:
+        promotion = None
+
+    return Move(start_posn, end_posn, take_move=bool(flags & CAPTURE),
+                promotion=promotion)
+
+
+def decode(code):
+    """Return the shared Move object for a 16 bit move code."""
+
+    move = MOVE_TABLE[code]
+
+    if move is None:
+        move = MOVE_TABLE[code] = _build(code)
+
+    return move
+
+
+def decode_all(codes):
+    """Return a list of the shared Move objects for an array of codes."""
+    return [decode(code) for code in codes]
+
+
+def get_move(start_posn, end_posn, flags=QUIET):
+    """Return the shared Move object between two positions with flags."""
+    return decode(make_code(start_posn, end_posn, flags))
+
+
+def with_promotion(move, piece_type):
+    """Return the shared Move which is a promotion move to piece_type instead.
+
+    Args:
+        - move:  a Move whose promotion is not None
+        - piece_type:  a member of PROMOTION_TYPES
+
+    """
+
+    code = encode(move) & ~(3 << FLAG_SHIFT)
+    return decode(code | PROMOTION_TYPES.index(piece_type) << FLAG_SHIFT)
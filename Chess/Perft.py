@@ -0,0 +1,250 @@
+"""Contains perft, which counts the positions reachable in a number of moves
+
+Perft counts are known for many positions, so comparing them with the
+counts given by the move generator is a quick way to find bugs in it. Run
+as a script to check every backend against the positions in POSITIONS:
+
+    python3 Perft.py [--depth N] [--fen FEN] [--divide] [--cache]
+                     [--backend NAME] [--processes N]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+import Gamestate
+import Move
+import Piece
+from Piece import PieceColour as colour
+
+
+# Standard test positions as (name, FEN, counts), where counts[i] is the
+# number of positions reachable in i + 1 moves. Counts are given to the
+# depth where a backend takes a few minutes or less.
+POSITIONS = [
+    ("start", Gamestate.START_FEN,
+     (20, 400, 8902, 197281, 4865609)),
+    ("kiwipete",
+     "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     (48, 2039, 97862, 4085603)),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     (14, 191, 2812, 43238, 674624)),
+    ("promotions",
+     "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     (6, 264, 9467, 422333)),
+    ("talkchess", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     (44, 1486, 62379, 2103487)),
+    ("middlegame",
+     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1"
+     " w - - 0 10",
+     (46, 2079, 89890, 3894594)),
+]
+
+
+def perft(game_state, depth, cache=None):
+    """Return the number of move sequences of a given length.
+
+    Moves are made with push and undone with pop, so game_state is left as
+    it was. At depth 1 the moves are counted without being made.
+
+    Args:
+        - game_state:  the Gamestate to count from
+        - depth:  the number of moves (half moves) in each sequence
+        - cache:  a dict in which to keep the count of each position and
+                  depth reached, keyed by its Zobrist hash, or None. The
+                  subtree of a position reached by different move orders
+                  is then only computed once, though its count is added
+                  for each. The same dict may be passed to later calls.
+
+    """
+
+    if depth == 0:
+        return 1
+
+    player = colour.white if game_state.is_white_turn else colour.black
+
+    if depth == 1:
+        return game_state.count_legal_moves(player)
+
+    if cache is not None:
+        key = (game_state.get_hash(), depth)
+        nodes = cache.get(key)
+        if nodes is not None:
+            return nodes
+
+    nodes = 0
+
+    for move in game_state.get_all_moves(player):
+        game_state.push(move)
+        nodes += perft(game_state, depth - 1, cache)
+        game_state.pop()
+
+    if cache is not None:
+        cache[key] = nodes
+
+    return nodes
+
+
+def divide(game_state, depth, cache=None, processes=1):
+    """Return a list of (move, count) pairs, one for each legal move.
+
+    Each count is the perft of the position after the move, to one less
+    than depth, so the counts add up to the perft of game_state. Comparing
+    them with those of another program shows which move is wrong.
+
+    Args:
+        - game_state:  the Gamestate to count from
+        - depth:  the number of moves in each sequence, at least 1
+        - cache:  as in perft; with more than one process, any dict
+                  gives each process a cache of its own instead
+        - processes:  the number of processes to share the moves between,
+                      or None for one per CPU
+
+    """
+
+    player = colour.white if game_state.is_white_turn else colour.black
+    moves = game_state.get_all_moves(player)
+
+    if processes == 1:
+        counts = []
+        for move in moves:
+            game_state.push(move)
+            counts.append(perft(game_state, depth - 1, cache))
+            game_state.pop()
+
+    else:
+        snapshot = game_state.snapshot()
+        backend = game_state.board.BACKEND
+        tasks = [(snapshot, backend, Move.encode(move), depth - 1,
+                  cache is not None) for move in moves]
+
+        with multiprocessing.Pool(processes) as pool:
+            counts = pool.map(_divide_task, tasks, chunksize=1)
+
+    return list(zip(moves, counts))
+
+
+# The cache of a process started by divide
+_task_cache = {}
+
+
+def _divide_task(task):
+    """Return the perft of a position after a move, in a worker process."""
+
+    snapshot, backend, code, depth, use_cache = task
+
+    game_state = Gamestate.Gamestate(backend)
+    game_state.restore(snapshot)
+    game_state.push(Move.decode(code))
+
+    return perft(game_state, depth, _task_cache if use_cache else None)
+
+
+def run(position, depth, cache=None, processes=1, backend="array"):
+    """Return the perft of a position and the seconds taken to find it.
+
+    Args:
+        - position:  a Gamestate or a FEN string
+        - depth, cache, processes:  as in divide
+        - backend:  the board backend to use for a FEN string
+
+    """
+
+    if isinstance(position, str):
+        position = Gamestate.from_fen(position, backend)
+
+    start = time.perf_counter()
+
+    if processes == 1 or depth == 0:
+        nodes = perft(position, depth, cache)
+    else:
+        nodes = sum(count for move, count
+                    in divide(position, depth, cache, processes))
+
+    return nodes, time.perf_counter() - start
+
+
+def move_name(move):
+    """Return a move in the coordinate notation used by divide, e.g. e7e8q."""
+
+    name = (Gamestate.square_name(move.start_posn)
+            + Gamestate.square_name(move.end_posn))
+
+    if move.promotion is not None:
+        name += Piece.make_piece(move.promotion, colour.black).get_san()
+
+    return name
+
+
+def nodes_per_second(nodes, seconds):
+    """Return a rate of nodes per second, as a string for printing."""
+
+    return format(int(nodes / max(seconds, 1e-9)), ",") + " nodes/s"
+
+
+def main(argv=None):
+    """Run perft from the command line, returning an exit status.
+
+    Without --fen, each of POSITIONS is checked to --depth (or as deep as
+    its counts go) and the status is 1 if any count is wrong.
+
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fen", help="count from this position only")
+    parser.add_argument("--divide", action="store_true",
+                        help="print the count after each move")
+    parser.add_argument("--cache", action="store_true",
+                        help="compute transposed subtrees only once")
+    parser.add_argument("--backend", action="append",
+                        choices=["array", "mailbox", "bitboard"],
+                        help="backend to test (may be repeated)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes, 0 for one per CPU")
+    args = parser.parse_args(argv)
+
+    backends = args.backend or ["array", "mailbox", "bitboard"]
+    processes = args.processes or None
+    failed = False
+
+    if args.fen is not None:
+        positions = [("fen", args.fen, ())]
+    else:
+        positions = POSITIONS
+
+    for backend in backends:
+        for name, fen, counts in positions:
+            depth = args.depth
+            if counts:
+                depth = min(depth, len(counts))
+
+            game_state = Gamestate.from_fen(fen, backend)
+            cache = {} if args.cache else None
+
+            if args.divide:
+                start = time.perf_counter()
+                nodes = 0
+                for move, count in divide(game_state, depth, cache,
+                                          processes):
+                    print(move_name(move) + ": " + str(count))
+                    nodes += count
+                seconds = time.perf_counter() - start
+            else:
+                nodes, seconds = run(game_state, depth, cache, processes)
+
+            line = (backend + " " + name + " depth " + str(depth) + ": "
+                    + str(nodes) + " in " + format(seconds, ".2f") + "s ("
+                    + nodes_per_second(nodes, seconds) + ")")
+
+            if counts and nodes != counts[depth - 1]:
+                line += " WRONG, expected " + str(counts[depth - 1])
+                failed = True
+
+            print(line)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 """Contains the Piece class"""
 
 from enum import Enum
-from tkinter import *
 
 
 class PieceType():
@@ -21,7 +20,25 @@ class PieceColour():
 
 
 def make_piece(piece_type, colour):
-    """Return a piece of the correct subclass given the passed attributes.
+    """Return the shared piece of the correct subclass for the attributes.
+
+    Pieces are immutable, so there is only ever one piece of each type and
+    colour (and one blank piece) and this function does not allocate.
+
+    Args:
+        - piece_type:  a member of the PieceType enum
+        - colour:  a member of the PieceColour enum
+
+    """
+
+    if piece_type == PieceType.blank:
+        return BLANK
+
+    return PIECES[(piece_type, colour)]
+
+
+def new_piece(piece_type, colour):
+    """Create a piece of the correct subclass given the passed attributes.
 
     Args:
         - piece_type:  a member of the PieceType enum
@@ -49,15 +66,40 @@ class Piece:
 
     """Represents a square on the board and the piece that stands on it.
 
+    Pieces are immutable so that a single instance of each can be shared by
+    every square and board (see make_piece).
+
     Attributes:
         - colour:    a member of the PieceColour enum
         - piece_type:      a member of the PieceType enum
     """
 
+    __slots__ = ("type", "colour")
+
     def __init__(self):
         """Create a blank piece."""
-        self.type = PieceType.blank
-        self.colour = PieceColour.blank
+        self._set(PieceType.blank, PieceColour.blank)
+
+    def _set(self, piece_type, colour):
+        """Set the attributes of a newly created piece."""
+        object.__setattr__(self, "type", piece_type)
+        object.__setattr__(self, "colour", colour)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pieces are immutable")
+
+    def __reduce__(self):
+        # Unpickle (and copy) to the shared instance
+        return (make_piece, (self.type, self.colour))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __hash__(self):
+        return hash((self.type, self.colour))
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -71,7 +113,8 @@ class Piece:
         pass
 
     def __eq__(self, other):
-        return (self.type == other.type
+        return (isinstance(other, Piece)
+                and self.type == other.type
                 and self.colour == other.colour)
 
     def __ne__(self, other):
@@ -83,6 +126,8 @@ class Piece:
 
 class King(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a king piece with the passed colour.
 
@@ -90,8 +135,7 @@ class King(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.king
+        self._set(PieceType.king, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -119,6 +163,8 @@ class King(Piece):
 
 class Queen(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a queen piece with the passed colour.
 
@@ -126,8 +172,7 @@ class Queen(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.queen
+        self._set(PieceType.queen, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -154,6 +199,8 @@ class Queen(Piece):
 
 class Bishop(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a bishop piece with the passed colour.
 
@@ -161,8 +208,7 @@ class Bishop(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.bishop
+        self._set(PieceType.bishop, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -190,6 +236,8 @@ class Bishop(Piece):
 
 class Knight(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a knight piece with the passed colour.
 
@@ -197,8 +245,7 @@ class Knight(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.knight
+        self._set(PieceType.knight, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -226,6 +273,8 @@ class Knight(Piece):
 
 class Rook(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a rook piece with the passed colour.
 
@@ -233,8 +282,7 @@ class Rook(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.rook
+        self._set(PieceType.rook, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -262,6 +310,8 @@ class Rook(Piece):
 
 class Pawn(Piece):
 
+    __slots__ = ()
+
     def __init__(self, colour):
         """Create a pawn piece with the passed colour.
 
@@ -269,8 +319,7 @@ class Pawn(Piece):
             - colour:  a member of the PieceColour enum
         """
 
-        self.colour = colour
-        self.type = PieceType.pawn
+        self._set(PieceType.pawn, colour)
 
     def draw(self, canvas, x, y):
         """Draw the piece
@@ -294,3 +343,12 @@ class Pawn(Piece):
             return "P"
         else:
             return "p"
+
+
+# The shared instances returned by make_piece
+BLANK = Piece()
+PIECES = {(piece_type, colour): new_piece(piece_type, colour)
+          for piece_type in (PieceType.king, PieceType.queen,
+                             PieceType.bishop, PieceType.knight,
+                             PieceType.rook, PieceType.pawn)
+          for colour in (PieceColour.white, PieceColour.black)}
@@ -56,7 +56,8 @@ class Player:
 
         Given a game state for which a player may promote a pawn of their
         colour, this function should return a Piece of the type to which the
-        pawn is to be promoted.
+        pawn is to be promoted. For a promotion move (see Move.promotion) it
+        is called with the game state from before the move.
 
         """
         raise NotImplementedError
@@ -0,0 +1,219 @@
+"""Contains the Position class"""
+
+import Board
+import Gamestate
+import Zobrist
+from Piece import PieceType as p_type
+
+
+# KEYS[sq_code][sq] is the Zobrist key of the piece with that code (see
+# Board.piece_code) on square sq (0 for an empty square)
+KEYS = [[0] * 64 for _code in range(2 * Board.BLACK_CODE)]
+for (_type, _colour), _keys in Zobrist.PIECE_KEYS.items():
+    KEYS[Board.piece_code(_type, _colour)] = _keys
+
+
+class Position:
+
+    """An immutable, hashable record of the state of a game.
+
+    Unlike a Gamestate, a Position holds no board object and no selection
+    state, so it can be shared between threads, used as a dictionary key
+    or cheaply pickled and sent to another process. play returns a new
+    Position, which shares every unchanged rank with its parent.
+
+    Attributes:
+        - ranks:  a tuple of 8 bytes objects, one per rank (indexed by y),
+                  holding the code (see Board.piece_code) of each square
+        - is_white_turn, w_castle_K, w_castle_Q, b_castle_K, b_castle_Q,
+          en_passant_sq, count, fifty_move_count:  as in Gamestate
+        - key:  the Zobrist hash of the position (see Gamestate.get_hash)
+
+    """
+
+    __slots__ = ("ranks", "is_white_turn", "w_castle_K", "w_castle_Q",
+                 "b_castle_K", "b_castle_Q", "en_passant_sq", "count",
+                 "fifty_move_count", "key")
+
+    def __init__(self, ranks, is_white_turn=True, w_castle_K=True,
+                 w_castle_Q=True, b_castle_K=True, b_castle_Q=True,
+                 en_passant_sq=None, count=0, fifty_move_count=0, key=None):
+        """Initialise a position; the key is computed if not given."""
+
+        if key is None:
+            key = Zobrist.state_key(is_white_turn, w_castle_K, w_castle_Q,
+                                    b_castle_K, b_castle_Q, en_passant_sq)
+            for y, rank in enumerate(ranks):
+                for x, sq_code in enumerate(rank):
+                    key ^= KEYS[sq_code][y * 8 + x]
+
+        set_attr = object.__setattr__
+        set_attr(self, "ranks", tuple(ranks))
+        set_attr(self, "is_white_turn", is_white_turn)
+        set_attr(self, "w_castle_K", w_castle_K)
+        set_attr(self, "w_castle_Q", w_castle_Q)
+        set_attr(self, "b_castle_K", b_castle_K)
+        set_attr(self, "b_castle_Q", b_castle_Q)
+        set_attr(self, "en_passant_sq", en_passant_sq)
+        set_attr(self, "count", count)
+        set_attr(self, "fifty_move_count", fifty_move_count)
+        set_attr(self, "key", key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position objects are immutable")
+
+    def __reduce__(self):
+        return (Position, (self.ranks, self.is_white_turn,
+                           self.w_castle_K, self.w_castle_Q,
+                           self.b_castle_K, self.b_castle_Q,
+                           self.en_passant_sq, self.count,
+                           self.fifty_move_count, self.key))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return (isinstance(other, Position)
+                and self.key == other.key
+                and self.ranks == other.ranks
+                and self.is_white_turn == other.is_white_turn
+                and self.w_castle_K == other.w_castle_K
+                and self.w_castle_Q == other.w_castle_Q
+                and self.b_castle_K == other.b_castle_K
+                and self.b_castle_Q == other.b_castle_Q
+                and self.en_passant_sq == other.en_passant_sq
+                and self.count == other.count
+                and self.fifty_move_count == other.fifty_move_count)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def get_piece(self, x, y):
+        """Return the piece at position x, y."""
+        return Board.CODE_PIECES[self.ranks[y][x]]
+
+    def snapshot(self):
+        """Return the position as a Gamestate snapshot."""
+        return (b"".join(self.ranks), self.is_white_turn,
+                self.w_castle_K, self.w_castle_Q,
+                self.b_castle_K, self.b_castle_Q,
+                self.en_passant_sq, self.count, self.fifty_move_count)
+
+    def to_gamestate(self, backend="array"):
+        """Return a new Gamestate set to this position.
+
+        Args:
+            - backend:  the board backend to use (see Board.make_board)
+
+        """
+
+        game_state = Gamestate.Gamestate(backend)
+        game_state.restore(self.snapshot())
+
+        return game_state
+
+    def play(self, move):
+        """Return the position after move, following the rules of Gamestate.
+
+        As with Gamestate.push, the counters, castling rights and en passant
+        square are updated and the turn passes to the other player. The move
+        is assumed to be legal. A pawn is only promoted if move.promotion is
+        set.
+
+        """
+
+        ranks = list(self.ranks)
+        x0, y0 = move.start_posn
+        x1, y1 = move.end_posn
+        moving = ranks[y0][x0]
+        piece_type = moving & ~Board.BLACK_CODE
+        key = self.key
+
+        def put(x, y, sq_code):
+            rank = ranks[y]
+            ranks[y] = rank[:x] + bytes((sq_code,)) + rank[x + 1:]
+            return KEYS[rank[x]][y * 8 + x] ^ KEYS[sq_code][y * 8 + x]
+
+        w_castle_K = self.w_castle_K
+        w_castle_Q = self.w_castle_Q
+        b_castle_K = self.b_castle_K
+        b_castle_Q = self.b_castle_Q
+        en_passant_sq = None
+
+        if piece_type == p_type.king:
+            if moving & Board.BLACK_CODE:
+                b_castle_K = b_castle_Q = False
+            else:
+                w_castle_K = w_castle_Q = False
+
+        # As in Gamestate, a piece leaving a corner removes that right
+        if piece_type == p_type.rook:
+            if move.start_posn == (0, 0):
+                b_castle_Q = False
+            elif move.start_posn == (7, 0):
+                b_castle_K = False
+            elif move.start_posn == (0, 7):
+                w_castle_Q = False
+            elif move.start_posn == (7, 7):
+                w_castle_K = False
+
+        if piece_type == p_type.pawn and abs(y1 - y0) == 2:
+            en_passant_sq = (x0, (y0 + y1) // 2)
+
+        if ranks[y1][x1]:
+            fifty_move_count = 0
+        else:
+            fifty_move_count = self.fifty_move_count + 1
+
+        if move.castle:
+            if x1 > x0:
+                rook_from_x, rook_to_x = 7, 5
+            else:
+                rook_from_x, rook_to_x = 0, 3
+
+            rook = ranks[y0][rook_from_x]
+            key ^= put(rook_from_x, y0, 0)
+            key ^= put(rook_to_x, y0, rook)
+
+        if move.en_passant:
+            key ^= put(move.en_passant_posn[0], move.en_passant_posn[1], 0)
+
+        if move.promotion is not None:
+            moving = (moving & Board.BLACK_CODE) + move.promotion
+
+        key ^= put(x0, y0, 0)
+        key ^= put(x1, y1, moving)
+
+        key ^= Zobrist.state_key(self.is_white_turn,
+                                 self.w_castle_K, self.w_castle_Q,
+                                 self.b_castle_K, self.b_castle_Q,
+                                 self.en_passant_sq)
+        key ^= Zobrist.state_key(not self.is_white_turn,
+                                 w_castle_K, w_castle_Q,
+                                 b_castle_K, b_castle_Q, en_passant_sq)
+
+        return Position(ranks, not self.is_white_turn,
+                        w_castle_K, w_castle_Q, b_castle_K, b_castle_Q,
+                        en_passant_sq, self.count + 1, fifty_move_count, key)
+
+
+def from_gamestate(game_state):
+    """Return the Position of a Gamestate."""
+
+    board = game_state.board.snapshot()
+
+    return Position(tuple(board[y * 8:y * 8 + 8] for y in range(8)),
+                    game_state.is_white_turn,
+                    game_state.w_castle_K, game_state.w_castle_Q,
+                    game_state.b_castle_K, game_state.b_castle_Q,
+                    game_state.en_passant_sq, game_state.count,
+                    game_state.fifty_move_count, game_state.get_hash())
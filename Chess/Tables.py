@@ -0,0 +1,97 @@
+"""Contains move and attack tables precomputed for every square"""
+
+from Piece import PieceColour as Colour
+
+
+# Squares are numbered 0 to 63 as y * 8 + x, so square 0 is (0, 0) (a8) and
+# square 63 is (7, 7) (h1). Every table is indexed by square number and holds
+# (x, y) tuples in the order a piece would reach them, together with a
+# bitboard mask (bit n set for square n) of the same squares.
+
+SIZE = 8
+
+# Directions are (up_down, left_right) pairs, in the same sense as the
+# arguments to Board.search_direction.
+VER_HOR_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAG_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+DIRECTIONS = VER_HOR_DIRECTIONS + DIAG_DIRECTIONS
+
+KNIGHT_STEPS = ((2, 1), (2, -1), (1, 2), (1, -2),
+                (-1, 2), (-1, -2), (-2, 1), (-2, -1))
+
+
+def square(x, y):
+    """Return the square number of (x, y)."""
+    return y * SIZE + x
+
+
+def to_mask(coords):
+    """Return the bitboard mask of an iterable of (x, y) tuples."""
+    mask = 0
+    for x, y in coords:
+        mask |= 1 << square(x, y)
+    return mask
+
+
+def _steps(x, y, steps):
+    """Return the on board squares one step from (x, y)."""
+    return tuple((x + lr, y + ud) for ud, lr in steps
+                 if 0 <= x + lr < SIZE and 0 <= y + ud < SIZE)
+
+
+def _ray(x, y, up_down, left_right):
+    """Return the squares from (x, y) to the edge of the board."""
+    ray = []
+    x += left_right
+    y += up_down
+    while 0 <= x < SIZE and 0 <= y < SIZE:
+        ray.append((x, y))
+        x += left_right
+        y += up_down
+    return tuple(ray)
+
+
+COORDS = [(sq % SIZE, sq // SIZE) for sq in range(SIZE * SIZE)]
+
+KNIGHT_SQUARES = [_steps(x, y, KNIGHT_STEPS) for x, y in COORDS]
+KING_SQUARES = [_steps(x, y, DIRECTIONS) for x, y in COORDS]
+
+# PAWN_ATTACK_SQUARES[colour][sq] holds the squares a pawn of that colour on
+# sq attacks. Equivalently, these are the squares from which an enemy pawn
+# would attack a piece of that colour on sq.
+PAWN_ATTACK_SQUARES = {
+    Colour.white: [_steps(x, y, ((-1, 1), (-1, -1))) for x, y in COORDS],
+    Colour.black: [_steps(x, y, ((1, 1), (1, -1))) for x, y in COORDS]}
+
+# RAYS[direction][sq] holds the squares from sq to the edge of the board,
+# nearest first.
+RAYS = {direction: [_ray(x, y, *direction) for x, y in COORDS]
+        for direction in DIRECTIONS}
+
+# LINE_DIRECTIONS[sq][other] is the direction of the ray from sq which
+# passes through other, or None if the two squares are not on a line
+LINE_DIRECTIONS = [[None] * (SIZE * SIZE) for sq in range(SIZE * SIZE)]
+for _direction, _table in RAYS.items():
+    for _sq, _squares in enumerate(_table):
+        for _x, _y in _squares:
+            LINE_DIRECTIONS[_sq][square(_x, _y)] = _direction
+del _direction, _table, _sq, _squares, _x, _y
+
+KNIGHT_MASKS = [to_mask(squares) for squares in KNIGHT_SQUARES]
+KING_MASKS = [to_mask(squares) for squares in KING_SQUARES]
+PAWN_ATTACK_MASKS = {colour: [to_mask(squares) for squares in table]
+                     for colour, table in PAWN_ATTACK_SQUARES.items()}
+RAY_MASKS = {direction: [to_mask(squares) for squares in table]
+             for direction, table in RAYS.items()}
+RANK_MASKS = [0xFF << (SIZE * y) for y in range(SIZE)]
+
+
+def is_positive(direction):
+    """Return true if a ray in direction runs towards higher square numbers.
+
+    The nearest piece on such a ray is its lowest set bit; on any other ray
+    it is the highest set bit.
+
+    """
+
+    return direction[0] * SIZE + direction[1] > 0
@@ -0,0 +1,85 @@
+"""Contains the random keys used to hash positions"""
+
+import random
+from Piece import PieceType as p_type
+from Piece import PieceColour as Colour
+
+
+# A position is hashed by XORing together one 64 bit key for each piece on
+# each square, one for the side to move, one for each castling right and one
+# for the file of the en passant square. Each key can be XORed in or out as
+# the position changes, so the hash is updated in O(1) per move.
+
+# The keys are generated from a fixed seed, so that hashes are the same from
+# one run to the next
+SEED = 0x4A4A4368657373
+
+_random = random.Random(SEED)
+
+
+def _key():
+    """Return a new random 64 bit key."""
+    return _random.getrandbits(64)
+
+
+# PIECE_KEYS[(piece_type, colour)][sq] is the key of that piece on square sq,
+# with squares numbered as in the Tables module
+PIECE_KEYS = {(piece_type, colour): [_key() for sq in range(64)]
+              for piece_type in (p_type.king, p_type.queen, p_type.bishop,
+                                 p_type.knight, p_type.rook, p_type.pawn)
+              for colour in (Colour.white, Colour.black)}
+
+# XORed in when it is black's turn
+BLACK_TO_MOVE = _key()
+
+W_CASTLE_K = _key()
+W_CASTLE_Q = _key()
+B_CASTLE_K = _key()
+B_CASTLE_Q = _key()
+
+# EN_PASSANT_KEYS[x] is XORed in when the en passant square is on file x
+EN_PASSANT_KEYS = [_key() for x in range(8)]
+
+
+def piece_key(piece_type, colour, x, y):
+    """Return the key of a piece on (x, y), or 0 for a blank piece."""
+
+    if piece_type == p_type.blank:
+        return 0
+
+    return PIECE_KEYS[(piece_type, colour)][y * 8 + x]
+
+
+def board_key(board):
+    """Return the hash of the pieces on a board, computed from scratch."""
+
+    key = 0
+
+    for colour in (Colour.white, Colour.black):
+        for x, y in board.get_piece_posns(colour):
+            piece = board.get_piece(x, y)
+            key ^= PIECE_KEYS[(piece.type, colour)][y * 8 + x]
+
+    return key
+
+
+def state_key(is_white_turn, w_castle_K, w_castle_Q, b_castle_K, b_castle_Q,
+              en_passant_sq):
+    """Return the hash of everything in a position other than the pieces."""
+
+    key = 0
+
+    if not is_white_turn:
+        key ^= BLACK_TO_MOVE
+    if w_castle_K:
+        key ^= W_CASTLE_K
+    if w_castle_Q:
+        key ^= W_CASTLE_Q
+    if b_castle_K:
+        key ^= B_CASTLE_K
+    if b_castle_Q:
+        key ^= B_CASTLE_Q
+    if en_passant_sq is not None:
+        key ^= EN_PASSANT_KEYS[en_passant_sq[0]]
+
+    return key
@@ -0,0 +1,85 @@
+"""Runs a fixed depth search on a set of positions and reports its speed
+
+The total number of positions visited is a signature of the search. It
+depends on the order moves are searched in, so it is only fixed for a
+given backend, depth and revision of the code; a change in it means the
+search, or the moves it was given, changed.
+
+Any AI module in ../Scripts with a search function can be used.
+search(game_state, colour, depth) must return a pair of the move chosen
+and the number of positions visited, as JOE_AI.search does.
+
+    python3 bench.py [AI] [--depth N] [--backend NAME]
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from Benchmarks import Corpus
+from Piece import PieceColour as colour
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def bench(ai, depth, backend="array", report=None):
+    """Search every position of Corpus.CORPUS, returning nodes and seconds.
+
+    Args:
+        - ai:  an AI module with a search function
+        - depth:  the depth to search each position to
+        - backend:  the board backend to use (see Board.make_board)
+        - report:  a function called with the name of each position, the
+                   move chosen and the nodes visited, or None
+
+    """
+
+    total_nodes = 0
+    total_time = 0.0
+
+    for name, game_state in Corpus.load(backend):
+        player = colour.white if game_state.is_white_turn else colour.black
+
+        start = time.perf_counter()
+        move, nodes = ai.search(game_state, player, depth)
+        total_time += time.perf_counter() - start
+        total_nodes += nodes
+
+        if report is not None:
+            report(name, move, nodes)
+
+    return total_nodes, total_time
+
+
+def main(argv=None):
+    """Run the bench from the command line, returning an exit status."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ai", nargs="?", default="JOE_AI",
+                        help="AI module in ../Scripts (default JOE_AI)")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--backend", default="array",
+                        choices=["array", "mailbox", "bitboard"])
+    args = parser.parse_args(argv)
+
+    ai = importlib.import_module("Scripts." + args.ai)
+
+    if not hasattr(ai, "search"):
+        parser.error("Scripts/" + args.ai + ".py has no search function")
+
+    def report(name, move, nodes):
+        print("{:<16}{:>12,} nodes".format(name, nodes))
+
+    nodes, seconds = bench(ai, args.depth, args.backend, report)
+
+    print("=" * 34)
+    print("Total time (ms) : " + str(int(seconds * 1000)))
+    print("Nodes searched  : " + str(nodes))
+    print("Nodes/second    : " + str(int(nodes / max(seconds, 1e-9))))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,306 @@
-import Piece
-import Gamestate
+"""Profiles headless games between AIs and reports where the time goes
+
+Games are played through GameLoop, which needs no Tk, under cProfile or
+a sampling profiler. The call stacks found are written in the collapsed
+format read by flamegraph.pl and speedscope, and the time is summed by
+subsystem (see SUBSYSTEMS).
+
+    python3 profiling.py [--white AI] [--black AI] [--games N] [--seed S]
+                         [--fen FEN] [--mode cprofile|sample]
+                         [--collapsed FILE] [--pstats FILE]
+"""
+
+import argparse
 import cProfile
-import Board
-import Move
-import Game
+import os
 import pstats
+import random
+import re
+import signal
 import sys
-import os
+import time
+import GameLoop
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# The subsystems time is summed by, and a pattern matching the functions of
+# the engine in each. Stack frames are named module.function, and the
+# innermost frame of a stack which matches a pattern gives its subsystem,
+# so that, for instance, the moves an AI generates count as movegen.
+SUBSYSTEMS = [
+    ("logging", r"GameLoop\.log_move$"),
+    ("SAN", r"\.(get_san|get_clar_str)$"),
+    ("status", r"\.(get_status|is_king_draw|has_any_legal_move|"
+               r"legal_move_exists|can_promote_pawn)$"),
+    ("legality", r"\.(is_valid\w*|is_possible\w*|is_in_check|gives_check|"
+                 r"\w*attacked\w*|\w*pin_info|get_allowed_squares|"
+                 r"evasion_mask|pin_masks|is_castle_path_empty)$"),
+    ("make/unmake", r"\.(make_move|takeback_move|push|pop|update_counts|"
+                    r"swap_turn|place_piece|remove_piece|promote_pawn|"
+                    r"_set_code|_dirty_moves_near)$"),
+    ("movegen", r"\.(\w*moves|iter_\w*|\w*_codes|count_legal_moves|"
+                r"search_direction|decode\w*|get_move)$"),
+    ("AI", r"^(AI_1|AI_2|JOE_AI|JOZHOGG|Player)\."),
+]
+
+_PATTERNS = [(name, re.compile(pattern)) for name, pattern in SUBSYSTEMS]
+
+
+def subsystem(stack):
+    """Return the subsystem of a stack of frame names, outermost first."""
+
+    for frame in reversed(stack):
+        for name, pattern in _PATTERNS:
+            if pattern.search(frame):
+                return name
+
+    return "other"
+
+
+def summarise(stacks):
+    """Return a list of (subsystem, weight), heaviest first.
+
+    Args:
+        - stacks:  a dict of weights (seconds or samples) by stack
+
+    """
+
+    totals = {}
+
+    for stack, weight in stacks.items():
+        name = subsystem(stack)
+        totals[name] = totals.get(name, 0) + weight
+
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def play_games(white, black, games, seed=0, fens=(None,)):
+    """Play games between two AIs, without a window or a PGN file.
+
+    Game i starts from fens[i % len(fens)] with the random module seeded
+    with seed + i, so that a run can be repeated.
+
+    Returns a list of the final Status of each game.
+
+    """
+
+    results = []
+
+    for i in range(games):
+        random.seed(seed + i)
+        game = GameLoop.GameLoop(white, black, fen=fens[i % len(fens)],
+                                 pgn_path=os.devnull)
+        results.append(game.play())
+
+    return results
+
+
+def frame_name(filename, function):
+    """Return the name of a stack frame, as module.function."""
+
+    if filename.startswith("<"):
+        module = filename.strip("<>")
+    else:
+        module = os.path.splitext(os.path.basename(filename))[0]
+
+    return (module + "." + function).replace(";", ",")
+
+
+def profile_cprofile(run):
+    """Call run under cProfile, returning its pstats.Stats and stacks.
+
+    cProfile only records which function called which, so each function's
+    own time is shared between its callers in proportion to the time
+    spent in it from each. The stacks are therefore approximate; use the
+    sampling mode for exact ones.
+
+    """
+
+    profiler = cProfile.Profile()
+    profiler.runcall(run)
+    stats = pstats.Stats(profiler)
+
+    return stats, _call_graph_stacks(stats.stats)
+
+
+def _call_graph_stacks(stats):
+    """Return a dict of seconds by stack, built from pstats call data."""
+
+    names = {}
+    for func in stats:
+        filename, line, function = func
+        if filename == "~":
+            names[func] = frame_name("builtins", function.strip("<>"))
+        else:
+            names[func] = frame_name(filename, function)
+
+    # paths[func] is a list of (stack, share) giving the stacks which reach
+    # func and the share of its time spent in each
+    paths = {}
+
+    def find_paths(func, active):
+
+        if func in paths:
+            return paths[func]
+
+        callers = [(caller, edge[3]) for caller, edge
+                   in stats[func][4].items()
+                   if caller in stats and caller not in active
+                   and caller != func]
+        total = sum(weight for caller, weight in callers)
+
+        found = []
+        if total > 0:
+            active.add(func)
+            for caller, weight in callers:
+                for stack, share in find_paths(caller, active):
+                    share *= weight / total
+                    # Very rare paths are dropped, to bound the output
+                    if share >= 1e-4:
+                        found.append((stack + (names[func],), share))
+            active.discard(func)
+
+        if not found:
+            found = [((names[func],), 1.0)]
+
+        paths[func] = found
+        return found
+
+    stacks = {}
+
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        if tt <= 0:
+            continue
+        for stack, share in find_paths(func, set()):
+            stacks[stack] = stacks.get(stack, 0) + tt * share
+
+    return stacks
+
+
+def profile_sampling(run, interval=0.001):
+    """Call run, sampling its stack every interval seconds of CPU time.
+
+    Returns a dict of sample counts by stack, which start with the frame
+    of run. A profiling timer signal is used, so this needs a Unix system.
+
+    """
+
+    stacks = {}
+    root = sys._getframe()
+
+    def sample(signum, frame):
+
+        stack = []
+        while frame is not None and frame is not root:
+            code = frame.f_code
+            stack.append(frame_name(code.co_filename, code.co_name))
+            frame = frame.f_back
+
+        stack = tuple(reversed(stack))
+        stacks[stack] = stacks.get(stack, 0) + 1
+
+    previous = signal.signal(signal.SIGPROF, sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+    try:
+        run()
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+
+    return stacks
+
+
+def write_collapsed(stacks, path, scale=1):
+    """Write stacks in the collapsed format, one "a;b;c weight" per line.
+
+    Args:
+        - stacks:  a dict of weights by stack
+        - path:  the file to write to
+        - scale:  what to multiply each weight by, as the format needs
+                  whole numbers
+
+    """
+
+    with open(path, "w") as f:
+        for stack, weight in sorted(stacks.items()):
+            count = int(round(weight * scale))
+            if stack and count > 0:
+                f.write(";".join(stack) + " " + str(count) + "\n")
+
+
+def main(argv=None):
+    """Profile games from the command line, returning an exit status."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--white", default="AI_1",
+                        help="AI module in ../Scripts for white")
+    parser.add_argument("--black", default="AI_1",
+                        help="AI module in ../Scripts for black")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="game i seeds random with this plus i")
+    parser.add_argument("--fen", action="append",
+                        help="position to start from (may be repeated)")
+    parser.add_argument("--mode", choices=["cprofile", "sample"],
+                        default="cprofile")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="milliseconds between samples")
+    parser.add_argument("--collapsed", default="profile.folded",
+                        help="file to write collapsed stacks to")
+    parser.add_argument("--pstats",
+                        help="file to dump cProfile data to")
+    parser.add_argument("--top", type=int, default=20,
+                        help="functions to list by own time (cprofile)")
+    args = parser.parse_args(argv)
+
+    fens = args.fen or [None]
+    results = []
 
-sys.path.insert(0, os.path.abspath(".."))
+    def run():
+        results.extend(play_games(args.white, args.black, args.games,
+                                  args.seed, fens))
 
-colour = Piece.PieceColour.white
+    start = time.perf_counter()
 
-def check_loop():
+    if args.mode == "cprofile":
+        stats, stacks = profile_cprofile(run)
+        unit = "s"
+        scale = 1e6
 
-    for i in range(10):
-        #b.is_in_check(colour)
-        g = Game.Game("AI_1", "AI_1")
-        g.play()
+        if args.pstats is not None:
+            stats.dump_stats(args.pstats)
 
-b = Board.Board()
-b.test_setup()
+        stats.stream = sys.stdout
+        stats.strip_dirs().sort_stats("tottime").print_stats(args.top)
+    else:
+        stacks = profile_sampling(run, args.interval / 1000)
+        unit = " samples"
+        scale = 1
 
-cProfile.run("check_loop()", "profile_stats")
-#cProfile.run("check_loop()", "profile_stats")
+    elapsed = time.perf_counter() - start
+    write_collapsed(stacks, args.collapsed, scale)
 
-stream = open("stats.txt", "w")
+    print(str(len(results)) + " games in " + format(elapsed, ".1f")
+          + "s: " + ", ".join(sorted(set(status.name
+                                         for status in results))))
+    print("Collapsed stacks written to " + args.collapsed
+          + (" (microseconds)" if args.mode == "cprofile" else ""))
+    print()
 
-p = pstats.Stats('profile_stats', stream=stream)
-p.strip_dirs().sort_stats('time').print_stats()
+    summary = summarise(stacks)
+    total = sum(weight for name, weight in summary) or 1
 
+    for name, weight in summary:
+        if args.mode == "cprofile":
+            amount = format(weight, ".3f") + unit
+        else:
+            amount = str(weight) + unit
+        print("{:<14}{:>16}{:>8.1%}".format(name, amount, weight / total))
 
+    return 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,13 +17,11 @@ def get_move(game_state, colour):
 
     """
 
-    moves = game_state.get_all_moves(colour)
+    # Take the first capture found, without generating any other moves
+    for m in game_state.iter_captures(colour):
+        return m
 
-    for m in moves:
-        if game_state.board.is_take_move(m):
-            return m
-    else:
-        return random.choice(moves)
+    return random.choice(game_state.get_all_moves(colour))
 
 
 def get_promotion(game_state, colour):
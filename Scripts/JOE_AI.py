@@ -22,14 +22,12 @@ def get_move(game_state, colour):
 
     cur_best_move = None
 
-    if(colour.value == p_colour.white.value):
+    if(colour == p_colour.white):
         cur_eval = -1000
 
         for m in moves:
 
-            taken_piece = game_state.board.get_piece(*m.end_posn)
-
-            game_state.board.make_move(m)
+            game_state.push(m)
             tmp_eval = board_eval(game_state.board, colour)
 
             if(random.random() > 0.5):
@@ -40,16 +38,14 @@ def get_move(game_state, colour):
                 cur_best_move = m
                 cur_eval = tmp_eval
 
-            game_state.board.takeback_move(m, taken_piece)
+            game_state.pop()
 
     else:
         cur_eval = 1000
 
         for m in moves:
 
-            taken_piece = game_state.board.get_piece(*m.end_posn)
-
-            game_state.board.make_move(m)
+            game_state.push(m)
             tmp_eval = board_eval(game_state.board, colour)
 
             if(random.random() > 0.5):
@@ -60,49 +56,28 @@ def get_move(game_state, colour):
                 cur_best_move = m
                 cur_eval = tmp_eval
 
-            game_state.board.takeback_move(m, taken_piece)
+            game_state.pop()
 
     return cur_best_move
 
+# Material value of each piece type (kings are not counted)
+PIECE_VALUES = {PieceType.queen: 9, PieceType.bishop: 3, PieceType.knight: 3,
+                PieceType.rook: 5, PieceType.pawn: 1}
+
+
 def board_eval(board, colour):
 
     eval = 0
 
-    for i in range(8):
-        for j in range(8):
-
-            piece = board.get_piece(i,j)
-
-            piece_type = piece.type
-            piece_col = piece.colour
-
-            if (piece_type.value == PieceType.queen.value):
-                if(piece_col.value == p_colour.white.value):
-                    eval += 9
-                else:
-                    eval -= 9
-            elif (piece_type.value == PieceType.bishop.value):
-                if(piece_col.value == p_colour.white.value):
-                    eval += 3
-                else:
-                    eval -= 3
-            elif (piece_type.value == PieceType.knight.value):
-                if(piece_col.value == p_colour.white.value):
-                    eval += 3
-                else:
-                    eval -= 3
-            elif (piece_type.value == PieceType.rook.value):
-                if(piece_col.value == p_colour.white.value):
-                    eval += 5
-                else:
-                    eval -= 5
-            elif (piece_type.value == PieceType.pawn.value):
-                if(piece_col.value == p_colour.white.value):
-                    eval += 1
-                else:
-                    eval -= 1
-
-    if colour.value == p_colour.white.value:
+    # Only visit the squares that hold pieces. White pieces count positively
+    # and black pieces negatively, which is the sign of PieceColour.
+    for piece_col in (p_colour.white, p_colour.black):
+        for i, j in board.get_piece_posns(piece_col):
+
+            piece_type = board.get_piece(i, j).type
+            eval += PIECE_VALUES.get(piece_type, 0) * piece_col
+
+    if colour == p_colour.white:
         if(board.is_in_check(p_colour.black)):
 
             eval += 2
@@ -114,6 +89,95 @@ def board_eval(board, colour):
     return eval
 
 
+# The score of a checkmate, greater than any board_eval
+MATE_SCORE = 1000
+
+
+def search(game_state, colour, depth):
+    """Return the best move found by a fixed depth search, and its cost.
+
+    Unlike get_move, no randomness is added, so the same position and depth
+    always visit the same positions. Scores are from white's point of view,
+    as in board_eval.
+
+    Args:
+        - game_state:  an instance of GameState to search from
+        - colour:  the colour of the player to move
+        - depth:  the number of moves (half moves) to look ahead, at least 1
+
+    Returns a tuple of the best move (None if there are no legal moves)
+    and the number of positions visited, including this one.
+
+    """
+
+    nodes = [1]
+    best_move = None
+    best_eval = -colour * (MATE_SCORE + 1)
+    alpha = -MATE_SCORE - 1
+    beta = MATE_SCORE + 1
+
+    for m in game_state.get_all_moves(colour):
+
+        game_state.push(m)
+        tmp_eval = alpha_beta(game_state, -colour, depth - 1, alpha, beta,
+                              nodes)
+        game_state.pop()
+
+        if tmp_eval * colour > best_eval * colour:
+
+            best_move = m
+            best_eval = tmp_eval
+
+            if colour == p_colour.white:
+                alpha = max(alpha, tmp_eval)
+            else:
+                beta = min(beta, tmp_eval)
+
+    return best_move, nodes[0]
+
+
+def alpha_beta(game_state, colour, depth, alpha, beta, nodes):
+    """Return the minimax score of a position, searched with alpha-beta.
+
+    Args:
+        - game_state:  the position, with colour to move
+        - colour:  the colour of the player to move
+        - depth:  the number of moves left to search
+        - alpha, beta:  the scores white and black are already sure of
+        - nodes:  a one element list, counting the positions visited
+
+    """
+
+    nodes[0] += 1
+
+    if depth == 0:
+        # As in get_move, the check bonus goes to the player who just moved
+        return board_eval(game_state.board, -colour)
+
+    moves = game_state.get_all_moves(colour)
+
+    if not moves:
+        if game_state.board.is_in_check(colour):
+            return -colour * MATE_SCORE
+        return 0
+
+    for m in moves:
+
+        game_state.push(m)
+        tmp_eval = alpha_beta(game_state, -colour, depth - 1, alpha, beta,
+                              nodes)
+        game_state.pop()
+
+        if colour == p_colour.white:
+            alpha = max(alpha, tmp_eval)
+        else:
+            beta = min(beta, tmp_eval)
+
+        if alpha >= beta:
+            break
+
+    return alpha if colour == p_colour.white else beta
+
 
 def get_promotion(game_state, colour):
     """Return the piece the user chooses to promote their pawn to.